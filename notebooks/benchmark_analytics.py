@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import gzip
+import heapq
+import mmap
+import argparse
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from .instrumentation import LatencyHistogram
+
+# Analysis of rpc_benchmark_log.jsonl
+#
+#   python -m notebooks.benchmark_analytics report rpc_benchmark_log.jsonl
+#   python -m notebooks.benchmark_analytics compare old.jsonl new.jsonl
+#
+# Entries are streamed and summarised into fixed-size histograms, so memory
+# does not grow with the size of the log. Cold starts are found in a second
+# pass, once every part's p50 is known, keeping only the largest outliers.
+
+
+def iter_log_entries(path: str, use_mmap: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Stream entries from a JSONL benchmark log (.jsonl or rotated .jsonl.gz).
+    Malformed lines are skipped.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from _parse_lines(f)
+        return
+    with open(path, "rb") as f:
+        if use_mmap and os.path.getsize(path) > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from _parse_lines(iter(mm.readline, b""))
+        else:
+            yield from _parse_lines(f)
+
+
+def _parse_lines(lines) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and entry.get("total_time_ms") is not None:
+            yield entry
+
+
+class LatencySummary:
+    """Total, server and client-overhead latency histograms for one group of entries."""
+
+    def __init__(self):
+        self.total = LatencyHistogram()
+        self.server = LatencyHistogram()
+        self.client_overhead = LatencyHistogram()
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        total_ms = entry["total_time_ms"]
+        self.total.observe(total_ms)
+        server_ms = entry.get("avg_server_duration_ms")
+        if server_ms is not None:
+            self.server.observe(server_ms)
+            # Connection setup, network and client-side decoding
+            self.client_overhead.observe(max(total_ms - server_ms, 0.0))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.summary(),
+            "server": self.server.summary(),
+            "client_overhead": self.client_overhead.summary(),
+        }
+
+
+def _window_start(timestamp: datetime, window_minutes: int) -> datetime:
+    minutes = (timestamp.hour * 60 + timestamp.minute) // window_minutes * window_minutes
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=minutes)
+
+
+def _parse_timestamp(entry: Dict[str, Any]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(entry["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def find_cold_starts(
+    path: str,
+    part_p50: Dict[str, float],
+    cold_gap_minutes: float = 30.0,
+    cold_factor: float = 3.0,
+    max_outliers: int = 100,
+    use_mmap: bool = False,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Cold-start calls slower than cold_factor x their part's p50. Returns the
+    max_outliers largest (by ratio) in log order, and how many there were.
+    """
+    gap = timedelta(minutes=cold_gap_minutes)
+    last_seen: Dict[str, datetime] = {}
+    heap: List[Tuple[float, int, Dict[str, Any]]] = []
+    total = 0
+    for sequence, entry in enumerate(iter_log_entries(path, use_mmap=use_mmap)):
+        timestamp = _parse_timestamp(entry)
+        if timestamp is None:
+            continue
+        part_number = entry.get("part_number", "")
+        previous = last_seen.get(part_number)
+        last_seen[part_number] = timestamp
+        if previous is not None and timestamp - previous < gap:
+            continue
+        p50 = part_p50.get(part_number)
+        if not p50 or entry["total_time_ms"] <= cold_factor * p50:
+            continue
+        total += 1
+        ratio = entry["total_time_ms"] / p50
+        outlier = {
+            "timestamp": entry["timestamp"],
+            "part_number": part_number,
+            "total_time_ms": entry["total_time_ms"],
+            "server_ms": entry.get("avg_server_duration_ms"),
+            "part_p50_ms": round(p50, 3),
+            "ratio": round(ratio, 2),
+        }
+        # Equal ratios keep the earlier call
+        item = (ratio, -sequence, outlier)
+        if len(heap) < max_outliers:
+            heapq.heappush(heap, item)
+        elif max_outliers:
+            heapq.heappushpop(heap, item)
+    return [outlier for _, _, outlier in sorted(heap, key=lambda item: -item[1])], total
+
+
+def analyze_log(
+    path: str,
+    window_minutes: int = 60,
+    cold_gap_minutes: float = 30.0,
+    cold_factor: float = 3.0,
+    use_mmap: bool = False,
+    max_outliers: int = 100,
+) -> Dict[str, Any]:
+    """
+    Summarise a benchmark log overall, per part number and per time window.
+
+    A call is a cold-start candidate when it is the first one for its part
+    number or follows an idle gap of cold_gap_minutes. Candidates slower
+    than cold_factor x the part's p50 are reported as cold-start outliers,
+    at most max_outliers of them (the largest ratios).
+    """
+    overall = LatencySummary()
+    per_part: Dict[str, LatencySummary] = {}
+    per_window: Dict[str, LatencySummary] = {}
+    first_timestamp: Optional[str] = None
+    last_timestamp: Optional[str] = None
+    count = 0
+
+    for entry in iter_log_entries(path, use_mmap=use_mmap):
+        count += 1
+        part_number = entry.get("part_number", "")
+        overall.add(entry)
+        per_part.setdefault(part_number, LatencySummary()).add(entry)
+
+        timestamp = _parse_timestamp(entry)
+        if timestamp is None:
+            continue
+        first_timestamp = first_timestamp or entry["timestamp"]
+        last_timestamp = entry["timestamp"]
+        window = _window_start(timestamp, window_minutes).isoformat()
+        per_window.setdefault(window, LatencySummary()).add(entry)
+
+    part_p50 = {part_number: summary.total.percentile(0.5) for part_number, summary in per_part.items()}
+    cold_starts, cold_start_count = find_cold_starts(path, part_p50, cold_gap_minutes, cold_factor, max_outliers, use_mmap)
+
+    return {
+        "path": path,
+        "entries": count,
+        "first_timestamp": first_timestamp,
+        "last_timestamp": last_timestamp,
+        "overall": overall.summary(),
+        "per_part_number": {k: v.summary() for k, v in sorted(per_part.items())},
+        "per_window": {k: v.summary() for k, v in sorted(per_window.items())},
+        "cold_start_outliers": cold_starts,
+        "cold_start_outlier_count": cold_start_count,
+    }
+
+
+def compare_logs(base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.10) -> Dict[str, Any]:
+    """
+    Regression report between two analyze_log results. A part number regresses
+    when its total p95 grows by more than threshold (fractional).
+    """
+    def delta(old, cur):
+        if old is None or cur is None:
+            return None
+        return {"base": old, "new": cur, "change_pct": round((cur - old) / old * 100, 2) if old else None}
+
+    def compare_summary(a, b):
+        return {
+            series: {q: delta(a[series][q], b[series][q]) for q in ("p50_ms", "p95_ms", "p99_ms")}
+            for series in ("total", "server", "client_overhead")
+        }
+
+    parts = {}
+    regressions = []
+    for part_number in sorted(set(base["per_part_number"]) & set(new["per_part_number"])):
+        comparison = compare_summary(base["per_part_number"][part_number], new["per_part_number"][part_number])
+        parts[part_number] = comparison
+        p95 = comparison["total"]["p95_ms"]
+        if p95 and p95["change_pct"] is not None and p95["change_pct"] > threshold * 100:
+            regressions.append({"part_number": part_number, **p95})
+
+    return {
+        "base": base["path"],
+        "new": new["path"],
+        "overall": compare_summary(base["overall"], new["overall"]),
+        "per_part_number": parts,
+        "regressions": sorted(regressions, key=lambda r: -r["change_pct"]),
+        "only_in_base": sorted(set(base["per_part_number"]) - set(new["per_part_number"])),
+        "only_in_new": sorted(set(new["per_part_number"]) - set(base["per_part_number"])),
+    }
+
+
+def _format_row(label: str, summary: Dict[str, Any]) -> str:
+    total, server, overhead = summary["total"], summary["server"], summary["client_overhead"]
+
+    def fmt(value):
+        return f"{value:9.2f}" if value is not None else "        -"
+
+    return (
+        f"{label[:32]:32} {total['count']:6d} "
+        f"{fmt(total['p50_ms'])} {fmt(total['p95_ms'])} {fmt(total['p99_ms'])} "
+        f"{fmt(server['p50_ms'])} {fmt(overhead['p50_ms'])}"
+    )
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'':32} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'srv p50':>9} {'cli p50':>9}"
+    print(f"📊 {report['path']}: {report['entries']} entries, {report['first_timestamp']} → {report['last_timestamp']}")
+    print(header)
+    print(_format_row("overall", report["overall"]))
+    print("\nPer part number")
+    print(header)
+    for part_number, summary in report["per_part_number"].items():
+        print(_format_row(part_number, summary))
+    print("\nPer time window")
+    print(header)
+    for window, summary in report["per_window"].items():
+        print(_format_row(window, summary))
+    shown, total = len(report["cold_start_outliers"]), report.get("cold_start_outlier_count", 0)
+    print(f"\nCold-start outliers{f' (largest {shown} of {total})' if total > shown else ''}")
+    if not report["cold_start_outliers"]:
+        print("  none")
+    for outlier in report["cold_start_outliers"]:
+        print(
+            f"  ⚠️ {outlier['timestamp']} {outlier['part_number']}: {outlier['total_time_ms']} ms "
+            f"({outlier['ratio']}x p50 {outlier['part_p50_ms']} ms)"
+        )
+
+
+def print_comparison(comparison: Dict[str, Any]) -> None:
+    print(f"📊 {comparison['base']} → {comparison['new']}")
+    for series, quantiles in comparison["overall"].items():
+        for q, d in quantiles.items():
+            if d:
+                print(f"  {series:16} {q:7} {d['base']:9.2f} → {d['new']:9.2f} ({d['change_pct']:+.1f}%)")
+    print("\nRegressions (total p95)")
+    if not comparison["regressions"]:
+        print("  none")
+    for r in comparison["regressions"]:
+        print(f"  ❌ {r['part_number']}: {r['base']:.2f} → {r['new']:.2f} ms ({r['change_pct']:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse rpc_benchmark_log.jsonl files.")
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    parser.add_argument("--mmap", action="store_true", help="memory-map the log instead of buffered reads")
+    parser.add_argument("--window", type=int, default=60, help="time window in minutes (default 60)")
+    parser.add_argument("--cold-gap", type=float, default=30.0, help="idle minutes before a call counts as cold")
+    parser.add_argument("--cold-factor", type=float, default=3.0, help="cold outlier threshold as a multiple of p50")
+    parser.add_argument("--max-outliers", type=int, default=100, help="cold-start outliers to report (largest first)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="latency report for one log")
+    report_parser.add_argument("log")
+    compare_parser = subparsers.add_parser("compare", help="regression report between two logs")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="p95 growth that counts as a regression")
+    args = parser.parse_args(argv)
+
+    def analyze(path):
+        return analyze_log(path, args.window, args.cold_gap, args.cold_factor, use_mmap=args.mmap,
+                           max_outliers=args.max_outliers)
+
+    if args.command == "report":
+        report = analyze(args.log)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+        return 0
+
+    comparison = compare_logs(analyze(args.base), analyze(args.new), args.threshold)
+    if args.json:
+        print(json.dumps(comparison, indent=2))
+    else:
+        print_comparison(comparison)
+    return 1 if comparison["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+import os
+import sys
+import json
+import mmap
+import time
+import argparse
+import numpy as np
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterable, Iterator
+from .template_catalog import TEMPLATE_COLUMNS, template_key
+
+# Compact, memory-mapped template catalog
+#
+#   python -m notebooks.catalog_snapshot build snapshots/catalog.pcat
+#   python -m notebooks.catalog_snapshot info snapshots/catalog.pcat
+#
+# Layout: b"PCAT" + u32 header length + JSON header, then 64-byte aligned
+# sections described by the header:
+#   strings_blob / string_offsets   every distinct string once (UTF-8): part
+#                                   numbers, brands, categories, notes, spec
+#                                   keys and values, JSON of ranges/mappers
+#   rows                            one fixed-width record per template,
+#                                   fields are string-table indices
+#   spec_keys / spec_values /       the (key, value) pairs of every row's specs,
+#   spec_kinds                      contiguous per row
+#   embeddings                      float32 block, one row per embedded template
+# Rows are read through CatalogRow views that decode fields on access, so
+# loading costs one mmap and a header parse however large the catalog is.
+
+MAGIC = b"PCAT"
+# 2: JSON columns keep their key order (version 1 sorted the mapper keys)
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+NONE = np.uint32(0xFFFFFFFF)
+
+ROW_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("part_number", "<u4"),
+    ("brand", "<u4"),
+    ("category", "<u4"),
+    ("regex", "<u4"),
+    ("ranges_json", "<u4"),
+    ("notes", "<u4"),
+    ("specs_start", "<u4"),
+    ("specs_count", "<u4"),
+    ("specs_part_number_mapper", "<u4"),
+    ("environment_value", "<u4"),
+    ("updated_at", "<u4"),
+    ("embedding", "<i4"),
+])
+
+# Spec values are stored as raw text when they are strings, else as JSON
+SPEC_TEXT, SPEC_JSON = 0, 1
+
+
+class _StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.encoded: List[bytes] = []
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return int(NONE)
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.encoded)
+            self.encoded.append(value.encode("utf-8"))
+        return position
+
+    def add_json(self, value: Any) -> int:
+        # Key order is kept: specs_part_number_mapper is read positionally
+        return int(NONE) if value is None else self.add(json.dumps(value, separators=(",", ":")))
+
+
+def _decode_json(value):
+    # Rows fetched with a plain cursor may hold JSON columns as text
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def write_catalog_snapshot(rows: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Write template rows to a snapshot file (atomically replaced). Returns the row count.
+    """
+    strings = _StringTable()
+    records = []
+    spec_keys, spec_values, spec_kinds = [], [], []
+    embeddings = []
+    dim = None
+    for row in rows:
+        specs = _decode_json(row.get("specs")) or {}
+        specs_start = len(spec_keys)
+        for key, value in specs.items():
+            spec_keys.append(strings.add(key))
+            if isinstance(value, str):
+                spec_values.append(strings.add(value))
+                spec_kinds.append(SPEC_TEXT)
+            else:
+                spec_values.append(strings.add_json(value))
+                spec_kinds.append(SPEC_JSON)
+        embedding = row.get("specs_embedding")
+        embedding_row = -1
+        if embedding is not None:
+            vector = np.asarray(_decode_json(embedding) if isinstance(embedding, str) else embedding, dtype=np.float32)
+            if dim is None:
+                dim = len(vector)
+            elif len(vector) != dim:
+                raise ValueError(f"Embedding of {row.get('part_number')} has {len(vector)} dims, expected {dim}")
+            embedding_row = len(embeddings)
+            embeddings.append(vector)
+        updated_at = row.get("updated_at")
+        records.append((
+            row["id"] if row.get("id") is not None else -1,
+            strings.add(row["part_number"]),
+            strings.add(row.get("brand")),
+            strings.add(row.get("category")),
+            strings.add(row.get("regex")),
+            strings.add_json(_decode_json(row.get("ranges_json"))),
+            strings.add(row.get("notes")),
+            specs_start,
+            len(spec_keys) - specs_start,
+            strings.add_json(_decode_json(row.get("specs_part_number_mapper"))),
+            strings.add(row.get("environment_value")),
+            strings.add(updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at),
+            embedding_row,
+        ))
+
+    offsets = np.zeros(len(strings.encoded) + 1, dtype="<u8")
+    np.cumsum([len(s) for s in strings.encoded], out=offsets[1:])
+    sections = {
+        "strings_blob": np.frombuffer(b"".join(strings.encoded), dtype=np.uint8),
+        "string_offsets": offsets,
+        "rows": np.array(records, dtype=ROW_DTYPE),
+        "spec_keys": np.array(spec_keys, dtype="<u4"),
+        "spec_values": np.array(spec_values, dtype="<u4"),
+        "spec_kinds": np.array(spec_kinds, dtype=np.uint8),
+        "embeddings": np.array(embeddings, dtype="<f4").reshape(len(embeddings), dim or 0),
+    }
+
+    def header_for(start):
+        header = {"version": FORMAT_VERSION, "rows": len(records), "dim": dim or 0, "sections": {}}
+        offset = start
+        for name, array in sections.items():
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            header["sections"][name] = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.descr if array.dtype.names else array.dtype.str}
+            offset += array.nbytes
+        return header
+
+    # The header size shifts the section offsets, so settle it first
+    size = 0
+    while True:
+        header = json.dumps(header_for(len(MAGIC) + 4 + size)).encode()
+        if len(header) == size:
+            break
+        size = len(header)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(4, "little") + header)
+        meta = json.loads(header)["sections"]
+        for name, array in sections.items():
+            f.write(b"\0" * (meta[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp, path)
+    return len(records)
+
+
+class CatalogSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file. Rows are CatalogRow
+    views; the OS pages data in on first access and shares it between
+    processes mapping the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header_length = int.from_bytes(self._mmap[4:8], "little")
+        self.header = json.loads(self._mmap[8:8 + header_length])
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has snapshot format {self.header['version']}, expected {FORMAT_VERSION}")
+        for name, meta in self.header["sections"].items():
+            dtype = np.dtype([tuple(f) for f in meta["dtype"]]) if isinstance(meta["dtype"], list) else np.dtype(meta["dtype"])
+            count = int(np.prod(meta["shape"])) if meta["shape"] else 1
+            if count:
+                array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=meta["offset"]).reshape(meta["shape"])
+            else:
+                array = np.zeros(meta["shape"], dtype=dtype)
+            setattr(self, "_" + name, array)
+        self.dim = self.header["dim"]
+        self._string_cache: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self.header["rows"]
+
+    def __getitem__(self, i: int) -> "CatalogRow":
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return CatalogRow(self, i)
+
+    def __iter__(self) -> Iterator["CatalogRow"]:
+        return (CatalogRow(self, i) for i in range(len(self)))
+
+    def string(self, i) -> Optional[str]:
+        i = int(i)
+        if i == NONE:
+            return None
+        value = self._string_cache.get(i)
+        if value is None:
+            base = self._strings_offset
+            start, end = int(self._string_offsets[i]), int(self._string_offsets[i + 1])
+            value = self._mmap[base + start:base + end].decode("utf-8")
+            # Brands, categories, notes and spec keys repeat; part numbers mostly do not
+            if end - start <= 64:
+                self._string_cache[i] = value
+        return value
+
+    @property
+    def _strings_offset(self) -> int:
+        return self.header["sections"]["strings_blob"]["offset"]
+
+    def json(self, i) -> Any:
+        value = self.string(i)
+        return None if value is None else json.loads(value)
+
+    def specs(self, row: int) -> Dict[str, Any]:
+        record = self._rows[row]
+        start, count = int(record["specs_start"]), int(record["specs_count"])
+        specs = {}
+        for key, value, kind in zip(self._spec_keys[start:start + count], self._spec_values[start:start + count], self._spec_kinds[start:start + count]):
+            specs[self.string(key)] = self.string(value) if kind == SPEC_TEXT else self.json(value)
+        return specs
+
+    def embeddings(self) -> np.ndarray:
+        """The packed float32 embedding block (read-only)."""
+        return self._embeddings
+
+    def watermark(self) -> Optional[datetime]:
+        stamps = [self.string(i) for i in np.unique(self._rows["updated_at"]) if i != NONE]
+        return max((datetime.fromisoformat(s) for s in stamps), default=None)
+
+    def close(self) -> None:
+        """Unmap the file. Only safe once no CatalogRow of this snapshot is in use."""
+        for name in self.header["sections"]:
+            setattr(self, "_" + name, None)
+        self._mmap.close()
+        self._file.close()
+
+
+class CatalogRow(Mapping):
+    """
+    Lightweight read-only template row over a CatalogSnapshot, usable wherever
+    a RealDictCursor row is (row["specs"], row.get(...), dict(row, ...)).
+    Fields are decoded on each access; specs and JSON columns come back as
+    fresh objects, so callers may modify them.
+    """
+
+    __slots__ = ("_snapshot", "_row")
+
+    def __init__(self, snapshot: CatalogSnapshot, row: int):
+        self._snapshot = snapshot
+        self._row = row
+
+    def __getitem__(self, column: str) -> Any:
+        snapshot = self._snapshot
+        record = snapshot._rows[self._row]
+        if column == "id":
+            value = int(record["id"])
+            return None if value < 0 else value
+        if column == "specs":
+            return snapshot.specs(self._row)
+        if column in ("ranges_json", "specs_part_number_mapper"):
+            return snapshot.json(record[column])
+        if column == "specs_embedding":
+            position = int(record["embedding"])
+            return None if position < 0 else snapshot._embeddings[position]
+        if column == "updated_at":
+            value = snapshot.string(record["updated_at"])
+            return None if value is None else datetime.fromisoformat(value)
+        if column in _TEXT_COLUMNS:
+            return snapshot.string(record[column])
+        raise KeyError(column)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(TEMPLATE_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(TEMPLATE_COLUMNS)
+
+    def __repr__(self) -> str:
+        return f"CatalogRow({self['part_number']!r}, {self['brand']!r})"
+
+
+_TEXT_COLUMNS = {"part_number", "brand", "category", "regex", "notes", "environment_value"}
+
+
+class SnapshotTemplateSource:
+    """
+    Template source that serves the initial load from a catalog snapshot and
+    everything changed after it from another source (normally Postgres).
+    """
+
+    def __init__(self, path: str, fallback=None):
+        self.path = path
+        self.fallback = fallback
+        self.snapshot: Optional[CatalogSnapshot] = None
+
+    def fetch_since(self, watermark: Optional[datetime]) -> List[Dict[str, Any]]:
+        if watermark is not None:
+            return self.fallback.fetch_since(watermark) if self.fallback is not None else []
+        # A previous snapshot stays mapped until the rows referencing it are gone
+        self.snapshot = CatalogSnapshot(self.path)
+        rows = {template_key(row): row for row in self.snapshot}
+        if self.fallback is not None:
+            rows.update((template_key(row), row) for row in self.fallback.fetch_since(self.snapshot.watermark()))
+        return sorted(rows.values(), key=lambda r: (r["updated_at"] is None, r["updated_at"] or 0))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or inspect compact catalog snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="snapshot the parts table")
+    build_parser.add_argument("path")
+    info_parser = subparsers.add_parser("info", help="describe a snapshot")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        start = time.perf_counter()
+        snapshot = CatalogSnapshot(args.path)
+        open_ms = (time.perf_counter() - start) * 1000
+        print(json.dumps({
+            "path": args.path,
+            "rows": len(snapshot),
+            "dim": snapshot.dim,
+            "strings": len(snapshot._string_offsets) - 1,
+            "file_bytes": os.path.getsize(args.path),
+            "open_ms": round(open_ms, 3),
+            "watermark": str(snapshot.watermark()),
+        }, indent=2))
+        return 0
+
+    from .refracting import db_pool
+    from .template_catalog import PostgresTemplateSource
+    db_pool.open()
+    try:
+        rows = PostgresTemplateSource(db_pool).fetch_since(None)
+    finally:
+        db_pool.close()
+    count = write_catalog_snapshot(rows, args.path)
+    print(f"✅ Snapshot {args.path}: {count} templates, {os.path.getsize(args.path)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
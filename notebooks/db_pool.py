@@ -0,0 +1,110 @@
+import os
+import asyncio
+import weakref
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable
+from psycopg2.pool import ThreadedConnectionPool
+from pgvector.psycopg2 import register_vector
+
+
+class DatabasePool:
+    """
+    Shared psycopg2 connection pool for the match API.
+
+    Connections are opened once, get the pgvector types registered the first
+    time they are handed out and are then reused across requests. Blocking
+    queries run on a bounded thread-pool so async handlers never block the
+    event loop.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], min_size: Optional[int] = None, max_size: int = 10):
+        self.db_config = db_config
+        self.min_size = max_size if min_size is None else min_size
+        self.max_size = max_size
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Connections with the pgvector types registered; entries go away with
+        # the connection, so a recycled id() is never mistaken for a known one
+        self._registered = weakref.WeakSet()
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    def open(self) -> None:
+        if self._pool is not None:
+            return
+        self._pool = ThreadedConnectionPool(self.min_size, self.max_size, **self.db_config)
+        # One worker per connection: a query never waits on the executor
+        # while holding a connection, and never waits on the pool while
+        # holding a worker.
+        self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix="db")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+        self._registered.clear()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection with pgvector registered, returning it to the
+        pool afterwards. Broken connections are discarded instead of reused.
+        """
+        if self._pool is None:
+            raise RuntimeError("Database pool is not open.")
+        conn = self._pool.getconn()
+        broken = False
+        try:
+            if conn not in self._registered:
+                register_vector(conn)
+                conn.commit()
+                self._registered.add(conn)
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            broken = broken or bool(conn.closed)
+            if broken:
+                self._registered.discard(conn)
+            self._pool.putconn(conn, close=broken)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, conn=<pooled connection>, **kwargs) synchronously.
+        """
+        with self.connection() as conn:
+            return fn(*args, conn=conn, **kwargs)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, conn=<pooled connection>, **kwargs) on the DB executor.
+        """
+        if self._executor is None:
+            raise RuntimeError("Database pool is not open.")
+        loop = asyncio.get_running_loop()
+        # Carry context variables (e.g. per-request stage timings) into the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, lambda: context.run(self.call, fn, *args, **kwargs))
+
+
+def pool_from_env(db_config: Dict[str, Any]) -> DatabasePool:
+    # The pool keeps min_size connections open; connections returned beyond
+    # that are closed, so a smaller minimum reconnects on every burst
+    max_size = int(os.getenv("DB_POOL_MAX", 10))
+    return DatabasePool(
+        db_config,
+        min_size=min(int(os.getenv("DB_POOL_MIN", max_size)), max_size),
+        max_size=max_size,
+    )
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Set
+from .template_catalog import template_key
+
+# Offline cross-brand equivalence table
+#
+#   python -m notebooks.equivalence_job build snapshots/equivalents --workers 8
+#   python -m notebooks.equivalence_job info snapshots/equivalents
+#
+# For every template, the most similar templates of other brands down to the
+# lowest standard threshold, computed in parallel worker processes that share
+# one memory-mapped embedding matrix. A rerun over an existing table only
+# recomputes templates whose embedding, specs or brand changed, plus those
+# whose neighbour lists could have been affected by them.
+#
+# Snapshot directory: neighbours.npy (int32, row indices, -1 padded),
+# similarities.npy (float32) and meta.json (keys, fingerprints, thresholds),
+# written last.
+
+STANDARD_THRESHOLDS = (0.99, 0.97, 0.95)
+
+
+def _key_to_json(key):
+    return list(key) if isinstance(key, tuple) else key
+
+
+def _key_from_json(key):
+    return tuple(key) if isinstance(key, list) else key
+
+
+def fingerprint(row: Dict[str, Any]) -> str:
+    """Hash of everything the neighbour list of a template depends on."""
+    digest = hashlib.blake2b(digest_size=16)
+    embedding = row.get("specs_embedding")
+    if embedding is not None:
+        digest.update(np.asarray(embedding, dtype=np.float32).tobytes())
+    specs = row.get("specs")
+    digest.update(json.dumps(specs if specs is not None else None, sort_keys=True, default=str).encode())
+    digest.update(str(row.get("brand")).encode())
+    return digest.hexdigest()
+
+
+class EquivalenceTable:
+    """
+    Read access to a materialised equivalence snapshot (arrays memory-mapped).
+    """
+
+    def __init__(self, keys: List[Any], fingerprints: List[str], neighbours: np.ndarray, similarities: np.ndarray,
+                 thresholds: Tuple[float, ...], depth: int):
+        self.keys = keys
+        self.fingerprints = dict(zip(keys, fingerprints))
+        self.neighbours = neighbours
+        self.similarities = similarities
+        self.thresholds = tuple(thresholds)
+        self.min_similarity = min(thresholds)
+        self.depth = depth
+        self._positions = {key: i for i, key in enumerate(keys)}
+        # Templates changed in the catalog since the table was built, and
+        # those whose neighbour lists include one of them
+        self.stale: Set[Any] = set()
+        # Reverse of neighbours (listing positions, offsets), built on first use
+        self._listed_by: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "EquivalenceTable":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        return cls(
+            [_key_from_json(k) for k in meta["keys"]],
+            meta["fingerprints"],
+            np.load(os.path.join(path, "neighbours.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "similarities.npy"), mmap_mode=mode),
+            tuple(meta["thresholds"]),
+            meta["depth"],
+        )
+
+    def save(self, path: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name, array in (("neighbours.npy", self.neighbours), ("similarities.npy", self.similarities)):
+            tmp = os.path.join(path, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, name))
+        meta = {
+            "thresholds": list(self.thresholds),
+            "depth": self.depth,
+            "count": len(self.keys),
+            "keys": [_key_to_json(k) for k in self.keys],
+            "fingerprints": [self.fingerprints[k] for k in self.keys],
+            "created_at": time.time(),
+            **(extra or {}),
+        }
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def equivalents(self, key, min_similarity: float) -> Optional[List[Tuple[Any, float]]]:
+        """
+        (key, similarity) of the cross-brand equivalents at or above min_similarity,
+        most similar first; None if the table cannot answer for this template.
+        """
+        position = self._positions.get(key)
+        if position is None or key in self.stale or min_similarity < self.min_similarity:
+            return None
+        result = []
+        for neighbour, similarity in zip(self.neighbours[position], self.similarities[position]):
+            if neighbour < 0 or similarity < min_similarity:
+                break
+            result.append((self.keys[neighbour], float(similarity)))
+        return result
+
+    def listed_by(self, position: int) -> np.ndarray:
+        """Positions of the templates whose neighbour list includes position."""
+        if self._listed_by is None:
+            neighbours = np.asarray(self.neighbours)
+            listers, slots = np.nonzero(neighbours >= 0)
+            listed = neighbours[listers, slots]
+            order = np.argsort(listed, kind="stable")
+            offsets = np.searchsorted(listed[order], np.arange(len(self.keys) + 1))
+            self._listed_by = (listers[order], offsets)
+        listers, offsets = self._listed_by
+        return listers[offsets[position]:offsets[position + 1]]
+
+    def check(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Template catalog listener: mark rows whose content no longer matches
+        the table, and the templates listing them with their old similarity.
+        Templates a change brings newly within reach are picked up by the next build.
+        """
+        for row in rows:
+            key = template_key(row)
+            if self.fingerprints.get(key) == fingerprint(row):
+                continue
+            self.stale.add(key)
+            position = self._positions.get(key)
+            if position is not None:
+                self.stale.update(self.keys[j] for j in self.listed_by(position))
+        return len(self.stale)
+
+
+# Worker process state: the shared, memory-mapped matrix and brand ids
+_matrix: Optional[np.ndarray] = None
+_brands: Optional[np.ndarray] = None
+
+
+def _init_worker(matrix_path: str, brands_path: str) -> None:
+    global _matrix, _brands
+    _matrix = np.load(matrix_path, mmap_mode="r")
+    _brands = np.load(brands_path)
+
+
+def _neighbour_block(indices: List[int], depth: Optional[int], min_similarity: float) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    Cross-brand neighbours of the given rows, most similar first. depth=None
+    returns every neighbour above min_similarity.
+    """
+    similarity = np.asarray(_matrix[indices]) @ np.asarray(_matrix).T
+    similarity[_brands[indices][:, None] == _brands[None, :]] = -np.inf
+    results = []
+    for row, i in zip(similarity, indices):
+        candidates = np.flatnonzero(row >= min_similarity)
+        if depth is not None and len(candidates) > depth:
+            candidates = candidates[np.argpartition(-row[candidates], depth - 1)[:depth]]
+        candidates = candidates[np.argsort(-row[candidates], kind="stable")]
+        results.append((i, candidates.astype(np.int32), row[candidates].astype(np.float32)))
+    return results
+
+
+def _blocks(indices: List[int], total: int, budget: int = 1 << 24) -> List[List[int]]:
+    # Keep each block's similarity matrix around budget floats
+    size = max(1, budget // max(total, 1))
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+
+def _run_blocks(executor, indices: List[int], total: int, depth: Optional[int], min_similarity: float):
+    futures = [executor.submit(_neighbour_block, block, depth, min_similarity) for block in _blocks(indices, total)]
+    for future in futures:
+        yield from future.result()
+
+
+def build_equivalence_table(
+    rows: List[Dict[str, Any]],
+    previous: Optional[EquivalenceTable] = None,
+    thresholds: Tuple[float, ...] = STANDARD_THRESHOLDS,
+    depth: int = 50,
+    workers: Optional[int] = None,
+) -> Tuple[EquivalenceTable, Dict[str, Any]]:
+    """
+    Compute the cross-brand equivalence table for rows, reusing previous for
+    templates unaffected by changes. Returns (table, summary).
+    """
+    start = time.perf_counter()
+    rows = [row for row in rows if row.get("specs_embedding") is not None]
+    keys = [template_key(row) for row in rows]
+    fingerprints = [fingerprint(row) for row in rows]
+    position = {key: i for i, key in enumerate(keys)}
+    min_similarity = min(thresholds)
+
+    matrix = np.asarray([np.asarray(row["specs_embedding"], dtype=np.float32) for row in rows], dtype=np.float32)
+    if len(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+    brand_ids = {brand: i for i, brand in enumerate(sorted({str(row.get("brand")) for row in rows}))}
+    brands = np.asarray([brand_ids[str(row.get("brand"))] for row in rows], dtype=np.int32)
+
+    reusable = (
+        previous is not None
+        and previous.thresholds == tuple(thresholds)
+        and previous.depth == depth
+    )
+    if reusable:
+        changed = {i for i, key in enumerate(keys) if previous.fingerprints.get(key) != fingerprints[i]}
+        # Old positions of templates changed or deleted since the previous run
+        gone = [j for j, key in enumerate(previous.keys) if key not in position or position[key] in changed]
+    else:
+        changed = set(range(len(rows)))
+        gone = []
+
+    neighbours = np.full((len(rows), depth), -1, dtype=np.int32)
+    similarities = np.zeros((len(rows), depth), dtype=np.float32)
+    affected = set(changed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix_path, brands_path = os.path.join(tmp, "matrix.npy"), os.path.join(tmp, "brands.npy")
+        np.save(matrix_path, matrix)
+        np.save(brands_path, brands)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix_path, brands_path)) as executor:
+            if reusable and changed:
+                # Similarity is symmetric: whoever is now within reach of a
+                # changed template may have to list it
+                for _, reach, _ in _run_blocks(executor, sorted(changed), len(rows), None, min_similarity):
+                    affected.update(int(j) for j in reach)
+            if reusable:
+                # Whoever listed a changed or deleted template must drop or re-rank it
+                if gone:
+                    listed_gone = np.isin(np.asarray(previous.neighbours), gone).any(axis=1)
+                    for j in np.flatnonzero(listed_gone):
+                        if previous.keys[j] in position:
+                            affected.add(position[previous.keys[j]])
+                # Carry the unaffected lists over, remapped to the new row order
+                for i, key in enumerate(keys):
+                    if i in affected:
+                        continue
+                    j = previous._positions[key]
+                    old = previous.neighbours[j]
+                    valid = old >= 0
+                    mapped = [position[previous.keys[k]] for k in old[valid]]
+                    neighbours[i, :len(mapped)] = mapped
+                    similarities[i, :len(mapped)] = previous.similarities[j][valid]
+            else:
+                affected = set(range(len(rows)))
+
+            for i, found, found_similarity in _run_blocks(executor, sorted(affected), len(rows), depth, min_similarity):
+                neighbours[i, :len(found)] = found
+                similarities[i, :len(found)] = found_similarity
+
+    table = EquivalenceTable(keys, fingerprints, neighbours, similarities, tuple(thresholds), depth)
+    summary = {
+        "templates": len(rows),
+        "changed": len(changed),
+        "recomputed": len(affected),
+        "reused": len(rows) - len(affected),
+        "seconds": round(time.perf_counter() - start, 2),
+        "pairs_per_threshold": {str(t): int((similarities >= t).sum()) for t in thresholds},
+    }
+    return table, summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Materialise the cross-brand equivalence table.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="compute (or incrementally update) a table")
+    build_parser.add_argument("path")
+    build_parser.add_argument("--catalog-snapshot", help="read templates from a catalog snapshot instead of Postgres")
+    build_parser.add_argument("--thresholds", default=",".join(map(str, STANDARD_THRESHOLDS)))
+    build_parser.add_argument("--depth", type=int, default=50, help="equivalents kept per template")
+    build_parser.add_argument("--workers", type=int, default=None)
+    build_parser.add_argument("--full", action="store_true", help="ignore the existing table and recompute everything")
+    info_parser = subparsers.add_parser("info", help="describe a table")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        table = EquivalenceTable.load(args.path)
+        print(json.dumps({
+            "path": args.path,
+            "templates": len(table),
+            "thresholds": table.thresholds,
+            "depth": table.depth,
+            "pairs_per_threshold": {str(t): int((np.asarray(table.similarities) >= t).sum()) for t in table.thresholds},
+        }, indent=2))
+        return 0
+
+    if args.catalog_snapshot:
+        from .catalog_snapshot import CatalogSnapshot
+        rows = list(CatalogSnapshot(args.catalog_snapshot))
+    else:
+        from .refracting import db_pool
+        from .template_catalog import PostgresTemplateSource
+        db_pool.open()
+        try:
+            rows = PostgresTemplateSource(db_pool).fetch_since(None)
+        finally:
+            db_pool.close()
+    previous = None
+    if not args.full and os.path.exists(os.path.join(args.path, "meta.json")):
+        previous = EquivalenceTable.load(args.path, mmap=False)
+    thresholds = tuple(float(t) for t in args.thresholds.split(","))
+    table, summary = build_equivalence_table(rows, previous, thresholds, args.depth, args.workers)
+    table.save(args.path)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
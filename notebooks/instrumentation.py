@@ -0,0 +1,134 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List
+
+# Per-request stage timings (ms), set by the timing middleware
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _bucket_bounds(start: float = 0.01, factor: float = 1.2, limit: float = 120000.0) -> List[float]:
+    bounds = [start]
+    while bounds[-1] < limit:
+        bounds.append(bounds[-1] * factor)
+    return bounds
+
+
+BUCKET_BOUNDS_MS = _bucket_bounds()
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory latency histogram with exponential buckets (±10% resolution).
+    Percentiles are interpolated within the bucket that holds them.
+    """
+
+    def __init__(self, bounds: List[float] = BUCKET_BOUNDS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if not bucket_count:
+                continue
+            if seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+        return {
+            "count": self.count,
+            "mean_ms": rounded(self.total / self.count) if self.count else None,
+            "p50_ms": rounded(self.percentile(0.50)),
+            "p95_ms": rounded(self.percentile(0.95)),
+            "p99_ms": rounded(self.percentile(0.99)),
+            "min_ms": rounded(self.min),
+            "max_ms": rounded(self.max),
+        }
+
+
+class StageMetrics:
+    """
+    Latency histograms per named pipeline stage.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage_name: str, ms: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage_name)
+            if histogram is None:
+                histogram = self._histograms[stage_name] = LatencyHistogram()
+            histogram.observe(ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: h.summary() for name, h in self._histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+metrics = StageMetrics()
+
+
+def record_stage(stage_name: str, ms: float) -> None:
+    """Record a stage duration in the histograms and the current request's timings."""
+    metrics.observe(stage_name, ms)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage_name] = timings.get(stage_name, 0.0) + ms
+
+
+@contextmanager
+def stage(stage_name: str):
+    """Time the enclosed block as one occurrence of stage_name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, (time.perf_counter() - start) * 1000)
+
+
+def start_request_timings():
+    """Begin collecting stage timings for the current request. Returns (timings, token)."""
+    timings: Dict[str, float] = {}
+    return timings, _request_timings.set(timings)
+
+
+def reset_request_timings(token) -> None:
+    _request_timings.reset(token)
+
+
+def server_timing_header(timings: Dict[str, float], total_ms: Optional[float] = None) -> str:
+    """Format timings as a Server-Timing header value."""
+    parts = [f"{name};dur={ms:.2f}" for name, ms in timings.items()]
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
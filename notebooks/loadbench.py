@@ -0,0 +1,451 @@
+import re
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import functools
+import contextlib
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple
+import numpy as np
+from .db_pool import DatabasePool
+from .instrumentation import LatencyHistogram
+from .template_registry import get_static_part
+
+# Load-test and micro-benchmark harness for the match API
+#
+#   python -m notebooks.loadbench http --templates 2000 --concurrency 32 --requests 5000
+#   python -m notebooks.loadbench http --url http://localhost:8000 --requests 2000
+#   python -m notebooks.loadbench micro --templates 200
+#
+# Without --url the app in notebooks/refracting.py runs in-process against
+# FakeVectorDatabase, an in-memory stand-in for the two Postgres RPCs.
+
+BRANDS = ["HIWIN", "THK", "NSK", "IKO", "PMI"]
+
+
+def build_synthetic_catalog(n_templates: int, dim: int = 64, brands_per_group: int = 3, static_ratio: float = 0.2, seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Template rows shaped like get_parts_by_first_static_part_vector_poc output.
+
+    Templates come in groups of equivalent parts from different brands whose
+    embeddings are near-identical, so cross-brand similarity search finds them.
+    A share of templates are fully static part numbers without placeholders.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    rows = []
+    group = 0
+    while len(rows) < n_templates:
+        base = np_rng.normal(size=dim)
+        static = rng.random() < static_ratio
+        start = rng.choice([100, 130, 160, 200])
+        end = start + rng.choice([1000, 2000, 2870])
+        width = rng.choice([15, 20, 25, 30, 35])
+        for brand in rng.sample(BRANDS, brands_per_group):
+            if len(rows) >= n_templates:
+                break
+            embedding = base + np_rng.normal(scale=0.005, size=dim)
+            embedding = (embedding / np.linalg.norm(embedding)).astype(np.float32)
+            prefix = f"{brand[:2]}{group:05d}W{width}+"
+            specs = {
+                "rail width": f"{width}mm",
+                "rail length": f"[{start}-{end}/1]mm",
+                "number of blocks": "1",
+                "accuracy": "normal grade",
+            }
+            if static:
+                part_number = f"{prefix}S"
+                regex = "^" + re.escape(part_number) + "$"
+                ranges_json = []
+                specs["rail length"] = f"{start}mm"
+                mapper = {}
+            else:
+                part_number = f"{prefix}[{start}-{end}/1]LF"
+                regex = "^" + re.escape(prefix) + r"(\d+)" + re.escape("LF") + "$"
+                ranges_json = [{"type": "range", "start": start, "end": end, "step": 1}]
+                mapper = {"rail length": 1}
+            rows.append({
+                "id": len(rows) + 1,
+                "part_number": part_number,
+                "brand": brand,
+                "category": "linear guide",
+                "regex": regex,
+                "ranges_json": ranges_json,
+                "notes": "standard" if rng.random() < 0.8 else "long block",
+                "specs": specs,
+                "specs_part_number_mapper": mapper,
+                "environment_value": None,
+                "specs_embedding": embedding,
+            })
+        group += 1
+    return rows
+
+
+class FakeVectorDatabase:
+    """
+    In-memory implementation of get_parts_by_first_static_part_vector_poc and
+    get_parts_by_specs_vector_poc over a synthetic catalog.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], latency_ms: float = 0.0):
+        self.rows = rows
+        self.latency_ms = latency_ms
+        self.matrix = np.stack([np.asarray(r["specs_embedding"], dtype=np.float32) for r in rows])
+        self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.by_prefix: Dict[str, List[Dict[str, Any]]] = {}
+        # ORDER BY length(static_part) DESC, id
+        for row in sorted(rows, key=lambda r: r["id"]):
+            self.by_prefix.setdefault(get_static_part(row["part_number"]), []).append(row)
+        self.prefix_lengths = sorted({len(p) for p in self.by_prefix}, reverse=True)
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def first_static_part(self, part_number: str) -> List[Dict[str, Any]]:
+        self._sleep()
+        found = []
+        for length in self.prefix_lengths:
+            found.extend(self.by_prefix.get(part_number[:length], ()))
+        return [dict(row, duration_ms=0.1) for row in found]
+
+    def specs_vector(self, embedding, top_k: int, min_similarity: float) -> List[Dict[str, Any]]:
+        self._sleep()
+        query = np.asarray(_parse_vector(embedding), dtype=np.float32)
+        query = query / np.linalg.norm(query)
+        similarity = self.matrix @ query
+        candidates = np.nonzero(similarity >= min_similarity)[0]
+        order = candidates[np.argsort(-similarity[candidates], kind="stable")][:top_k]
+        return [dict(self.rows[i], similarity=float(similarity[i]), duration_ms=0.1) for i in order]
+
+
+def _parse_vector(embedding):
+    if isinstance(embedding, str):
+        return [float(x) for x in embedding.strip("[]").split(",")]
+    return embedding
+
+
+class FakeCursor:
+    """Just enough of a psycopg2 cursor for the queries issued by the match API."""
+
+    def __init__(self, db: FakeVectorDatabase, as_dict: bool):
+        self.db = db
+        self.as_dict = as_dict
+        self.itersize = 2000
+        self.description = None
+        self._rows: List[Dict[str, Any]] = []
+
+    def execute(self, sql: str, params: Tuple = ()) -> None:
+        if "set_config" in sql:
+            # Index search settings have no effect on the exact in-memory search
+            self._rows = []
+        elif "batch_part_number" in sql:
+            self._rows = [
+                dict(row, batch_part_number=part_number)
+                for part_number in params[0] for row in self.db.first_static_part(part_number)
+            ]
+        elif "batch_idx" in sql:
+            idx, embeddings, top_ks, min_sims = params
+            self._rows = [
+                dict(row, batch_idx=i)
+                for i, embedding, top_k, min_sim in zip(idx, embeddings, top_ks, min_sims)
+                for row in self.db.specs_vector(embedding, top_k, min_sim)
+            ]
+        elif "get_parts_by_first_static_part_vector_poc" in sql:
+            self._rows = self.db.first_static_part(params[0])
+        elif "get_parts_by_specs_vector_poc" in sql:
+            self._rows = self.db.specs_vector(*params)
+        else:
+            raise NotImplementedError(f"FakeCursor cannot run: {sql.strip()[:80]}")
+        columns = list(self._rows[0]) if self._rows else []
+        self.description = [(name,) for name in columns]
+
+    def _shape(self, row):
+        return row if self.as_dict else tuple(row.values())
+
+    def fetchall(self):
+        return [self._shape(row) for row in self._rows]
+
+    def __iter__(self):
+        return (self._shape(row) for row in self._rows)
+
+    def close(self):
+        self._rows = []
+
+
+class FakeConnection:
+    def __init__(self, db: FakeVectorDatabase):
+        self.db = db
+        self.closed = 0
+
+    def cursor(self, name=None, cursor_factory=None):
+        return FakeCursor(self.db, as_dict=cursor_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeDatabasePool(DatabasePool):
+    """DatabasePool whose connections are served by a FakeVectorDatabase."""
+
+    def __init__(self, db: FakeVectorDatabase, max_size: int = 10):
+        super().__init__({}, min_size=1, max_size=max_size)
+        self.db = db
+
+    def open(self) -> None:
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix="fake-db")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self.db)
+
+
+def install_fake_backend(rows: List[Dict[str, Any]], use_catalog: bool = True, latency_ms: float = 0.0, pool_size: int = 10,
+                         benchmark_log_path: str = "loadtest_benchmark_log.jsonl"):
+    """
+    Point notebooks.refracting at an in-memory backend. Returns the app.
+    RPC benchmark entries go to benchmark_log_path, not the production log.
+    """
+    from . import refracting
+    from .manual_match import log_rpc_benchmark_vector_poc
+    from .template_catalog import InMemoryTemplateSource
+    fake_pool = FakeDatabasePool(FakeVectorDatabase(rows, latency_ms=latency_ms), max_size=pool_size)
+    refracting.db_pool = fake_pool
+    refracting.log_rpc_benchmark_vector_poc = functools.partial(log_rpc_benchmark_vector_poc, output_log_path=benchmark_log_path)
+    refracting.USE_TEMPLATE_CATALOG = use_catalog
+    refracting.template_catalog.source = InMemoryTemplateSource(rows)
+    refracting.template_catalog.loaded = False
+    refracting.result_cache.invalidate()
+    return refracting.app
+
+
+def generate_requests(rows: List[Dict[str, Any]], n: int, seed: int = 11, zipf_s: float = 1.1,
+                      brand_ratio: float = 0.5, invalid_ratio: float = 0.05, unknown_ratio: float = 0.02) -> List[Dict[str, Any]]:
+    """
+    Request bodies with a skewed template popularity (Zipf), random in-range
+    values, and a share of out-of-range and unknown part numbers.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** zipf_s for rank in range(len(rows))]
+    order = list(range(len(rows)))
+    rng.shuffle(order)
+    picks = rng.choices(order, weights=weights, k=n)
+    requests = []
+    for i in picks:
+        row = rows[i]
+        roll = rng.random()
+        if roll < unknown_ratio:
+            part_number = f"UNKNOWN{rng.randint(0, 10**6)}"
+        elif row["ranges_json"]:
+            r = row["ranges_json"][0]
+            value = r["end"] + 1 if roll < unknown_ratio + invalid_ratio else rng.randint(r["start"], r["end"])
+            part_number = re.sub(r"\[[^\]]+\]", str(value), row["part_number"])
+        else:
+            part_number = row["part_number"]
+        body = {"part_number": part_number}
+        if rng.random() < brand_ratio:
+            body["brand"] = row["brand"]
+        requests.append(body)
+    return requests
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for part in header.split(","):
+        name, _, rest = part.strip().partition(";dur=")
+        if rest:
+            try:
+                timings[name] = float(rest)
+            except ValueError:
+                pass
+    return timings
+
+
+async def run_load(client, requests: List[Dict[str, Any]], concurrency: int, path: str = "/match-parts") -> Dict[str, Any]:
+    """
+    Send requests with a fixed number of concurrent clients and summarise the results.
+    """
+    latency = LatencyHistogram()
+    stages: Dict[str, LatencyHistogram] = {}
+    outcomes = {"ok": 0, "error_response": 0, "http_error": 0}
+    queue: asyncio.Queue = asyncio.Queue()
+    for body in requests:
+        queue.put_nowait(body)
+
+    async def worker():
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+            except Exception:
+                outcomes["http_error"] += 1
+                continue
+            latency.observe((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                outcomes["http_error"] += 1
+                continue
+            payload = response.json()
+            outcomes["error_response" if isinstance(payload, dict) and "error" in payload else "ok"] += 1
+            for name, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                stages.setdefault(name, LatencyHistogram()).observe(ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(requests) / elapsed, 1) if elapsed else None,
+        "outcomes": outcomes,
+        "latency": latency.summary(),
+        "stages": {name: h.summary() for name, h in stages.items()},
+    }
+
+
+async def run_http_benchmark(args) -> Dict[str, Any]:
+    import httpx
+    rows = build_synthetic_catalog(args.templates, dim=args.dim, seed=args.seed)
+    requests = generate_requests(rows, args.requests, seed=args.seed)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            return await run_load(client, requests, args.concurrency)
+
+    from . import refracting
+    app = install_fake_backend(rows, use_catalog=not args.no_catalog, latency_ms=args.db_latency_ms,
+                               pool_size=args.pool_size, benchmark_log_path=args.benchmark_log)
+    async with refracting.lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            if args.warmup:
+                await run_load(client, requests[:args.warmup], args.concurrency)
+            report = await run_load(client, requests, args.concurrency)
+            report["server_metrics"] = (await client.get("/metrics")).json()
+            return report
+
+
+def _time_per_call(fn, repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "calls": repeat,
+        "p50_us": round(samples[len(samples) // 2], 2),
+        "p95_us": round(samples[int(len(samples) * 0.95) - 1], 2),
+        "mean_us": round(sum(samples) / len(samples), 2),
+    }
+
+
+def run_micro_benchmarks(args) -> Dict[str, Any]:
+    """
+    Per-call timings of validate_user_input and full_part_number_pipeline on synthetic templates.
+    """
+    from .validator import validate_user_input, get_validator
+    from .mm_mapper import full_part_number_pipeline, compile_part_number_plan, apply_plans_batch
+    rows = [r for r in build_synthetic_catalog(args.templates, dim=args.dim, seed=args.seed) if r["ranges_json"]]
+    rng = random.Random(args.seed)
+    cases = []
+    for row in rows:
+        r = row["ranges_json"][0]
+        value = rng.randint(r["start"], r["end"])
+        cases.append((row, re.sub(r"\[[^\]]+\]", str(value), row["part_number"]), [float(value)]))
+    it = iter(range(10**12))
+
+    def pick():
+        return cases[next(it) % len(cases)]
+
+    def validate():
+        row, part_number, _ = pick()
+        validate_user_input(part_number, row["regex"], row["ranges_json"])
+
+    def compiled_validate():
+        row, part_number, _ = pick()
+        get_validator(row["id"], row["regex"], row["ranges_json"]).validate(part_number)
+
+    def pipeline():
+        row, _, data_list = pick()
+        full_part_number_pipeline(row["part_number"], row["specs"], row["specs"], data_list,
+                                  row["specs_part_number_mapper"], row["specs_part_number_mapper"])
+
+    plans = [compile_part_number_plan(r["part_number"], r["specs"], rows[0]["specs"],
+                                      rows[0]["specs_part_number_mapper"], r["specs_part_number_mapper"]) for r in rows]
+    data_list = cases[0][2]
+    batch_row = cases[0][0]
+    batch_validator = get_validator(batch_row["id"], batch_row["regex"], batch_row["ranges_json"])
+    batch_inputs = [re.sub(r"\[[^\]]+\]", str(rng.randint(0, 5000)), batch_row["part_number"]) for _ in range(1000)]
+    return {
+        "validate_user_input": _time_per_call(validate, args.repeat),
+        "template_validator": _time_per_call(compiled_validate, args.repeat),
+        "validate_batch": {
+            "part_numbers": len(batch_inputs),
+            **_time_per_call(lambda: batch_validator.validate_batch(batch_inputs), max(args.repeat // 100, 5)),
+        },
+        "full_part_number_pipeline": _time_per_call(pipeline, args.repeat),
+        "plan_apply_loop": {
+            "candidates": len(plans),
+            **_time_per_call(lambda: [p.apply(data_list) for p in plans], max(args.repeat // 100, 5)),
+        },
+        "apply_plans_batch": {
+            "candidates": len(plans),
+            **_time_per_call(lambda: apply_plans_batch(plans, data_list), max(args.repeat // 100, 5)),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test and micro-benchmark the match API.")
+    parser.add_argument("--templates", type=int, default=1000, help="synthetic catalog size")
+    parser.add_argument("--dim", type=int, default=64, help="embedding dimension")
+    parser.add_argument("--seed", type=int, default=7)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    http_parser = subparsers.add_parser("http", help="drive /match-parts with concurrent clients")
+    http_parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    http_parser.add_argument("--requests", type=int, default=2000)
+    http_parser.add_argument("--concurrency", type=int, default=16)
+    http_parser.add_argument("--warmup", type=int, default=100)
+    http_parser.add_argument("--pool-size", type=int, default=10)
+    http_parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated latency per fake RPC")
+    http_parser.add_argument("--no-catalog", action="store_true", help="resolve templates through the RPC")
+    http_parser.add_argument("--benchmark-log", default="loadtest_benchmark_log.jsonl", help="RPC benchmark log for the in-process run")
+    http_parser.add_argument("--verbose", action="store_true", help="keep the app's per-request prints")
+
+    micro_parser = subparsers.add_parser("micro", help="micro-benchmarks of the mapping stages")
+    micro_parser.add_argument("--repeat", type=int, default=20000)
+
+    args = parser.parse_args(argv)
+    if args.command == "micro":
+        report = run_micro_benchmarks(args)
+    else:
+        quiet = contextlib.nullcontext() if args.verbose or args.url else contextlib.redirect_stdout(None)
+        with quiet:
+            report = asyncio.run(run_http_benchmark(args))
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,9 @@
 import os
 import time
-import json
 import psycopg2
 from datetime import datetime
 from dotenv import load_dotenv
+from .telemetry import get_benchmark_writer
 
 # Load environment variables if needed
 load_dotenv()
@@ -48,9 +48,8 @@ def log_rpc_benchmark_vector(part_number: str, output_log_path="rpc_benchmark_lo
             "max_server_duration_ms": max(server_durations) if server_durations else None
         }
 
-        # Save to log file
-        with open(output_log_path, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        # Queue for the background log writer; never blocks the request
+        get_benchmark_writer(output_log_path).log(log_entry)
 
         cursor.close()
         conn.close()
@@ -61,12 +60,15 @@ def log_rpc_benchmark_vector(part_number: str, output_log_path="rpc_benchmark_lo
         print("❌ Error during PostgreSQL RPC:", e)
         return []
 
-def log_rpc_benchmark_vector_poc(part_number: str, output_log_path="rpc_benchmark_log.jsonl"):
+def log_rpc_benchmark_vector_poc(part_number: str, output_log_path="rpc_benchmark_log.jsonl", conn=None):
     start_time = time.time()
+    # A pooled connection is borrowed, not owned: leave it open for the pool.
+    owns_conn = conn is None
 
     try:
         # Connect to PostgreSQL
-        conn = psycopg2.connect(**DB_CONFIG)
+        if owns_conn:
+            conn = psycopg2.connect(**DB_CONFIG)
         cursor = conn.cursor()
         # part_number = get_static_part(part_number)
         # print(part_number)
@@ -93,12 +95,12 @@ def log_rpc_benchmark_vector_poc(part_number: str, output_log_path="rpc_benchmar
             "max_server_duration_ms": max(server_durations) if server_durations else None
         }
 
-        # Save to log file
-        with open(output_log_path, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        # Queue for the background log writer; never blocks the request
+        get_benchmark_writer(output_log_path).log(log_entry)
 
         cursor.close()
-        conn.close()
+        if owns_conn:
+            conn.close()
 
         return result_dicts
 
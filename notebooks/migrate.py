@@ -0,0 +1,101 @@
+import os
+import re
+import sys
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+from typing import Optional, List, Tuple
+
+# Applies sql/migrations/NNNN_*.sql in order
+#
+#   python -m notebooks.migrate            # apply pending migrations
+#   python -m notebooks.migrate --status   # list applied / pending
+#   EMBEDDING_DIM=384 python -m notebooks.migrate   # embedding model with 384 dims
+#
+# Each migration records itself in schema_migrations, so databases created
+# from sql/init_pgvector_schema.sql are recognised as up to date.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql", "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_.+\.sql$")
+
+
+def list_migrations(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str]]:
+    """(version, path) of every migration file, in version order."""
+    migrations = []
+    for name in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(name)
+        if match:
+            migrations.append((match.group(1), os.path.join(directory, name)))
+    return migrations
+
+
+def applied_versions(conn) -> set:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations')")
+        if cursor.fetchone()[0] is None:
+            return set()
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, directory: str = MIGRATIONS_DIR, dry_run: bool = False, embedding_dim: int = 768) -> List[str]:
+    """
+    Apply pending migrations, each in its own transaction. Returns the applied versions.
+    embedding_dim is the dimension of parts.specs_embedding and must match the embedding model.
+    """
+    done = applied_versions(conn)
+    applied = []
+    with conn.cursor() as cursor:
+        # Read by 0001 when it creates the embedding column
+        cursor.execute("SELECT set_config('parts.embedding_dim', %s, false)", (str(embedding_dim),))
+    conn.commit()
+    for version, path in list_migrations(directory):
+        if version in done:
+            continue
+        print(f"➡️ Applying {os.path.basename(path)}")
+        if dry_run:
+            applied.append(version)
+            continue
+        with open(path) as f:
+            sql = f.read()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Migration {version} failed: {e}")
+            raise
+        applied.append(version)
+    return applied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply the pgvector schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--dry-run", action="store_true", help="show what would be applied")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        dbname=os.getenv("DB_NAME", "postgres"),
+        user=os.getenv("DB_USER", "myuser"),
+        password=os.getenv("DB_PASSWORD", "mypassword"),
+    )
+    try:
+        if args.status:
+            done = applied_versions(conn)
+            for version, path in list_migrations():
+                print(f"{'✅' if version in done else '⏳'} {os.path.basename(path)}")
+            return 0
+        applied = migrate(conn, dry_run=args.dry_run, embedding_dim=int(os.getenv("EMBEDDING_DIM", 768)))
+        print(f"✅ {len(applied)} migration(s) {'pending' if args.dry_run else 'applied'}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,162 +1,403 @@
 import re
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
 
-def full_part_number_pipeline(
-    output_range_partnumber: str,
-    output_specs: dict,
-    input_specs: dict, 
-    data_list: list = [],
-    input_map: dict = {},
-    output_map: dict = {},
-   
-):
-    # print(output_range_partnumber)
-    # print(output_specs)
-    # print(input_specs)
-    # print(data_list)
-    # print(input_map)
-    # print(output_map)
-    # ✅ Early return if data_list is empty
-    if not data_list:
-        return input_specs or {}, output_specs, output_range_partnumber
+# Placeholder such as "[130-3000/1]" and the characters kept when reading a number out of a spec
+PLACEHOLDER_PATTERN = re.compile(r'\[.*?\]')
+NON_NUMERIC_PATTERN = re.compile(r"[^\d.]")
 
-    # ✅ Step 1: Update input_specs using input_map and data_list
-    def update_input_specs_with_map():
-        if not input_specs or not input_map:
-            return input_specs or {}
 
-        updated = input_specs.copy()
-        for i, (key, transform_rule) in enumerate(input_map.items()):
-            if key not in updated or i >= len(data_list):
-                continue
+@lru_cache(maxsize=4096)
+def _numeric_chars(text: str) -> str:
+    # Same as NON_NUMERIC_PATTERN.sub("", text): \d is a Unicode decimal digit
+    return "".join(c for c in text if c == "." or c.isdecimal())
 
-            value = data_list[i]
 
-            # Apply transformation
-            if transform_rule == 1:
-                transformed = value
-            elif isinstance(transform_rule, int):
-                transformed = value * transform_rule
-            elif isinstance(transform_rule, str):
-                try:
-                    delta = int(transform_rule)
-                    transformed = value + delta
-                except ValueError:
+def _scale(val: float, factor):
+    result = val * factor
+    return int(result) if result.is_integer() else result
+
+
+class PartNumberPlan:
+    """
+    Precompiled form of full_part_number_pipeline for one
+    (input_map, output_map, output_specs, part-number template) combination.
+
+    Placeholders are pre-split into static segments and every transform
+    rule is resolved once, so apply() only does arithmetic and string joins.
+    """
+
+    def __init__(
+        self,
+        output_range_partnumber: str,
+        output_specs: dict,
+        input_specs: dict,
+        input_map: dict = {},
+        output_map: dict = {},
+    ):
+        self.output_range_partnumber = output_range_partnumber
+        self.output_specs = output_specs
+        self.input_specs = input_specs
+        self.input_map = input_map
+        self.output_map = output_map
+
+        # ✅ Step 1: input spec rules as (data index, key, kind, arg, segments)
+        self.input_rules = []
+        if input_specs and input_map:
+            for i, (key, transform_rule) in enumerate(input_map.items()):
+                if key not in input_specs:
                     continue
-            else:
-                continue
+                if transform_rule == 1:
+                    kind, arg = "identity", None
+                elif isinstance(transform_rule, int):
+                    kind, arg = "mul", transform_rule
+                elif isinstance(transform_rule, str):
+                    try:
+                        kind, arg = "add", int(transform_rule)
+                    except ValueError:
+                        continue
+                else:
+                    continue
+                original_val = input_specs[key]
+                if isinstance(original_val, str) and '[' in original_val and ']' in original_val:
+                    segments = PLACEHOLDER_PATTERN.split(original_val)
+                else:
+                    segments = None
+                self.input_rules.append((i, key, kind, arg, segments))
 
-            # Only replace content inside [] if it exists
-            original_val = updated[key]
-            if isinstance(original_val, str) and '[' in original_val and ']' in original_val:
-                updated[key] = re.sub(r'\[.*?\]', str(transformed), original_val)
-            else:
-                updated[key] = str(transformed)
-
-        return updated
-
-
-    # ✅ Step 2: Apply transformation to input values for output specs
-    def apply_data_with_mixed_mapping():
-        if not input_map:
-            return None
-        input_keys = list(input_map.keys())
-        if len(data_list) != len(input_keys):
-            raise ValueError("Length of data_list must match number of keys in input_map.")
-        
-        updated = {}
-        for i, key in enumerate(input_keys):
-            val = data_list[i]
-            map_val = input_map[key]
-            if isinstance(map_val, str):
-                updated[key] = val + int(map_val)
-            else:
-                updated[key] = val * map_val
-        return updated
-
-    # ✅ Step 3: Update output_specs with those modified values
-    def update_output_specs_with_values(modified_values):
-        if not modified_values:
-            return update_specs_directly_with_data_list()
-        updated = output_specs.copy()
-        for key, value in modified_values.items():
-            if key in updated:
-                original = updated[key]
-                updated[key] = re.sub(r'\[.*?\]', str(value), original)
-        return updated
-
-    # ✅ Step 4: If no maps, just replace values inside [] directly using data_list
-    def update_specs_directly_with_data_list():
-        updated = output_specs.copy()
-        i = 0
-        for key in updated:
-            val = updated[key]
-            if isinstance(val, str) and '[' in val and ']' in val and i < len(data_list):
-                updated[key] = re.sub(r'\[.*?\]', str(data_list[i]), val)
-                i += 1
-        return updated
-
-    # ✅ Step 5: Build output_map from modified specs
-    def update_output_map_from_specs(modified_specs):
-        if not output_map:
-            return update_map_directly_with_data_list(modified_specs)
-        new_output_map = {}
-        for key, factor in output_map.items():
-            if key in modified_specs:
+        # ✅ Step 2: mixed mapping of data values as (key, is_offset, arg)
+        self.mixed_rules = None
+        if input_map:
+            self.mixed_rules = []
+            for key, map_val in input_map.items():
+                if isinstance(map_val, str):
+                    try:
+                        self.mixed_rules.append((key, True, int(map_val)))
+                    except ValueError:
+                        # Kept raw so apply() raises like the original int() call
+                        self.mixed_rules.append((key, None, map_val))
+                else:
+                    self.mixed_rules.append((key, False, map_val))
+
+        # ✅ Step 3/4: output spec placeholders, split into static segments
+        self.output_segments = {}
+        for key, val in output_specs.items():
+            if isinstance(val, str):
+                self.output_segments[key] = PLACEHOLDER_PATTERN.split(val)
+        # Keys replaced from data_list positionally when there is no input_map
+        self.direct_keys = [
+            key for key, val in output_specs.items()
+            if isinstance(val, str) and '[' in val and ']' in val
+        ]
+
+        # ✅ Step 5: numeric view of each output spec, static and per segment
+        self.numeric_segments = {key: [_numeric_chars(s) for s in segs] for key, segs in self.output_segments.items()}
+        # output_map entries NumPy can scale exactly like Python: (key, factor, numeric segments)
+        self.vector_scaled = [
+            (key, factor, self.numeric_segments[key]) for key, factor in (output_map or {}).items()
+            if key in self.numeric_segments and isinstance(factor, (int, float)) and not isinstance(factor, bool)
+        ]
+        self.segments_have_bracket = {key: any('[' in s for s in segs) for key, segs in self.output_segments.items()}
+        self.static_output_map = {}
+        for key, factor in (output_map or {}).items():
+            if key in output_specs:
                 try:
-                    val = float(re.sub(r"[^\d.]", "", modified_specs[key]))
-                    result = val * factor
-                    new_output_map[key] = int(result) if result.is_integer() else result
+                    val = float(NON_NUMERIC_PATTERN.sub("", output_specs[key]))
+                    self.static_output_map[key] = _scale(val, factor)
                 except (ValueError, TypeError):
-                    new_output_map[key] = output_map[key]
+                    self.static_output_map[key] = output_map[key]
             else:
-                new_output_map[key] = output_map[key]
-        return new_output_map
+                self.static_output_map[key] = output_map[key]
+        # Direct-map classification of unmodified specs: ("int", n), ("bracket", None) or None
+        self.static_direct = {}
+        for key, val in output_specs.items():
+            if isinstance(val, str) and '[' not in val:
+                num_part = NON_NUMERIC_PATTERN.sub("", val)
+                self.static_direct[key] = ("int", int(num_part)) if num_part.isdigit() else None
+            elif isinstance(val, str) and '[' in val:
+                self.static_direct[key] = ("bracket", None)
+            else:
+                self.static_direct[key] = None
+
+        # ✅ Step 6: part-number template split around its placeholders
+        self.partnumber_brackets = PLACEHOLDER_PATTERN.findall(output_range_partnumber)
+        self.partnumber_segments = PLACEHOLDER_PATTERN.split(output_range_partnumber)
+
+    def apply(self, data_list: list):
+        """
+        Returns (updated_input_specs, updated_output_specs, final_partnumber)
+        exactly as full_part_number_pipeline does.
+        """
+        if not data_list:
+            return self.input_specs or {}, self.output_specs, self.output_range_partnumber
+        updated_input_specs, modified_input_values = self.apply_input_side(data_list)
+        updated_output_specs, replaced = self.apply_output_specs(data_list, modified_input_values)
+        final_output_map = self.build_output_map(data_list, updated_output_specs, replaced)
+        return updated_input_specs, updated_output_specs, self.format_partnumber(final_output_map)
 
-    def update_map_directly_with_data_list(modified_specs):
-        result = {}
+    def apply_input_side(self, data_list: list):
+        """
+        Steps 1 and 2, which depend only on the input template and data_list.
+        Returns (updated_input_specs, modified_input_values).
+        """
+        input_specs = self.input_specs
+        n = len(data_list)
+
+        # Step 1: update input_specs using input_map and data_list
+        if not input_specs or not self.input_map:
+            updated_input_specs = input_specs or {}
+        else:
+            updated_input_specs = input_specs.copy()
+            for i, key, kind, arg, segments in self.input_rules:
+                if i >= n:
+                    continue
+                value = data_list[i]
+                if kind == "identity":
+                    transformed = value
+                elif kind == "mul":
+                    transformed = value * arg
+                else:
+                    transformed = value + arg
+                text = str(transformed)
+                updated_input_specs[key] = text.join(segments) if segments is not None else text
+
+        # Step 2: apply transformation to input values for output specs
+        modified_input_values = None
+        if self.mixed_rules is not None:
+            if n != len(self.mixed_rules):
+                raise ValueError("Length of data_list must match number of keys in input_map.")
+            modified_input_values = {}
+            for i, (key, is_offset, arg) in enumerate(self.mixed_rules):
+                val = data_list[i]
+                if is_offset is None:
+                    modified_input_values[key] = val + int(arg)
+                elif is_offset:
+                    modified_input_values[key] = val + arg
+                else:
+                    modified_input_values[key] = val * arg
+
+        return updated_input_specs, modified_input_values
+
+    def apply_output_specs(self, data_list: list, modified_input_values):
+        """
+        Steps 3 and 4. Returns (updated_output_specs, replaced) where replaced
+        maps each rewritten spec key to the text put into its placeholders.
+        """
+        output_specs = self.output_specs
+        updated_output_specs = output_specs.copy()
+        replaced = {}
+        if modified_input_values:
+            for key, value in modified_input_values.items():
+                if key in updated_output_specs:
+                    segments = self.output_segments.get(key)
+                    if segments is None:
+                        # Non-string spec: fail the same way re.sub would
+                        PLACEHOLDER_PATTERN.sub(str(value), output_specs[key])
+                    text = str(value)
+                    updated_output_specs[key] = text.join(segments)
+                    replaced[key] = text
+        else:
+            for i, key in enumerate(self.direct_keys[:len(data_list)]):
+                text = str(data_list[i])
+                updated_output_specs[key] = text.join(self.output_segments[key])
+                replaced[key] = text
+        return updated_output_specs, replaced
+
+    def build_output_map(self, data_list: list, updated_output_specs: dict, replaced: dict, scaled: dict = None):
+        """
+        Step 5. scaled optionally carries output_map values already computed
+        in bulk by apply_plans_batch.
+        """
+        n = len(data_list)
+        if self.output_map:
+            final_output_map = {}
+            for key, factor in self.output_map.items():
+                if key not in replaced:
+                    final_output_map[key] = self.static_output_map[key]
+                elif scaled is not None and key in scaled:
+                    final_output_map[key] = scaled[key]
+                else:
+                    try:
+                        val = float(_numeric_chars(replaced[key]).join(self.numeric_segments[key]))
+                        final_output_map[key] = _scale(val, factor)
+                    except (ValueError, TypeError):
+                        final_output_map[key] = self.output_map[key]
+            return final_output_map
+
+        final_output_map = {}
         i = 0
-        for key in modified_specs:
-            if i >= len(data_list):
+        for key in updated_output_specs:
+            if i >= n:
                 break
-            val = modified_specs[key]
-            if isinstance(val, str) and '[' not in val:
-                num_part = re.sub(r"[^\d.]", "", val)
+            if key in replaced:
+                if self.segments_have_bracket[key]:
+                    final_output_map[key] = data_list[i]
+                    i += 1
+                    continue
+                num_part = _numeric_chars(replaced[key]).join(self.numeric_segments[key])
                 if num_part.isdigit():
-                    result[key] = int(num_part)
+                    final_output_map[key] = int(num_part)
                     i += 1
-            elif isinstance(val, str) and '[' in val:
-                result[key] = data_list[i]
-                i += 1
-        return result
+                continue
+            static = self.static_direct[key]
+            if static is None:
+                continue
+            final_output_map[key] = static[1] if static[0] == "int" else data_list[i]
+            i += 1
+        return final_output_map
 
-    # ✅ Step 6: Replace placeholders in part number string
-    def replace_placeholders_in_partnumber(updated_output_map):
-        brackets = re.findall(r"\[.*?\]", output_range_partnumber)
-        values = list(updated_output_map.values())
+    def format_partnumber(self, final_output_map: dict) -> str:
+        """Step 6: replace placeholders in part number string."""
+        values = list(final_output_map.values())
+        brackets = self.partnumber_brackets
+        segments = self.partnumber_segments
+        parts = [segments[0]]
+        for i, bracket in enumerate(brackets):
+            parts.append(str(values[i]) if i < len(values) else bracket)
+            parts.append(segments[i + 1])
+        if len(values) < len(brackets):
+            print(f"⚠️ Warning: Only replaced {len(values)} of {len(brackets)} placeholders in part number.")
+        return "".join(parts)
 
-        result = output_range_partnumber
 
-        # Replace as many placeholders as we have values for
-        for i, val in enumerate(values):
-            if i < len(brackets):
-                result = result.replace(brackets[i], str(val), 1)
+def compile_part_number_plan(
+    output_range_partnumber: str,
+    output_specs: dict,
+    input_specs: dict,
+    input_map: dict = {},
+    output_map: dict = {},
+) -> PartNumberPlan:
+    return PartNumberPlan(output_range_partnumber, output_specs, input_specs, input_map, output_map)
 
-        # If fewer values than brackets, the remaining brackets will stay
-        if len(values) < len(brackets):
-            print(f"⚠️ Warning: Only replaced {len(values)} of {len(brackets)} placeholders in part number.")
 
-        return result
+# Plans per (input template, output template) pair, least recently used evicted first
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", 4096))
+_plan_cache = OrderedDict()
+# Request threads and the catalog refresh share the cache
+_plan_cache_lock = threading.Lock()
+
 
+def mapping_fingerprint(row: dict) -> str:
+    """Hash of the template fields a plan is compiled from: part number, specs and mapper."""
+    content = [row.get("part_number"), row.get("specs"), row.get("specs_part_number_mapper")]
+    # Not sort_keys: the order of specs and mapper keys changes the plan
+    return hashlib.blake2b(json.dumps(content, default=str).encode(), digest_size=16).hexdigest()
 
 
-    # === Pipeline execution ===
-    updated_input_specs = update_input_specs_with_map()
-    modified_input_values = apply_data_with_mixed_mapping()
-    updated_output_specs = update_output_specs_with_values(modified_input_values)
-    final_output_map = update_output_map_from_specs(updated_output_specs)
-    final_partnumber = replace_placeholders_in_partnumber(final_output_map)
+def get_part_number_plan(
+    cache_key,
+    output_range_partnumber: str,
+    output_specs: dict,
+    input_specs: dict,
+    input_map: dict = {},
+    output_map: dict = {},
+) -> PartNumberPlan:
+    """
+    Cached compile_part_number_plan. cache_key must identify the template
+    pair and their content (see mapping_fingerprint), so rows read fresh
+    from the RPC never reuse a plan compiled from an older version.
+    """
+    with _plan_cache_lock:
+        plan = _plan_cache.get(cache_key)
+        if plan is not None:
+            _plan_cache.move_to_end(cache_key)
+            return plan
+    # Compiled outside the lock; a concurrent miss compiles an identical plan
+    plan = compile_part_number_plan(output_range_partnumber, output_specs, input_specs, input_map, output_map)
+    with _plan_cache_lock:
+        _plan_cache[cache_key] = plan
+        if len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def clear_plan_cache() -> None:
+    with _plan_cache_lock:
+        _plan_cache.clear()
+
+
+def apply_plans_batch(plans: list, data_list: list) -> list:
+    """
+    Apply many plans to one data_list, e.g. every candidate match of an input part.
+
+    The input-side steps run once per distinct input template, and every
+    output_map multiply is gathered into arrays and computed in a single
+    NumPy pass. Returns one (updated_input_specs, updated_output_specs,
+    final_partnumber) tuple per plan, identical to plan.apply(data_list).
+    """
+    if not data_list:
+        return [plan.apply(data_list) for plan in plans]
+
+    # Steps 1-4, sharing the input side between plans of the same input template
+    input_sides = {}
+    staged = []
+    for plan in plans:
+        input_key = (id(plan.input_specs), id(plan.input_map))
+        if input_key not in input_sides:
+            input_sides[input_key] = plan.apply_input_side(data_list)
+        updated_input_specs, modified_input_values = input_sides[input_key]
+        updated_output_specs, replaced = plan.apply_output_specs(data_list, modified_input_values)
+        staged.append((updated_input_specs, updated_output_specs, replaced))
+
+    # Step 5 arithmetic, vectorized over every (plan, key) entry
+    # Anything NumPy would not multiply exactly like Python is left to the scalar path
+    parsed = {}
+    rows, keys, values, factors = [], [], [], []
+    for row, (plan, (_, _, replaced)) in enumerate(zip(plans, staged)):
+        for key, factor, numeric_segments in plan.vector_scaled:
+            text = replaced.get(key)
+            if text is None:
+                continue
+            numeric_text = _numeric_chars(text).join(numeric_segments)
+            value = parsed.get(numeric_text, False)
+            if value is False:
+                try:
+                    value = float(numeric_text)
+                except ValueError:
+                    value = None
+                parsed[numeric_text] = value
+            if value is None:
+                continue
+            rows.append(row)
+            keys.append(key)
+            values.append(value)
+            factors.append(factor)
+
+    scaled = [dict() for _ in plans]
+    if rows:
+        products = np.asarray(values, dtype=np.float64) * np.asarray(factors, dtype=np.float64)
+        is_integer = np.isfinite(products) & (products == np.floor(products))
+        for row, key, product, integral in zip(rows, keys, products.tolist(), is_integer.tolist()):
+            scaled[row][key] = int(product) if integral else product
+
+    # Step 6, formatting every part number from the precomputed maps
+    results = []
+    for plan, (updated_input_specs, updated_output_specs, replaced), plan_scaled in zip(plans, staged, scaled):
+        final_output_map = plan.build_output_map(data_list, updated_output_specs, replaced, plan_scaled)
+        results.append((updated_input_specs, updated_output_specs, plan.format_partnumber(final_output_map)))
+    return results
+
+
+def full_part_number_pipeline(
+    output_range_partnumber: str,
+    output_specs: dict,
+    input_specs: dict, 
+    data_list: list = [],
+    input_map: dict = {},
+    output_map: dict = {},
+   
+):
+    # ✅ Early return if data_list is empty
+    if not data_list:
+        return input_specs or {}, output_specs, output_range_partnumber
 
-    return updated_input_specs, updated_output_specs, final_partnumber
+    plan = compile_part_number_plan(output_range_partnumber, output_specs, input_specs, input_map, output_map)
+    return plan.apply(data_list)
 input_specs = {
     "accuracy": "normal grade",
     "rail width": "37mm",
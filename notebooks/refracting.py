@@ -2,17 +2,35 @@ import os
 import json
 import re
 import asyncio
+import uuid
+import threading
+import time
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from pgvector.psycopg2 import register_vector
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from datetime import timedelta
 from collections import defaultdict
-from typing import Optional, List, Dict, Any, Tuple
+from contextlib import asynccontextmanager
+from itertools import chain, islice
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Iterator, Literal
+from .db_pool import pool_from_env
 from .manual_match import log_rpc_benchmark_vector_poc
-from .validator import validate_user_input
-from .mm_mapper import full_part_number_pipeline
+from .telemetry import close_benchmark_writers, benchmark_writer_stats
+from .instrumentation import metrics, stage, record_stage, start_request_timings, reset_request_timings, server_timing_header
+from .template_registry import TemplateRegistry, compile_pattern
+from .template_catalog import TemplateCatalog, PostgresTemplateSource, template_key
+from .catalog_snapshot import SnapshotTemplateSource
+from .result_cache import cache_from_env
+from .validator import get_validator, clear_validator_cache
+from .mm_mapper import get_part_number_plan, clear_plan_cache, apply_plans_batch, mapping_fingerprint
+from .vector_recall import VERIFY_MODES, oversampled_search, exact_rerank
+from .vector_index import VectorIndex, LocalVectorBackend
+from .static_parts import StaticPartIndex
+from .equivalence_job import EquivalenceTable
 
 # Load environment variables
 load_dotenv()
@@ -26,159 +44,769 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD", "mypassword")
 }
 
-app = FastAPI(title="Vector Match API", version="1.0")
+# Shared connection pool, opened at startup and closed on shutdown
+db_pool = pool_from_env(DB_CONFIG)
+
+# In-memory template metadata; set TEMPLATE_CATALOG=0 to query the RPC per request
+USE_TEMPLATE_CATALOG = os.getenv("TEMPLATE_CATALOG", "1") == "1"
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", 30))
+# Each refresh re-reads this many seconds before the watermark (late commits);
+# a full comparison every CATALOG_RECONCILE_SECONDS applies deletes
+CATALOG_REFRESH_OVERLAP_SECONDS = float(os.getenv("CATALOG_REFRESH_OVERLAP_SECONDS", 60))
+CATALOG_RECONCILE_SECONDS = float(os.getenv("CATALOG_RECONCILE_SECONDS", 600))
+# A compact snapshot (python -m notebooks.catalog_snapshot build) makes the
+# initial load a file mmap; later changes still come from Postgres
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT")
+if CATALOG_SNAPSHOT and os.path.exists(CATALOG_SNAPSHOT):
+    template_source = SnapshotTemplateSource(CATALOG_SNAPSHOT, PostgresTemplateSource(db_pool))
+else:
+    template_source = PostgresTemplateSource(db_pool)
+template_catalog = TemplateCatalog(template_source, overlap=timedelta(seconds=CATALOG_REFRESH_OVERLAP_SECONDS))
+
+# Neighbour sets shared by every part number of a template; any catalog
+# change can alter neighbours of other templates, so it clears the cache
+result_cache = cache_from_env()
+template_catalog.add_listener(lambda changed: result_cache.invalidate())
+template_catalog.add_listener(lambda changed: clear_plan_cache())
+template_catalog.add_listener(lambda changed: clear_validator_cache())
+
+# Similarity search backend: "pgvector" (the RPC) or "local" (in-process index
+# over the catalog embeddings, optionally memory-mapped from a snapshot)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pgvector")
+VECTOR_INDEX_SNAPSHOT = os.getenv("VECTOR_INDEX_SNAPSHOT")
+VECTOR_INDEX_IVF_LISTS = int(os.getenv("VECTOR_INDEX_IVF_LISTS", 0))
+local_vector_backend = None
+if VECTOR_BACKEND == "local":
+    local_vector_backend = LocalVectorBackend(VectorIndex(), template_catalog, nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", 0)) or None)
+    template_catalog.add_listener(local_vector_backend.sync)
+
+def local_search_ready() -> bool:
+    return local_vector_backend is not None and local_vector_backend.ready
+
+# Candidate count from which the mapper runs in batched (NumPy) mode
+MAPPER_BATCH_THRESHOLD = int(os.getenv("MAPPER_BATCH_THRESHOLD", 256))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db_pool.open()
+    refresh_task = None
+    if local_vector_backend is not None and VECTOR_INDEX_SNAPSHOT and os.path.exists(os.path.join(VECTOR_INDEX_SNAPSHOT, "meta.json")):
+        local_vector_backend.index = VectorIndex.load(VECTOR_INDEX_SNAPSHOT)
+        print(f"✅ Vector index snapshot mapped: {len(local_vector_backend.index)} vectors")
+    if USE_TEMPLATE_CATALOG:
+        try:
+            count = await asyncio.to_thread(template_catalog.load)
+            print(f"✅ Template catalog loaded: {count} rows")
+            if local_vector_backend is not None and VECTOR_INDEX_IVF_LISTS and not local_vector_backend.index.is_ivf:
+                await asyncio.to_thread(local_vector_backend.index.train_ivf, VECTOR_INDEX_IVF_LISTS)
+            refresh_task = asyncio.create_task(template_catalog.refresh_forever(CATALOG_REFRESH_SECONDS, CATALOG_RECONCILE_SECONDS))
+        except Exception as e:
+            print(f"❌ Error loading template catalog, falling back to RPC: {e}")
+    try:
+        yield
+    finally:
+        if refresh_task is not None:
+            refresh_task.cancel()
+        db_pool.close()
+        close_benchmark_writers()
+
+app = FastAPI(title="Vector Match API", version="1.0", lifespan=lifespan)
+
+@app.middleware("http")
+async def stage_timing_headers(request: Request, call_next):
+    """
+    Collect per-stage timings for the request and return them in a Server-Timing header.
+    """
+    timings, token = start_request_timings()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        reset_request_timings(token)
+    total_ms = (time.perf_counter() - start) * 1000
+    metrics.observe(f"request {request.url.path}", total_ms)
+    response.headers["Server-Timing"] = server_timing_header(timings, total_ms)
+    return response
 
 class MatchRequest(BaseModel):
     part_number: str
     brand: Optional[str] = None
     top_k: int = 5
     min_similarity: float = 0.99
+    # Rows to scan from the similarity search; defaults to top_k + 1
+    search_limit: Optional[int] = None
+    # Candidate filters, applied before the part-number transform
+    cross_brand_only: bool = False
+    perfect_match_only: bool = False
+    # Vector index search depth; default to VECTOR_EF_SEARCH / VECTOR_PROBES
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+    # Exact recheck of approximate results; defaults to VECTOR_VERIFY
+    verify: Optional[Literal["rerank", "exact"]] = None
 
-def find_similar_parts_local(embedding: List[float], top_k: int, min_similarity: float) -> List[Dict[str, Any]]:
+    def search_rows(self) -> int:
+        return self.search_limit or self.top_k + 1
+
+    def search_settings(self) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+        return (self.ef_search or VECTOR_EF_SEARCH, self.probes or VECTOR_PROBES, self.verify or VECTOR_VERIFY)
+
+# Search depth of the HNSW (hnsw.ef_search) or IVFFlat (ivfflat.probes)
+# index on parts.specs_embedding, see sql/migrations/0003_search_indexes.sql
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", 0)) or None
+VECTOR_PROBES = int(os.getenv("VECTOR_PROBES", 0)) or None
+# Default verification of approximate results: "rerank", "exact" or unset
+VECTOR_VERIFY = os.getenv("VECTOR_VERIFY") or None
+if VECTOR_VERIFY not in (None, *VERIFY_MODES):
+    raise ValueError(f"VECTOR_VERIFY must be one of {VERIFY_MODES}, got {VECTOR_VERIFY!r}")
+# pgvector's default hnsw.ef_search; an HNSW scan returns at most this many rows
+HNSW_DEFAULT_EF_SEARCH = 40
+# Largest hnsw.ef_search pgvector accepts
+HNSW_MAX_EF_SEARCH = 1000
+# Deeper fetches continue the scan with hnsw.iterative_scan (pgvector >= 0.8);
+# strict_order keeps rows in distance order. Set to "" on older pgvector,
+# where such fetches stop at HNSW_MAX_EF_SEARCH rows.
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "strict_order")
+
+def apply_search_settings(conn, top_k: int, ef_search: Optional[int] = None, probes: Optional[int] = None, exact: bool = False) -> None:
+    """
+    Set the index search depth for the current transaction. ef_search is
+    raised to top_k so the HNSW scan can return every requested row, up to
+    HNSW_MAX_EF_SEARCH; beyond that the scan is made iterative. exact
+    disables index scans and forces custom plans, so the statements inside
+    get_parts_by_specs_vector_poc are replanned without the vector index
+    instead of reusing a generic plan cached on the pooled connection.
+    Nothing is sent when the defaults already suffice.
+    """
+    settings = []
+    if exact:
+        settings.append(("enable_indexscan", "off"))
+        settings.append(("plan_cache_mode", "force_custom_plan"))
+    if ef_search or top_k > HNSW_DEFAULT_EF_SEARCH:
+        settings.append(("hnsw.ef_search", min(max(ef_search or HNSW_DEFAULT_EF_SEARCH, top_k), HNSW_MAX_EF_SEARCH)))
+    if top_k > HNSW_MAX_EF_SEARCH and HNSW_ITERATIVE_SCAN:
+        settings.append(("hnsw.iterative_scan", HNSW_ITERATIVE_SCAN))
+    if probes:
+        settings.append(("ivfflat.probes", probes))
+    if not settings:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT " + ", ".join("set_config(%s, %s, true)" for _ in settings),
+            [value for name, depth in settings for value in (name, str(depth))]
+        )
+    finally:
+        cursor.close()
+
+# Rows fetched per round-trip from the server-side similarity cursor
+SEARCH_FETCH_CHUNK = int(os.getenv("SEARCH_FETCH_CHUNK", 200))
+
+# Placeholder such as "[130-3000/1]" in a template part number
+RANGE_PLACEHOLDER = re.compile(r'\[[^\]]+\]')
+
+# Static part numbers (no placeholders) answered from an exact-key index and
+# neighbours precomputed after a load, and for the templates a refresh can
+# affect after every catalog change; set STATIC_FAST_PATH=0 to disable
+STATIC_FAST_PATH = os.getenv("STATIC_FAST_PATH", "1") == "1"
+STATIC_PRECOMPUTE_MIN_SIMILARITY = float(os.getenv("STATIC_PRECOMPUTE_MIN_SIMILARITY", 0.95))
+STATIC_PRECOMPUTE_DEPTH = int(os.getenv("STATIC_PRECOMPUTE_DEPTH", 50))
+DEFAULT_SEARCH_SETTINGS = (VECTOR_EF_SEARCH, VECTOR_PROBES, VECTOR_VERIFY)
+static_index = StaticPartIndex(RANGE_PLACEHOLDER) if STATIC_FAST_PATH else None
+
+def _default_search_batch(searches: List[Tuple[Any, int, float]]) -> List[List[Dict[str, Any]]]:
+    """Run searches with the default search settings, as a request without overrides would."""
+    ef_search, probes, verify = DEFAULT_SEARCH_SETTINGS
+    if local_search_ready():
+        return [local_vector_backend.search(e, k, m, probes=probes, exact=verify is not None) for e, k, m in searches]
+    fetch = [(e, *oversampled_search(k, m)) for e, k, m in searches] if verify == "rerank" else searches
+    results = db_pool.call(find_similar_parts_batch, fetch, ef_search=ef_search, probes=probes, exact=verify == "exact")
+    if verify == "rerank":
+        results = [exact_rerank(e, r, k, m) for (e, k, m), r in zip(searches, results)]
+    return results
+
+def precompute_static_matches(rows: Optional[List[Dict[str, Any]]] = None) -> None:
+    start = time.perf_counter()
+    try:
+        count = static_index.precompute(_default_search_batch, STATIC_PRECOMPUTE_MIN_SIMILARITY, STATIC_PRECOMPUTE_DEPTH,
+                                        BATCH_SEARCH_CHUNK, rows=rows)
+        print(f"✅ Static part matches precomputed: {count} templates in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"❌ Error precomputing static part matches: {e}")
+
+_static_index_loads = 0
+
+def _rebuild_static_index(changed: List[Dict[str, Any]]) -> None:
+    # A full load recomputes everything; a refresh only the templates it can affect
+    global _static_index_loads
+    if template_catalog.loads != _static_index_loads:
+        _static_index_loads = template_catalog.loads
+        static_index.build(template_catalog.rows.values())
+        stale = None
+    else:
+        stale = static_index.update(template_catalog.rows.values(), changed, STATIC_PRECOMPUTE_MIN_SIMILARITY)
+        if not stale:
+            return
+    threading.Thread(target=precompute_static_matches, args=(stale,), name="static-precompute", daemon=True).start()
+
+if static_index is not None:
+    template_catalog.add_listener(_rebuild_static_index)
+
+# Cross-brand equivalents materialised offline by notebooks.equivalence_job.
+# cross_brand_only requests are then answered without a similarity search:
+# they get the top_k equivalents of other brands rather than the other-brand
+# rows among the first search_rows() results. Templates changed since the
+# table was built, and requests with top_k above the table depth, fall back
+# to the live search.
+EQUIVALENCE_SNAPSHOT = os.getenv("EQUIVALENCE_SNAPSHOT")
+equivalence_table = None
+if EQUIVALENCE_SNAPSHOT and os.path.exists(os.path.join(EQUIVALENCE_SNAPSHOT, "meta.json")):
+    equivalence_table = EquivalenceTable.load(EQUIVALENCE_SNAPSHOT)
+    template_catalog.add_listener(equivalence_table.check)
+
+def find_similar_parts_local(embedding: List[float], top_k: int, min_similarity: float, conn=None,
+                             ef_search: Optional[int] = None, probes: Optional[int] = None,
+                             verify: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Query the database to find parts similar to the given embedding.
+    Uses the given pooled connection, or opens a one-off connection if none is passed.
+
+    verify="rerank" fetches oversampled ANN candidates and re-ranks them by
+    exact cosine similarity in NumPy, which reduces but does not rule out
+    neighbours lost near min_similarity; verify="exact" bypasses the vector
+    index and returns the true neighbours.
     """
+    if verify not in (None, *VERIFY_MODES):
+        raise ValueError(f"verify must be one of {VERIFY_MODES}, got {verify!r}")
+    if local_search_ready():
+        # Any verification mode makes the local index search exhaustively
+        return local_vector_backend.search(embedding, top_k, min_similarity, probes=probes, exact=verify is not None)
+    fetch_k, fetch_min = oversampled_search(top_k, min_similarity) if verify == "rerank" else (top_k, min_similarity)
+    owns_conn = conn is None
+    cursor = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        register_vector(conn)
+        if owns_conn:
+            conn = psycopg2.connect(**DB_CONFIG)
+            register_vector(conn)
+        apply_search_settings(conn, fetch_k, ef_search, probes, exact=verify == "exact")
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT * FROM get_parts_by_specs_vector_poc(%s, %s, %s)
-        """, (embedding, top_k, min_similarity))
+        """, (embedding, fetch_k, fetch_min))
         results = cursor.fetchall()
+        if verify == "rerank":
+            results = exact_rerank(embedding, results, top_k, min_similarity)
         return results
     except Exception as e:
         print(f"❌ Error querying database: {e}")
         raise HTTPException(status_code=500, detail="Database query failed")
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if owns_conn and conn is not None:
+            conn.close()
+
+def iter_similar_parts(embedding: List[float], top_k: int, min_similarity: float, conn=None, chunk_size: int = SEARCH_FETCH_CHUNK,
+                       ef_search: Optional[int] = None, probes: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield similar parts through a server-side cursor, fetching chunk_size rows per round-trip.
+    Closing the generator closes the cursor, so callers can stop early.
+    """
+    apply_search_settings(conn, top_k, ef_search, probes)
+    cursor = conn.cursor(name=f"similar_parts_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute("""
+            SELECT * FROM get_parts_by_specs_vector_poc(%s, %s, %s)
+        """, (embedding, top_k, min_similarity))
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+def _vector_literal(embedding) -> str:
+    if isinstance(embedding, str):
+        return embedding
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+def find_templates_batch(part_numbers: List[str], conn=None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run get_parts_by_first_static_part_vector_poc for many part numbers in one query.
+    Returns the template rows grouped by requested part number.
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("""
+            SELECT q.part_number AS batch_part_number, t.*
+            FROM unnest(%s::text[]) AS q(part_number)
+            CROSS JOIN LATERAL get_parts_by_first_static_part_vector_poc(q.part_number) AS t
+        """, (part_numbers,))
+        grouped = defaultdict(list)
+        for row in cursor.fetchall():
+            grouped[row.pop("batch_part_number")].append(row)
+        return grouped
+    finally:
+        cursor.close()
+
+def find_similar_parts_batch(searches: List[Tuple[Any, int, float]], conn=None,
+                             ef_search: Optional[int] = None, probes: Optional[int] = None,
+                             exact: bool = False) -> List[List[Dict[str, Any]]]:
+    """
+    Run get_parts_by_specs_vector_poc for many (embedding, top_k, min_similarity) searches in one query.
+    Returns one result list per search, in input order.
+    """
+    apply_search_settings(conn, max((top_k for _, top_k, _ in searches), default=0), ef_search, probes, exact=exact)
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("""
+            SELECT q.batch_idx, r.*
+            FROM unnest(%s::int[], %s::vector[], %s::int[], %s::float8[])
+                AS q(batch_idx, embedding, top_k, min_similarity)
+            CROSS JOIN LATERAL get_parts_by_specs_vector_poc(q.embedding, q.top_k, q.min_similarity) AS r
+            ORDER BY q.batch_idx, r.similarity DESC
+        """, (
+            list(range(len(searches))),
+            [_vector_literal(embedding) for embedding, _, _ in searches],
+            [top_k for _, top_k, _ in searches],
+            [min_similarity for _, _, min_similarity in searches],
+        ))
+        results = [[] for _ in searches]
+        for row in cursor.fetchall():
+            results[row.pop("batch_idx")].append(row)
+        return results
     finally:
         cursor.close()
-        conn.close()
 
-def match_part_number_with_regex(part_number: str, match_results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def match_part_number_with_regex(part_number: str, match_results: List[Dict[str, Any]],
+                                 registry: Optional[TemplateRegistry] = None, brand: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
-    Match the part number against regex patterns in the match results.
+    Match the part number against regex patterns in the match results; the
+    first matching row, in their order, wins. Patterns come from the
+    compiled-regex cache. When match_results were looked up in the template
+    catalog, its registry (built once per catalog version) resolves the same row.
     """
+    if registry is not None:
+        return registry.resolve(part_number, brand)
     for match in match_results:
-        try:
-            pattern = match["regex"]
-            if re.fullmatch(pattern, part_number):
-                return match
-        except re.error as e:
-            print(f"❌ Invalid regex in DB: {pattern} → {e}")
-            continue
+        pattern = compile_pattern(match["regex"])
+        if pattern is not None and pattern.fullmatch(part_number):
+            return match
     return None
 
-def process_matches(input_match: Dict[str, Any], other_matches: List[Dict[str, Any]], validated_list: List[Any], request: MatchRequest) -> Tuple[List[Dict[str, Any]],Dict]:
+def filter_candidates(input_match: Dict[str, Any], candidates: Iterable[Dict[str, Any]], request: MatchRequest) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily drop candidates rejected by the brand/notes filters, before any transform work.
+    """
+    for match in candidates:
+        if request.cross_brand_only and match["brand"] == input_match["brand"]:
+            continue
+        if request.perfect_match_only and match["notes"] != input_match["notes"]:
+            continue
+        yield match
+
+def process_matches(input_match: Dict[str, Any], other_matches: Iterable[Dict[str, Any]], validated_list: List[Any], request: MatchRequest) -> Tuple[List[Dict[str, Any]],Dict]:
     """
     Process and filter the list of matches based on brand and similarity.
+    Candidates are consumed lazily and only the first top_k accepted ones are transformed.
+    Large candidate sets are mapped in one vectorized pass instead of one match at a time.
     """
     
     final_matches = []
-    for match in other_matches:
-        output_specs = match["specs"]
-        output_map = match.get("specs_part_number_mapper", {})
-        output_range_partnumber = match["part_number"]        
-        updated_input_specs, updated_output_specs, final_output_partnumber = full_part_number_pipeline(
-            output_range_partnumber=output_range_partnumber,
-            output_specs=output_specs,
-            input_specs=input_match["specs"],
-            input_map=input_match.get("specs_part_number_mapper", {}),
-            output_map=output_map,
-            data_list=validated_list
-        )
-        
-        final_matches.append({
-            "output_part_number": final_output_partnumber,
-            "category": match['category'],
-            "Brand": match["brand"],
-            "updated_output_specs": updated_output_specs,
-            "similarity": "Perfect Match" if input_match["notes"] == match["notes"] else "Partial Match",
-            'notes': match['notes'],
-            'environment_value': match['environment_value'],
-            'similarity_vector': match['similarity'],
-            'response_time_taken': match['duration_ms']
-        })
+    input_key = (template_key(input_match), mapping_fingerprint(input_match))
+    accepted = list(islice(filter_candidates(input_match, other_matches, request), request.top_k))
+    if not accepted:
+        raise LookupError("No candidate matches left after filtering.")
+
+    with stage("full_part_number_pipeline"):
+        plans = []
+        for match in accepted:
+            output_specs = match["specs"]
+            output_map = match.get("specs_part_number_mapper", {})
+            output_range_partnumber = match["part_number"]        
+            plans.append(get_part_number_plan(
+                (input_key, template_key(match), mapping_fingerprint(match)),
+                output_range_partnumber=output_range_partnumber,
+                output_specs=output_specs,
+                input_specs=input_match["specs"],
+                input_map=input_match.get("specs_part_number_mapper", {}),
+                output_map=output_map
+            ))
+
+        if len(plans) >= MAPPER_BATCH_THRESHOLD:
+            mapped = apply_plans_batch(plans, validated_list)
+        else:
+            mapped = [plan.apply(validated_list) for plan in plans]
+
+    with stage("response_building"):
+        for match, (updated_input_specs, updated_output_specs, final_output_partnumber) in zip(accepted, mapped):
+            final_matches.append({
+                "output_part_number": final_output_partnumber,
+                "category": match['category'],
+                "Brand": match["brand"],
+                "updated_output_specs": updated_output_specs,
+                "similarity": "Perfect Match" if input_match["notes"] == match["notes"] else "Partial Match",
+                'notes': match['notes'],
+                'environment_value': match['environment_value'],
+                'similarity_vector': match['similarity'],
+                'response_time_taken': match['duration_ms']
+            })
             
     return final_matches, updated_input_specs
 
-@app.post("/match-parts")
-async def match_parts(request: MatchRequest):
+def resolve_request(request: MatchRequest, match_results: List[Dict[str, Any]],
+                    registry: Optional[TemplateRegistry] = None) -> Tuple[Optional[Dict[str, Any]], List[Any], Optional[Dict[str, Any]]]:
     """
-    Endpoint to match parts based on part number and optional brand.
+    Pick the template row for the requested part number and validate its placeholders.
+    registry is the catalog registry match_results were looked up in, if any.
+    Returns (matched_record, validated_list, error); error is None on success.
     """
-    
-    match_results = log_rpc_benchmark_vector_poc(request.part_number)
-    print(len(match_results))
     if not match_results:
-        return {"error": f"{request.part_number} not found."}
+        return None, [], {"error": f"{request.part_number} not found."}
 
     # Filter match results by brand if provided
     if request.brand:
         match_results = [m for m in match_results if m["brand"] == request.brand]
         if not match_results:
-            return {"error": f"No matches found for brand '{request.brand}'."}
+            return None, [], {"error": f"No matches found for brand '{request.brand}'."}
     else:
         # Check for ambiguity if brand not specified
         unique_brands_for_part = list({m["brand"] for m in match_results if m["part_number"] == request.part_number})
         if len(unique_brands_for_part) > 1:
-            return {
+            return None, [], {
                 "error": f"Multiple brands found for part_number '{request.part_number}'.",
                 "brands": unique_brands_for_part,
                 "message": "Please specify the brand in your request."
             }
-    matched_record = match_part_number_with_regex(request.part_number, match_results)
+    with stage("regex_resolution"):
+        matched_record = match_part_number_with_regex(request.part_number, match_results, registry, request.brand)
     if not matched_record:
-        return {"error": f"No regex match found for part_number '{request.part_number}'"}
+        return None, [], {"error": f"No regex match found for part_number '{request.part_number}'"}
 
     regex = matched_record["regex"]
     
     ranges_json = matched_record["ranges_json"]
-    valid_or_invalid, validated_list = validate_user_input(request.part_number, regex, ranges_json)
+    with stage("validate_user_input"):
+        validator = get_validator(template_key(matched_record), regex, ranges_json)
+        valid_or_invalid, validated_list = validator.validate(request.part_number)
     if not valid_or_invalid:
-        return {"error": f"{request.part_number} is invalid."}
+        return None, [], {"error": f"{request.part_number} is invalid."}
 
-    embedding = matched_record.get("specs_embedding")
+    return matched_record, validated_list, None
+
+def _fill_placeholders(part_number: str, validated_list: List[Any]) -> str:
+    value_iter = iter(validated_list)
+    return RANGE_PLACEHOLDER.sub(
+        lambda m: str(int(v)) if isinstance((v := next(value_iter)), float) and v.is_integer() else str(v),
+        part_number
+    )
+
+def _match_response(request: MatchRequest, input_match: Dict[str, Any], final_matches: List[Dict[str, Any]], updated_input_specs: Dict) -> Dict[str, Any]:
+    return {
+        "input_part_number": request.part_number,
+        "category": input_match['category'],
+        "Brand": input_match['brand'],
+        "input_part_number_data_specs": updated_input_specs,
+        "notes": input_match['notes'],
+        'environment_value': input_match['environment_value'],
+        "matches": final_matches
+    }
+
+def build_static_match_response(request: MatchRequest, neighbours: List[Tuple[Dict[str, Any], bool]]) -> Dict[str, Any]:
+    """
+    build_match_response for a static part number over precomputed (row, usable) neighbours:
+    there are no placeholder values, so the input row is found by plain string comparison.
+    """
     try:
-        results = find_similar_parts_local(
-            embedding=embedding,
-            top_k=request.top_k + 1,
-            min_similarity=request.min_similarity
-        )
-        if not results:
+        if not neighbours:
             return {"error": f"{request.part_number} has no matches in the database."}
 
+        def is_input(item):
+            # Brand test of build_match_response
+            return item["part_number"] == request.part_number and (not request.brand or request.brand == item['brand'])
+
+        input_match = next((item for item, usable in neighbours if usable and is_input(item)), None)
+        if not input_match:
+            return {"error": f"Input part number '{request.part_number}' not found in results."}
+        other_matches = (item for item, usable in neighbours if usable and not is_input(item))
+        final_matches, updated_input_specs = process_matches(input_match, other_matches, [], request)
+        return _match_response(request, input_match, final_matches, updated_input_specs)
+    except Exception as e:
+        print(f"❌ probable error in process_matches function: {e}")
+        return {"error": f"Output matches not found at similarity {request.min_similarity}. Try again lowering it."}
+
+def build_equivalence_response(request: MatchRequest, input_match: Dict[str, Any], validated_list: List[Any],
+                                equivalents: List[Tuple[Any, float]]) -> Dict[str, Any]:
+    """
+    build_match_response over materialised (template key, similarity) equivalents:
+    the input template is already resolved, only placeholder substitution is left.
+    """
+    try:
+        if not equivalents:
+            return {"error": f"Output matches not found at similarity {request.min_similarity}. Try again lowering it."}
+        rows = template_catalog.rows
+
+        def candidates():
+            for key, similarity in equivalents:
+                row = rows.get(key)
+                # Ranged outputs need placeholder values from the input
+                if row is None or not (validated_list or not RANGE_PLACEHOLDER.search(row["part_number"])):
+                    continue
+                yield dict(row, similarity=similarity, duration_ms=0.0)
+
+        final_matches, updated_input_specs = process_matches(input_match, candidates(), validated_list, request)
+        return _match_response(request, input_match, final_matches, updated_input_specs)
+    except Exception as e:
+        print(f"❌ probable error in process_matches function: {e}")
+        return {"error": f"Output matches not found at similarity {request.min_similarity}. Try again lowering it."}
+
+def build_match_response(request: MatchRequest, validated_list: List[Any], results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Split the similarity results into the input part and its matches, and build the response.
+    results may be a lazy stream: rows are read only until the input part and top_k matches are found.
+    """
+    # Reconstruction work is interleaved with lazy row fetching, so it is timed per call
+    reconstruction_ms = 0.0
+    try:
+        rows = iter(results)
+        first = next(rows, None)
+        if first is None:
+            return {"error": f"{request.part_number} has no matches in the database."}
+
+        def usable(item):
+            return validated_list or not RANGE_PLACEHOLDER.search(item['part_number'])
+
+        def is_input(item):
+            nonlocal reconstruction_ms
+            start = time.perf_counter()
+            # No brand (None or "") accepts the row of any brand
+            found = (_fill_placeholders(item["part_number"], validated_list) == request.part_number
+                     and (not request.brand or request.brand == item['brand']))
+            reconstruction_ms += (time.perf_counter() - start) * 1000
+            return found
+
+        # Rows ranked above the input part stay candidates
         input_match = None
-        other_matches = []
-        for item in results:
-            if re.search(r'\[[^\]]+\]', item['part_number']) and not validated_list:
+        ranked_before_input = []
+        for item in chain([first], rows):
+            if not usable(item):
                 continue
-            value_iter = iter(validated_list)
-            m_input_part_number = re.sub(
-                r'\[[^\]]+\]',
-                lambda m: str(int(v)) if isinstance((v := next(value_iter)), float) and v.is_integer() else str(v),
-                item["part_number"]
-            )
-            
-            if m_input_part_number == request.part_number and (request.brand == "" or request.brand == item['brand']):
+            if is_input(item):
                 input_match = item
-            else:
-                other_matches.append(item)
+                break
+            ranked_before_input.append(item)
         
         if not input_match:
             return {"error": f"Input part number '{request.part_number}' not found in results."}
-        
+
+        other_matches = (item for item in chain(ranked_before_input, rows) if usable(item) and not is_input(item))
         final_matches, updated_input_specs = process_matches(input_match, other_matches, validated_list, request)
-        
-        return {
-            "input_part_number": request.part_number,
-            "category": input_match['category'],
-            "Brand": input_match['brand'],
-            "input_part_number_data_specs": updated_input_specs,
-            "notes": input_match['notes'],
-            'environment_value': input_match['environment_value'],
-            "matches": final_matches
-        }
+        return _match_response(request, input_match, final_matches, updated_input_specs)
 
     except Exception as e:
         print(f"❌ probable error in process_matches function: {e}")
         return {"error": f"Output matches not found at similarity {request.min_similarity}. Try again lowering it."}
+    finally:
+        record_stage("part_number_reconstruction", reconstruction_ms)
+
+def stream_match_response(request: MatchRequest, validated_list: List[Any], embedding: Any, cache_key: Tuple, conn=None) -> Dict[str, Any]:
+    """
+    Build the response straight from a server-side cursor, stopping once top_k matches are accepted.
+    The fetched rows are cached only when the search was read to the end.
+    """
+    fetched = []
+    exhausted = False
+    search_ms = 0.0
+    ef_search, probes, verify = request.search_settings()
+    if local_search_ready():
+        def local():
+            yield from local_vector_backend.search(embedding, request.search_rows(), request.min_similarity,
+                                                   probes=probes, exact=verify is not None)
+        similar = local()
+    elif verify:
+        # Verified results are re-ranked as a whole, so they cannot stream from the cursor
+        def verified():
+            yield from find_similar_parts_local(embedding, request.search_rows(), request.min_similarity, conn=conn,
+                                                ef_search=ef_search, probes=probes, verify=verify)
+        similar = verified()
+    else:
+        similar = iter_similar_parts(embedding, request.search_rows(), request.min_similarity, conn=conn,
+                                     ef_search=ef_search, probes=probes)
+
+    def rows():
+        # Only the time spent waiting on the cursor counts as vector search
+        nonlocal exhausted, search_ms
+        while True:
+            start = time.perf_counter()
+            row = next(similar, None)
+            search_ms += (time.perf_counter() - start) * 1000
+            if row is None:
+                break
+            fetched.append(row)
+            yield row
+        exhausted = True
+
+    try:
+        response = build_match_response(request, validated_list, rows())
+    finally:
+        similar.close()
+        record_stage("vector_search", search_ms)
+    # The search returns at most search_rows() rows, so reaching that count is a full read too
+    if exhausted or len(fetched) >= request.search_rows():
+        result_cache.put(cache_key, fetched)
+    return response
+
+@app.post("/match-parts")
+async def match_parts(request: MatchRequest):
+    """
+    Endpoint to match parts based on part number and optional brand.
+    """
+    if static_index is not None and request.search_settings() == DEFAULT_SEARCH_SETTINGS:
+        with stage("static_lookup"):
+            static_record = static_index.resolve(request.part_number, request.brand)
+            neighbours = None
+            if static_record is not None:
+                neighbours = static_index.neighbours(static_record, request.min_similarity, request.search_rows())
+        if neighbours is not None:
+            return build_static_match_response(request, neighbours)
+
+    registry = None
+    with stage("template_lookup"):
+        if template_catalog.loaded:
+            # One catalog version for both the lookup and the regex resolution
+            registry = template_catalog.registry
+            match_results = registry.candidates(request.part_number)
+        else:
+            match_results = await db_pool.run(log_rpc_benchmark_vector_poc, request.part_number)
+    matched_record, validated_list, error = resolve_request(request, match_results, registry)
+    if error:
+        return error
+
+    # The table keeps depth equivalents per template; deeper requests search live
+    if (equivalence_table is not None and request.cross_brand_only and template_catalog.loaded
+            and request.top_k <= equivalence_table.depth
+            and request.search_settings() == DEFAULT_SEARCH_SETTINGS):
+        with stage("equivalence_lookup"):
+            equivalents = equivalence_table.equivalents(template_key(matched_record), request.min_similarity)
+        if equivalents is not None:
+            return build_equivalence_response(request, matched_record, validated_list, equivalents)
+
+    embedding = matched_record.get("specs_embedding")
+    cache_key = result_cache.make_key(template_key(matched_record), request.min_similarity, request.search_rows(), request.search_settings())
+    results = result_cache.get(cache_key)
+    if results is not None:
+        return build_match_response(request, validated_list, results)
+    try:
+        if local_search_ready():
+            # No database round-trip: search in-process
+            return stream_match_response(request, validated_list, embedding, cache_key)
+        return await db_pool.run(stream_match_response, request, validated_list, embedding, cache_key)
+    except Exception as e:
+        print(f"❌ probable error in process_matches function: {e}")
+        return {"error": f"Output matches not found at similarity {request.min_similarity}. Try again lowering it."}
+
+# Number of template searches sent to the database in one multi-row query
+BATCH_SEARCH_CHUNK = int(os.getenv("BATCH_SEARCH_CHUNK", 50))
+
+@app.post("/match-parts/batch")
+async def match_parts_batch(requests: List[MatchRequest]):
+    """
+    Batch endpoint for BOM imports. Requests that resolve to the same template
+    share one similarity search, and lookups and searches go to the database as
+    multi-row queries. Results stream back as NDJSON lines tagged with the
+    request index, in completion order.
+    """
+
+    async def generate():
+        registry = None
+        if template_catalog.loaded:
+            registry = template_catalog.registry
+            lookups = {r.part_number: registry.candidates(r.part_number) for r in requests}
+        else:
+            lookups = await db_pool.run(find_templates_batch, list({r.part_number for r in requests}))
+
+        # Group resolved requests by (template, min_similarity, search settings)
+        groups: Dict[Any, List[Tuple[int, MatchRequest, List[Any]]]] = defaultdict(list)
+        embeddings: Dict[Any, Any] = {}
+        for index, request in enumerate(requests):
+            matched_record, validated_list, error = resolve_request(request, lookups.get(request.part_number, []), registry)
+            if error:
+                yield _ndjson_line(index, request, error)
+                continue
+            key = (template_key(matched_record), request.min_similarity, request.search_settings())
+            groups[key].append((index, request, validated_list))
+            embeddings[key] = matched_record.get("specs_embedding")
+
+        # Answer cached groups first, then search the rest in chunks
+        search_top_k = {key: max(r.search_rows() for _, r, _ in members) for key, members in groups.items()}
+        keys = []
+        for key, members in groups.items():
+            results = result_cache.get(result_cache.make_key(key[0], key[1], search_top_k[key], key[2]))
+            if results is None:
+                keys.append(key)
+                continue
+            for index, request, validated_list in members:
+                yield _ndjson_line(index, request, build_match_response(request, validated_list, results[:request.search_rows()]))
+
+        for start in range(0, len(keys), BATCH_SEARCH_CHUNK):
+            chunk = keys[start:start + BATCH_SEARCH_CHUNK]
+            searches = []
+            for key in chunk:
+                top_k, min_similarity = search_top_k[key], key[1]
+                if key[2][2] == "rerank":
+                    top_k, min_similarity = oversampled_search(top_k, min_similarity)
+                searches.append((embeddings[key], top_k, min_similarity))
+            # One query per chunk, so it runs at the deepest setting any of its searches asked for
+            ef_search = max((key[2][0] for key in chunk if key[2][0]), default=None)
+            probes = max((key[2][1] for key in chunk if key[2][1]), default=None)
+            exact = any(key[2][2] == "exact" for key in chunk)
+            try:
+                if local_search_ready():
+                    chunk_results = [
+                        local_vector_backend.search(embeddings[key], search_top_k[key], key[1], probes=key[2][1], exact=key[2][2] is not None)
+                        for key in chunk
+                    ]
+                else:
+                    chunk_results = await db_pool.run(find_similar_parts_batch, searches, ef_search=ef_search, probes=probes, exact=exact)
+                chunk_results = [
+                    exact_rerank(embeddings[key], results, search_top_k[key], key[1]) if key[2][2] == "rerank" else results
+                    for key, results in zip(chunk, chunk_results)
+                ]
+                for key, results in zip(chunk, chunk_results):
+                    result_cache.put(result_cache.make_key(key[0], key[1], search_top_k[key], key[2]), results)
+            except Exception as e:
+                print(f"❌ Error in batch vector search: {e}")
+                chunk_results = None
+            for position, key in enumerate(chunk):
+                for index, request, validated_list in groups[key]:
+                    if chunk_results is None:
+                        response = {"error": f"Output matches not found at similarity {request.min_similarity}. Try again lowering it."}
+                    else:
+                        results = chunk_results[position][:request.search_rows()]
+                        response = build_match_response(request, validated_list, results)
+                    yield _ndjson_line(index, request, response)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def _ndjson_line(index: int, request: MatchRequest, response: Dict[str, Any]) -> str:
+    return json.dumps({"index": index, "part_number": request.part_number, "result": response}, default=str) + "\n"
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """
+    Hit/miss counters of the similarity result cache.
+    """
+    return result_cache.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Latency histograms (p50/p95/p99) per pipeline stage, plus cache and benchmark-log counters.
+    Metrics are per process; worker_pid tells workers apart under notebooks.serve.
+    """
+    return {
+        "worker_pid": os.getpid(),
+        "stages": metrics.snapshot(),
+        "result_cache": result_cache.stats(),
+        "static_parts": static_index.stats() if static_index is not None else None,
+        "equivalence_table": {"templates": len(equivalence_table), "stale": len(equivalence_table.stale)} if equivalence_table is not None else None,
+        "benchmark_log": benchmark_writer_stats(),
+    }
@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+
+
+class SimilarityResultCache:
+    """
+    Bounded cache of similarity-search result sets keyed by
+    (template, min_similarity, top_k, search settings).
+
+    Every concrete part number of a template searches with the same
+    specs_embedding, so neighbour sets can be shared across requests.
+    Entries expire after ttl seconds and the least recently used entry is
+    evicted once maxsize is reached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(template_key: Any, min_similarity: float, top_k: int, search_settings: Tuple = ()) -> Tuple:
+        # Approximate index settings (ef_search, probes) change the neighbour set
+        return (template_key, float(min_similarity), int(top_k), tuple(search_settings))
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, key: Tuple, results: List[Dict[str, Any]]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, template_key: Any = None) -> int:
+        """
+        Drop the entries of one template, or everything if template_key is None.
+        Returns how many entries were dropped.
+        """
+        with self._lock:
+            if template_key is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            keys = [k for k in self._entries if k[0] == template_key]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def cache_from_env() -> SimilarityResultCache:
+    return SimilarityResultCache(
+        maxsize=int(os.getenv("RESULT_CACHE_SIZE", 1024)),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", 300)),
+    )
@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+from typing import Optional, List, Dict, Tuple
+
+# Multi-process serving mode for notebooks/refracting.py
+#
+#   CATALOG_SNAPSHOT=snapshots/catalog.pcat VECTOR_BACKEND=local \
+#   VECTOR_INDEX_SNAPSHOT=snapshots/vectors \
+#   python -m notebooks.serve --workers 4 --port 8000 --db-connections 40
+#
+# The supervisor binds the listening socket once and runs N uvicorn worker
+# processes on it. Workers map the catalog and vector-index snapshots
+# read-only, so the bulk of the catalog lives once in the page cache. Each
+# compiles only its own regexes. The Postgres connection budget is split
+# between N + 1 workers, the most that run at once during a reload. When a snapshot file is replaced, workers are restarted
+# one at a time: the new worker must finish startup before the old one is
+# shut down gracefully, so capacity never drops. SIGHUP forces the same
+# rolling reload.
+
+
+def snapshot_paths() -> List[str]:
+    """Files whose replacement triggers a rolling reload."""
+    paths = []
+    if os.getenv("CATALOG_SNAPSHOT"):
+        paths.append(os.getenv("CATALOG_SNAPSHOT"))
+    if os.getenv("VECTOR_INDEX_SNAPSHOT"):
+        # meta.json is written last, after the arrays
+        paths.append(os.path.join(os.getenv("VECTOR_INDEX_SNAPSHOT"), "meta.json"))
+    if os.getenv("EQUIVALENCE_SNAPSHOT"):
+        paths.append(os.path.join(os.getenv("EQUIVALENCE_SNAPSHOT"), "meta.json"))
+    return paths
+
+
+def _snapshot_state(paths: List[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+    state = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_mtime_ns, stat.st_ino)
+        except FileNotFoundError:
+            state[path] = None
+    return state
+
+
+def worker_pool_size(db_connections: int, workers: int) -> int:
+    """
+    Connections per worker. A rolling reload runs one extra worker until the
+    old one has stopped, so the budget is split N + 1 ways.
+    """
+    return max(1, db_connections // (max(workers, 1) + 1))
+
+
+def _run_worker(sock, app: str, host: str, port: int, env: Dict[str, str], ready, log_level: str) -> None:
+    # Environment is set before the app module is imported: its pool and
+    # caches are configured at import time
+    os.environ.update(env)
+    import uvicorn
+    config = uvicorn.Config(app, host=host, port=port, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+
+    def report_ready():
+        while not server.started and not server.should_exit:
+            time.sleep(0.05)
+        if server.started:
+            ready.set()
+
+    threading.Thread(target=report_ready, daemon=True).start()
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    Keeps `workers` uvicorn processes serving one shared socket, replaces
+    crashed workers, and performs rolling reloads on snapshot changes.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8000, workers: int = 2, db_connections: int = 20,
+                 watch_interval: float = 5.0, startup_timeout: float = 120.0, shutdown_timeout: float = 30.0,
+                 log_level: str = "info", app: str = "notebooks.refracting:app"):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.db_connections = db_connections
+        self.watch_interval = watch_interval
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.log_level = log_level
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._socket = None
+        self._stopping = threading.Event()
+        self._reload_requested = threading.Event()
+
+    def worker_env(self) -> Dict[str, str]:
+        pool_size = worker_pool_size(self.db_connections, self.workers)
+        return {
+            "DB_POOL_MAX": str(pool_size),
+            "DB_POOL_MIN": str(min(int(os.getenv("DB_POOL_MIN", pool_size)), pool_size)),
+        }
+
+    def _bind(self):
+        import uvicorn
+        config = uvicorn.Config(self.app, host=self.host, port=self.port)
+        return config.bind_socket()
+
+    def spawn(self) -> Optional[multiprocessing.Process]:
+        """Start one worker and wait until it serves. Returns None if it failed to start."""
+        ready = self._context.Event()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self._socket, self.app, self.host, self.port, self.worker_env(), ready, self.log_level),
+            name="match-api-worker",
+        )
+        process.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if ready.wait(0.2):
+                print(f"✅ Worker {process.pid} ready")
+                return process
+            if not process.is_alive():
+                break
+        print(f"❌ Worker {process.pid} failed to start")
+        self.stop_worker(process)
+        return None
+
+    def stop_worker(self, process: multiprocessing.Process) -> None:
+        """SIGTERM lets uvicorn finish in-flight requests; kill after shutdown_timeout."""
+        if process.is_alive():
+            process.terminate()
+            process.join(self.shutdown_timeout)
+        if process.is_alive():
+            print(f"⚠️ Worker {process.pid} did not stop in time, killing")
+            process.kill()
+            process.join()
+
+    def rolling_reload(self) -> None:
+        print("🔄 Rolling reload")
+        for i, old in enumerate(list(self._processes)):
+            if self._stopping.is_set():
+                return
+            new = self.spawn()
+            if new is None:
+                # Keep the old generation serving rather than losing capacity
+                print("❌ Reload aborted, keeping current workers")
+                return
+            self._processes[i] = new
+            self.stop_worker(old)
+
+    def _handle_signal(self, signum, frame) -> None:
+        if signum == signal.SIGHUP:
+            self._reload_requested.set()
+        else:
+            self._stopping.set()
+
+    def run(self) -> int:
+        self._socket = self._bind()
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(signum, self._handle_signal)
+        pool_size = worker_pool_size(self.db_connections, self.workers)
+        print(f"🚀 Serving on {self.host}:{self.port} with {self.workers} workers, {pool_size} DB connections each")
+        if pool_size * (self.workers + 1) > self.db_connections:
+            print(f"⚠️ {self.db_connections} DB connections are too few for {self.workers} workers and a reload; "
+                  f"up to {pool_size * (self.workers + 1)} may be open")
+        paths = snapshot_paths()
+        state = _snapshot_state(paths)
+        try:
+            for _ in range(self.workers):
+                process = self.spawn()
+                if process is None:
+                    return 1
+                self._processes.append(process)
+            last_check = time.monotonic()
+            while not self._stopping.is_set():
+                self._stopping.wait(0.5)
+                for i, process in enumerate(self._processes):
+                    if not process.is_alive() and not self._stopping.is_set():
+                        print(f"⚠️ Worker {process.pid} exited with {process.exitcode}, restarting")
+                        self._processes[i] = self.spawn() or process
+                if time.monotonic() - last_check >= self.watch_interval:
+                    last_check = time.monotonic()
+                    current = _snapshot_state(paths)
+                    if current != state:
+                        state = current
+                        self._reload_requested.set()
+                if self._reload_requested.is_set():
+                    self._reload_requested.clear()
+                    self.rolling_reload()
+            return 0
+        finally:
+            print("🛑 Shutting down workers")
+            for process in self._processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in self._processes:
+                self.stop_worker(process)
+            self._socket.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the match API with multiple worker processes.")
+    parser.add_argument("--host", default=os.getenv("SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVE_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--db-connections", type=int, default=int(os.getenv("DB_TOTAL_CONNECTIONS", 20)),
+                        help="Postgres connections shared by all workers")
+    parser.add_argument("--watch-interval", type=float, default=5.0, help="seconds between snapshot checks")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--app", default="notebooks.refracting:app", help="ASGI app import path")
+    args = parser.parse_args(argv)
+    supervisor = Supervisor(args.host, args.port, args.workers, args.db_connections,
+                            watch_interval=args.watch_interval, log_level=args.log_level, app=args.app)
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import re
+import threading
+import numpy as np
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Callable
+from .template_registry import compile_pattern, get_static_part
+from .template_catalog import template_key
+from .vector_recall import cosine_similarities
+
+
+class StaticPartIndex:
+    """
+    Exact-key index of fully static templates (no [...] placeholders), with
+    precomputed similarity neighbours per template.
+
+    A part number is only indexed when the regular resolution path is
+    guaranteed to pick the same template: its own regex accepts it with no
+    capture groups and no ranges, no ranged template shares its static
+    prefix, and (part_number, brand) is unique. Everything else falls back
+    to the regular path.
+    """
+
+    def __init__(self, placeholder: "re.Pattern" = re.compile(r'\[[^\]]+\]')):
+        self.placeholder = placeholder
+        self._by_key: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        # Every brand with a template of exactly this part number, indexed or not
+        self._brands: Dict[str, set] = {}
+        # Neighbour rows per template, most similar first, each with a flag
+        # telling whether the row is static (usable without placeholder values)
+        self._neighbours: Dict[Any, List[Tuple[Dict[str, Any], bool]]] = {}
+        # Bumped per template by update(), so in-flight searches are discarded
+        self._versions: Dict[Any, int] = {}
+        self._generation = 0
+        self.min_similarity: Optional[float] = None
+        self.depth: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def _index(self, rows: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[str, Optional[str]], Dict[str, Any]], Dict[str, set]]:
+        ranged_prefixes = {get_static_part(r["part_number"]) for r in rows if "[" in r["part_number"]}
+        by_key: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        duplicates = set()
+        brands = defaultdict(set)
+        for row in rows:
+            part_number = row["part_number"]
+            brands[part_number].add(row.get("brand"))
+            if "[" in part_number or part_number in ranged_prefixes or row.get("ranges_json"):
+                continue
+            pattern = compile_pattern(row["regex"])
+            if pattern is None or not pattern.fullmatch(part_number) or pattern.groups:
+                continue
+            key = (part_number, row.get("brand"))
+            if key in by_key:
+                duplicates.add(key)
+            by_key[key] = row
+        for key in duplicates:
+            del by_key[key]
+        return by_key, dict(brands)
+
+    def build(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Rebuild the key index; precomputed neighbours are dropped."""
+        by_key, brands = self._index(list(rows))
+        with self._lock:
+            self._by_key = by_key
+            self._brands = brands
+            self._neighbours = {}
+            self._versions = {}
+            self._generation += 1
+
+    def update(self, rows: Iterable[Dict[str, Any]], changed: Iterable[Dict[str, Any]],
+               min_similarity: float) -> List[Dict[str, Any]]:
+        """
+        Rebuild the key index after a catalog change, keeping the neighbours
+        the change cannot affect. rows is the whole catalog, changed the rows
+        added or edited; rows missing from it count as deleted. Returns the
+        static rows whose neighbours were dropped and need recomputing.
+
+        A template is affected when it changed, listed a changed or deleted
+        row among its neighbours, or a changed row now reaches its list:
+        at or above min_similarity, and above its last neighbour if the list
+        is full.
+        """
+        rows = list(rows)
+        changed = list(changed)
+        by_key, brands = self._index(rows)
+        present = {template_key(r) for r in rows}
+        touched = {template_key(r) for r in changed}
+        indexed = list(by_key.values())
+        reach = np.zeros(len(indexed), dtype=bool)
+        embedded = [i for i, r in enumerate(indexed) if r.get("specs_embedding") is not None]
+        incoming = [r["specs_embedding"] for r in changed if r.get("specs_embedding") is not None]
+        if embedded and incoming:
+            matrix = np.asarray([indexed[i]["specs_embedding"] for i in embedded], dtype=np.float64)
+            best = np.max([cosine_similarities(e, matrix) for e in incoming], axis=0)
+            reach[embedded] = best >= min_similarity
+        with self._lock:
+            was_indexed = {template_key(r) for r in self._by_key.values()}
+            stale = []
+            for i, row in enumerate(indexed):
+                key = template_key(row)
+                flagged = self._neighbours.get(key)
+                if flagged is None:
+                    # Not computed yet, or a precompute is searching it right now
+                    affected = key in touched or key not in was_indexed
+                else:
+                    listed = {template_key(n) for n, _ in flagged}
+                    full = self.depth is not None and len(flagged) >= self.depth
+                    affected = key in touched or bool(listed & touched) or not listed <= present or (
+                        reach[i] and (not full or self._reaches(row, incoming, flagged[-1][0]["similarity"])))
+                if flagged is None or affected:
+                    self._neighbours.pop(key, None)
+                    # Rejects neighbours searched before this change
+                    self._versions[key] = self._versions.get(key, 0) + 1
+                if affected:
+                    stale.append(row)
+            indexed_keys = {template_key(r) for r in indexed}
+            for key in [k for k in self._neighbours if k not in indexed_keys]:
+                del self._neighbours[key]
+            self._by_key = by_key
+            self._brands = brands
+        return stale
+
+    @staticmethod
+    def _reaches(row: Dict[str, Any], embeddings: List[Any], similarity: float) -> bool:
+        return bool(np.max(cosine_similarities(row["specs_embedding"], np.asarray(embeddings, dtype=np.float64))) > similarity)
+
+    def resolve(self, part_number: str, brand: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        The template row for an exact static part number, or None when the
+        request needs the regular path (unknown, ambiguous brand, ...).
+        """
+        if brand:
+            return self._by_key.get((part_number, brand))
+        brands = self._brands.get(part_number)
+        if not brands or len(brands) != 1:
+            return None
+        return self._by_key.get((part_number, next(iter(brands))))
+
+    def static_rows(self) -> List[Dict[str, Any]]:
+        return list(self._by_key.values())
+
+    def set_neighbours(self, row: Dict[str, Any], neighbours: List[Dict[str, Any]], min_similarity: float, depth: int,
+                       generation: Optional[int] = None, version: Optional[int] = None) -> bool:
+        """
+        Store a template's neighbours, unless the index was rebuilt since
+        generation or an update invalidated the template since version.
+        """
+        flagged = [(n, not self.placeholder.search(n["part_number"])) for n in neighbours]
+        key = template_key(row)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if version is not None and version != self._versions.get(key, 0):
+                return False
+            self.min_similarity, self.depth = min_similarity, depth
+            self._neighbours[key] = flagged
+            return True
+
+    def neighbours(self, row: Dict[str, Any], min_similarity: float, rows: int) -> Optional[List[Tuple[Dict[str, Any], bool]]]:
+        """
+        Precomputed neighbours at or above min_similarity, at most rows of them,
+        or None if the precomputed set cannot answer this search.
+        """
+        if self.min_similarity is None or min_similarity < self.min_similarity or rows > self.depth:
+            return None
+        flagged = self._neighbours.get(template_key(row))
+        if flagged is None:
+            return None
+        result = []
+        for item in flagged:
+            if item[0]["similarity"] < min_similarity or len(result) == rows:
+                break
+            result.append(item)
+        return result
+
+    def precompute(self, search_batch: Callable[[List[Tuple[Any, int, float]]], List[List[Dict[str, Any]]]],
+                   min_similarity: float, depth: int, chunk_size: int = 50,
+                   rows: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+        """
+        Fill neighbours via search_batch, which takes (embedding, top_k,
+        min_similarity) searches like find_similar_parts_batch: for the given
+        rows, or every indexed template. Returns the number of templates computed.
+        """
+        generation = self._generation
+        pending = [r for r in (self.static_rows() if rows is None else rows) if r.get("specs_embedding") is not None]
+        done = 0
+        while pending:
+            # Templates an update invalidated while they were being searched
+            retry = []
+            for start in range(0, len(pending), chunk_size):
+                chunk = pending[start:start + chunk_size]
+                with self._lock:
+                    versions = [self._versions.get(template_key(r), 0) for r in chunk]
+                results = search_batch([(r["specs_embedding"], depth, min_similarity) for r in chunk])
+                if generation != self._generation:
+                    # Rebuilt meanwhile; the next precompute covers the new catalog
+                    return done
+                for row, neighbours, version in zip(chunk, results, versions):
+                    if self.set_neighbours(row, neighbours, min_similarity, depth, generation, version):
+                        done += 1
+                    else:
+                        retry.append((row["part_number"], row.get("brand")))
+            pending = [r for r in map(self._by_key.get, retry) if r is not None and r.get("specs_embedding") is not None]
+        return done
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "static_templates": len(self._by_key),
+            "precomputed": len(self._neighbours),
+            "min_similarity": self.min_similarity,
+            "depth": self.depth,
+        }
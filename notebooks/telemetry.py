@@ -0,0 +1,173 @@
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+
+class BenchmarkLogWriter:
+    """
+    Background JSONL writer for benchmark entries.
+
+    log() only enqueues and never blocks: when the queue is full the entry
+    is dropped and counted. A writer thread drains the queue and appends in
+    batches, flushing once flush_size entries are pending or every
+    flush_interval seconds. The file is rotated when it grows past
+    max_bytes or when the UTC date changes, and rotated files can be
+    gzip-compressed.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        max_queue: int = 10000,
+        flush_size: int = 100,
+        flush_interval: float = 1.0,
+        max_bytes: Optional[int] = None,
+        rotate_daily: bool = False,
+        compress: bool = False,
+    ):
+        self.output_path = output_path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._current_date = datetime.utcnow().date()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="benchmark-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, entry: Dict[str, Any]) -> bool:
+        """Enqueue an entry without blocking. Returns False if it was dropped."""
+        if self._stopped.is_set():
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush pending entries and stop the writer thread."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        # The sentinel must get through even if the queue is full
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "output_path": self.output_path,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        while True:
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                entry = False
+            if entry is None:
+                # Drain whatever was queued before the sentinel
+                while True:
+                    try:
+                        pending = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if pending is not None:
+                        batch.append(pending)
+                self._write(batch)
+                return
+            if entry is not False:
+                batch.append(entry)
+                if len(batch) < self.flush_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            self._rotate_if_needed()
+            with open(self.output_path, "a") as f:
+                f.write("".join(json.dumps(entry, default=str) + "\n" for entry in batch))
+            self.written += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"❌ Error writing benchmark log: {e}")
+
+    def _rotate_if_needed(self) -> None:
+        today = datetime.utcnow().date()
+        date_rollover = self.rotate_daily and today != self._current_date
+        too_large = (
+            self.max_bytes is not None
+            and os.path.exists(self.output_path)
+            and os.path.getsize(self.output_path) >= self.max_bytes
+        )
+        if (date_rollover or too_large) and os.path.exists(self.output_path):
+            self._rotate()
+        self._current_date = today
+
+    def _rotate(self) -> None:
+        stem, ext = os.path.splitext(self.output_path)
+        rotated = f"{stem}.{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+        os.replace(self.output_path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+
+
+_writers: Dict[str, BenchmarkLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_benchmark_writer(output_path: str) -> BenchmarkLogWriter:
+    """Shared writer per log file, configured from BENCHMARK_LOG_* environment variables."""
+    with _writers_lock:
+        writer = _writers.get(output_path)
+        if writer is None:
+            max_bytes = os.getenv("BENCHMARK_LOG_MAX_BYTES")
+            writer = BenchmarkLogWriter(
+                output_path,
+                max_queue=int(os.getenv("BENCHMARK_LOG_QUEUE", 10000)),
+                flush_size=int(os.getenv("BENCHMARK_LOG_FLUSH_SIZE", 100)),
+                flush_interval=float(os.getenv("BENCHMARK_LOG_FLUSH_SECONDS", 1.0)),
+                max_bytes=int(max_bytes) if max_bytes else None,
+                rotate_daily=os.getenv("BENCHMARK_LOG_ROTATE_DAILY", "0") == "1",
+                compress=os.getenv("BENCHMARK_LOG_COMPRESS", "0") == "1",
+            )
+            _writers[output_path] = writer
+        return writer
+
+
+def close_benchmark_writers() -> None:
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def benchmark_writer_stats() -> List[Dict[str, Any]]:
+    with _writers_lock:
+        return [writer.stats() for writer in _writers.values()]
+
+
+atexit.register(close_benchmark_writers)
@@ -0,0 +1,191 @@
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from psycopg2.extras import RealDictCursor
+from typing import Optional, List, Dict, Any, Iterable
+from .template_registry import TemplateRegistry
+
+# Template metadata served by get_parts_by_first_static_part_vector_poc
+TEMPLATE_COLUMNS = (
+    "id", "part_number", "brand", "category", "regex", "ranges_json", "notes",
+    "specs", "specs_part_number_mapper", "environment_value", "specs_embedding", "updated_at"
+)
+
+
+class PostgresTemplateSource:
+    """
+    Reads template rows from the parts table, optionally only those changed
+    after an updated_at watermark.
+    """
+
+    def __init__(self, db_pool, table: str = "parts"):
+        self.db_pool = db_pool
+        self.table = table
+
+    def _fetch(self, watermark: Optional[datetime], conn=None) -> List[Dict[str, Any]]:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            columns = ", ".join(TEMPLATE_COLUMNS)
+            if watermark is None:
+                cursor.execute(f"SELECT {columns} FROM {self.table} ORDER BY updated_at")
+            else:
+                cursor.execute(
+                    f"SELECT {columns} FROM {self.table} WHERE updated_at > %s ORDER BY updated_at",
+                    (watermark,)
+                )
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def fetch_since(self, watermark: Optional[datetime]) -> List[Dict[str, Any]]:
+        return self.db_pool.call(self._fetch, watermark)
+
+
+class InMemoryTemplateSource:
+    """
+    Local stand-in for the parts table, for tests and benchmarks.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        self.rows: List[Dict[str, Any]] = []
+        for row in rows:
+            self.upsert(row)
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        row = dict(row)
+        row.setdefault("updated_at", datetime.utcnow())
+        key = template_key(row)
+        self.rows = [r for r in self.rows if template_key(r) != key]
+        self.rows.append(row)
+
+    def delete(self, row: Dict[str, Any]) -> None:
+        key = template_key(row)
+        self.rows = [r for r in self.rows if template_key(r) != key]
+
+    def fetch_since(self, watermark: Optional[datetime]) -> List[Dict[str, Any]]:
+        rows = self.rows if watermark is None else [r for r in self.rows if r["updated_at"] > watermark]
+        return sorted(rows, key=lambda r: r["updated_at"])
+
+
+def template_key(row: Dict[str, Any]):
+    """Stable identity of a template row: its id, else (part_number, brand)."""
+    if row.get("id") is not None:
+        return row["id"]
+    return (row["part_number"], row.get("brand"))
+
+
+class TemplateCatalog:
+    """
+    In-memory copy of the template rows normally fetched per request via
+    get_parts_by_first_static_part_vector_poc.
+
+    The catalog is loaded in full once and then refreshed incrementally from
+    an updated_at watermark. Each refresh re-reads overlap before the
+    watermark, so rows committed late with an older updated_at are still
+    seen; rows already held at the same updated_at are skipped. Deletes are
+    not visible to a watermark: reconcile() compares against a full read.
+    """
+
+    def __init__(self, source, overlap: timedelta = timedelta(seconds=60)):
+        self.source = source
+        self.overlap = overlap
+        self.registry = TemplateRegistry()
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.watermark: Optional[datetime] = None
+        self.loaded = False
+        # Bumped by every full load, so listeners can tell a load from a refresh
+        self.loads = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add_listener(self, fn) -> None:
+        """Register fn(changed_rows) to be called after every load or refresh."""
+        self._listeners.append(fn)
+
+    def _notify(self, changed: List[Dict[str, Any]]) -> None:
+        for fn in self._listeners:
+            fn(changed)
+
+    def load(self) -> int:
+        rows = self.source.fetch_since(None)
+        with self._lock:
+            self.rows = {template_key(r): r for r in rows}
+            registry = TemplateRegistry(self.rows.values())
+            self.registry = registry
+            self.watermark = max((r["updated_at"] for r in rows if r.get("updated_at")), default=None)
+            self.loaded = True
+            self.loads += 1
+        self._notify(rows)
+        return len(rows)
+
+    def _is_new(self, row: Dict[str, Any]) -> bool:
+        current = self.rows.get(template_key(row))
+        return current is None or current.get("updated_at") != row.get("updated_at")
+
+    def _apply(self, changed: List[Dict[str, Any]], removed: Iterable[Any] = ()) -> None:
+        with self._lock:
+            keys = {template_key(r) for r in changed}
+            keys.update(removed)
+            # Swap in a copy so readers never see a half-updated index
+            registry = TemplateRegistry()
+            self.rows = {k: r for k, r in self.rows.items() if k not in keys}
+            self.rows.update((template_key(r), r) for r in changed)
+            registry.extend(self.rows.values())
+            self.registry = registry
+            self.watermark = max((r["updated_at"] for r in changed if r.get("updated_at")), default=self.watermark)
+        self._notify(changed)
+
+    def refresh(self) -> int:
+        """Apply rows changed since the watermark. Returns how many rows changed."""
+        if not self.loaded:
+            return self.load()
+        since = self.watermark - self.overlap if self.watermark is not None else None
+        changed = [r for r in self.source.fetch_since(since) if self._is_new(r)]
+        if not changed:
+            return 0
+        self._apply(changed)
+        return len(changed)
+
+    def reconcile(self) -> int:
+        """
+        Compare against a full read of the source: apply changed rows and drop
+        deleted ones. Listeners are only called when something differs.
+        Returns how many rows changed or were removed.
+        """
+        if not self.loaded:
+            return self.load()
+        rows = self.source.fetch_since(None)
+        present = {template_key(r) for r in rows}
+        removed = [k for k in self.rows if k not in present]
+        changed = [r for r in rows if self._is_new(r)]
+        if not changed and not removed:
+            return 0
+        self._apply(changed, removed)
+        return len(changed) + len(removed)
+
+    def lookup(self, part_number: str) -> List[Dict[str, Any]]:
+        """
+        Template rows sharing a static prefix with part_number, the same
+        candidates the first-stage RPC returns.
+        """
+        return self.registry.candidates(part_number)
+
+    async def refresh_forever(self, interval: float, reconcile_interval: Optional[float] = None) -> None:
+        """Refresh every interval seconds, reconciling every reconcile_interval seconds."""
+        last_reconcile = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if reconcile_interval and time.monotonic() - last_reconcile >= reconcile_interval:
+                    last_reconcile = time.monotonic()
+                    changed = await asyncio.to_thread(self.reconcile)
+                else:
+                    changed = await asyncio.to_thread(self.refresh)
+                if changed:
+                    print(f"🔄 Template catalog refreshed: {changed} rows")
+            except Exception as e:
+                print(f"❌ Error refreshing template catalog: {e}")
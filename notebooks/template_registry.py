@@ -0,0 +1,121 @@
+import re
+from bisect import insort
+from collections import defaultdict
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Iterable, Pattern
+
+# Patterns that failed to compile; they are reported once and never retried
+_quarantined_patterns = set()
+
+
+@lru_cache(maxsize=4096)
+def _compile(pattern: str) -> Pattern:
+    return re.compile(pattern)
+
+
+def compile_pattern(pattern: str) -> Optional[Pattern]:
+    """
+    Return the compiled regex for a DB-supplied pattern, or None if it is invalid.
+    Compiled patterns are kept in an LRU cache keyed by pattern text.
+    """
+    if pattern in _quarantined_patterns:
+        return None
+    try:
+        return _compile(pattern)
+    except (re.error, TypeError) as e:
+        _quarantined_patterns.add(pattern)
+        print(f"❌ Invalid regex in DB (quarantined): {pattern} → {e}")
+        return None
+
+
+def quarantined_patterns() -> List[str]:
+    return sorted(p for p in _quarantined_patterns if isinstance(p, str))
+
+
+def get_static_part(part_number: str) -> str:
+    """Returns the static part before the first [ in the template."""
+    bracket_index = part_number.find('[')
+    if bracket_index == -1:
+        return part_number  # No [ found, entire part is static
+    return part_number[:bracket_index]
+
+
+def _id_order(template: Dict[str, Any]):
+    # ORDER BY p.id: ascending, NULLs last
+    return template.get("id") is None, template.get("id") or 0
+
+
+class TemplateRegistry:
+    """
+    Index of part-number templates by their static prefix.
+
+    A concrete part number is resolved by probing its own prefixes, one
+    dict lookup per distinct prefix length (longest first), and
+    fullmatching only the templates filed under a hit. Templates under one
+    prefix are kept in id order, the order the first-stage RPC returns.
+    """
+
+    def __init__(self, templates: Iterable[Dict[str, Any]] = ()):
+        self._by_prefix: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._prefix_lengths: List[int] = []
+        self.extend(templates)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._by_prefix.values())
+
+    def add(self, template: Dict[str, Any]) -> None:
+        if compile_pattern(template["regex"]) is None:
+            return
+        prefix = get_static_part(template["part_number"])
+        if -len(prefix) not in self._prefix_lengths:
+            insort(self._prefix_lengths, -len(prefix))
+        insort(self._by_prefix[prefix], template, key=_id_order)
+
+    def extend(self, templates: Iterable[Dict[str, Any]]) -> None:
+        for template in templates:
+            self.add(template)
+
+    def remove(self, predicate) -> None:
+        """Drop every template for which predicate(template) is true."""
+        for prefix in list(self._by_prefix):
+            kept = [t for t in self._by_prefix[prefix] if not predicate(t)]
+            if kept:
+                self._by_prefix[prefix] = kept
+            else:
+                del self._by_prefix[prefix]
+        self._prefix_lengths = sorted({-len(p) for p in self._by_prefix})
+
+    def clear(self) -> None:
+        self._by_prefix.clear()
+        self._prefix_lengths = []
+
+    def candidates(self, part_number: str) -> List[Dict[str, Any]]:
+        """Templates whose static prefix is a prefix of part_number, longest prefix first, then by id."""
+        found = []
+        for neg_length in self._prefix_lengths:
+            length = -neg_length
+            if length > len(part_number):
+                continue
+            found.extend(self._by_prefix.get(part_number[:length], ()))
+        return found
+
+    def resolve_all(self, part_number: str, brand: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All templates whose regex fullmatches part_number, optionally for one brand."""
+        matches = []
+        for template in self.candidates(part_number):
+            if brand and template.get("brand") != brand:
+                continue
+            pattern = compile_pattern(template["regex"])
+            if pattern is not None and pattern.fullmatch(part_number):
+                matches.append(template)
+        return matches
+
+    def resolve(self, part_number: str, brand: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The first template, in candidates() order, whose regex fullmatches part_number."""
+        for template in self.candidates(part_number):
+            if brand and template.get("brand") != brand:
+                continue
+            pattern = compile_pattern(template["regex"])
+            if pattern is not None and pattern.fullmatch(part_number):
+                return template
+        return None
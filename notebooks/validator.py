@@ -1,34 +1,256 @@
+import os
 import re
-from decimal import Decimal
+import threading
+import numpy as np
+from itertools import product, islice
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Iterator
+from .template_registry import compile_pattern
 
-def build_validator_fn(range_dict):
-    if range_dict['type'] == 'range':
-        start = Decimal(str(range_dict['start']))
-        end = Decimal(str(range_dict['end']))
-        step = Decimal(str(range_dict['step']))
+# Plain or exponent decimal notation, as Decimal(str(value)) accepted it
+NUMBER_PATTERN = re.compile(r'\s*([+-]?)(\d*)(?:\.(\d*))?(?:[eE]([+-]?\d+))?\s*')
+# Placeholder such as "[130-3000/1]" in a template part number
+PLACEHOLDER_PATTERN = re.compile(r'\[[^\]]+\]')
+# Scaled values beyond this go through Python ints instead of int64 arrays
+_INT64_SAFE = 1 << 62
 
-        def validator(value):
-            try:
-                val = Decimal(str(value))
-                if not (start <= val <= end):
-                    return False
-                return (val - start) % step == 0
-            except:
-                return False
 
-        return validator
+def _decimal_parts(value) -> Optional[Tuple[int, int]]:
+    """(digits, exponent) with value == digits * 10**exponent, or None if not a number."""
+    m = NUMBER_PATTERN.fullmatch(str(value))
+    if not m or not (m.group(2) or m.group(3)):
+        return None
+    sign, whole, fraction, exponent = m.group(1), m.group(2), m.group(3) or "", m.group(4)
+    digits = int(whole + fraction or "0")
+    return (-digits if sign == "-" else digits), int(exponent or 0) - len(fraction)
 
-    elif range_dict['type'] == 'list':
-        valid_values = set(str(v) for v in range_dict['values'])
 
-        def validator(value):
-            return str(value) in valid_values
+def _decimals(value) -> int:
+    parts = _decimal_parts(value)
+    if parts is None:
+        raise ValueError(f"Invalid number in ranges_json: {value!r}")
+    digits, exponent = parts
+    while exponent < 0 and digits % 10 == 0:
+        digits //= 10
+        exponent += 1
+    return max(0, -exponent)
+
+
+def _scaled(value, decimals: int) -> Optional[int]:
+    """value * 10**decimals as an int, or None if not a number or not on that grid."""
+    parts = _decimal_parts(value)
+    if parts is None:
+        return None
+    digits, exponent = parts
+    shift = exponent + decimals
+    if shift >= 0:
+        return digits * 10 ** shift
+    quotient, remainder = divmod(digits, 10 ** -shift)
+    return None if remainder else quotient
+
+
+class RangeCheck:
+    """start <= value <= end on the step grid, in integers scaled by 10**decimals."""
+
+    def __init__(self, start, end, step):
+        self.decimals = max(_decimals(start), _decimals(end), _decimals(step))
+        self.start = _scaled(start, self.decimals)
+        self.end = _scaled(end, self.decimals)
+        self.step = abs(_scaled(step, self.decimals))
+        self._unit = 10 ** self.decimals
+        self._int64 = max(abs(self.start), abs(self.end)) < _INT64_SAFE
+
+    def _scale(self, value) -> Optional[int]:
+        # Plain digits, the usual capture, skip the general parser
+        if type(value) is str and value.isdecimal():
+            return int(value) * self._unit
+        return _scaled(value, self.decimals)
+
+    def __call__(self, value) -> bool:
+        scaled = self._scale(value)
+        return (scaled is not None and self.step != 0 and self.start <= scaled <= self.end
+                and (scaled - self.start) % self.step == 0)
+
+    def batch(self, values: List[Optional[str]]) -> np.ndarray:
+        if not self._int64:
+            return np.fromiter((v is not None and self(v) for v in values), dtype=bool, count=len(values))
+        scaled = [None if v is None else self._scale(v) for v in values]
+        # Unparsable or huge values are out of range anyway
+        parsed = np.fromiter((s is not None and abs(s) < _INT64_SAFE for s in scaled), dtype=bool, count=len(values))
+        array = np.fromiter((s if ok else 0 for s, ok in zip(scaled, parsed)), dtype=np.int64, count=len(values))
+        if self.step == 0:
+            return np.zeros(len(values), dtype=bool)
+        return parsed & (array >= self.start) & (array <= self.end) & ((array - self.start) % self.step == 0)
+
+    def count(self) -> int:
+        if self.step == 0 or self.end < self.start:
+            return 0
+        return (self.end - self.start) // self.step + 1
+
+    def values(self) -> Iterator[str]:
+        if not self.count():
+            return
+        for scaled in range(self.start, self.end + 1, self.step):
+            if not self.decimals:
+                yield str(scaled)
+                continue
+            whole, fraction = divmod(abs(scaled), 10 ** self.decimals)
+            fraction = str(fraction).rjust(self.decimals, "0").rstrip("0")
+            yield ("-" if scaled < 0 else "") + str(whole) + ("." + fraction if fraction else "")
 
-        return validator
 
+class ListCheck:
+    """Value spelled exactly like one of the listed values."""
+
+    def __init__(self, values: Iterable[Any]):
+        self.allowed = list(dict.fromkeys(str(v) for v in values))
+        self._set = set(self.allowed)
+
+    def __call__(self, value) -> bool:
+        return str(value) in self._set
+
+    def batch(self, values: List[Optional[str]]) -> np.ndarray:
+        return np.fromiter((str(v) in self._set for v in values), dtype=bool, count=len(values))
+
+    def count(self) -> int:
+        return len(self.allowed)
+
+    def values(self) -> Iterator[str]:
+        return iter(self.allowed)
+
+
+def compile_range_check(range_dict: Dict[str, Any]):
+    if range_dict['type'] == 'range':
+        return RangeCheck(range_dict['start'], range_dict['end'], range_dict['step'])
+    elif range_dict['type'] == 'list':
+        return ListCheck(range_dict['values'])
     else:
         raise ValueError(f"Unknown range_dict type: {range_dict['type']}")
 
+
+class TemplateValidator:
+    """
+    Compiled regex and range checks of one template. validate() gives the
+    same answers as validate_user_input; validate_batch() checks many part
+    numbers at once, and count()/expand() enumerate the valid part numbers.
+    """
+
+    def __init__(self, regex: str, ranges_json: Optional[List[Dict[str, Any]]]):
+        self.pattern = compile_pattern(regex)
+        try:
+            self.checks = [compile_range_check(r) for r in ranges_json or []]
+        except (ValueError, TypeError, KeyError) as e:
+            # Reported once per cached validator; the template accepts nothing
+            print(f"❌ Invalid ranges_json in DB: {ranges_json} → {e}")
+            self.pattern = None
+            self.checks = []
+
+    def _accepted_groups(self, user_input: str) -> Optional[Tuple[str, ...]]:
+        if self.pattern is None:
+            return None
+        match = self.pattern.match(user_input)
+        if not match:
+            return None
+        groups = match.groups()
+        if len(groups) != len(self.checks):
+            return None
+        for check, value in zip(self.checks, groups):
+            if not check(value):
+                return None
+        return groups
+
+    def validate(self, user_input: str) -> Tuple[bool, List[float]]:
+        """(True, values of the captured groups) if valid, otherwise (False, [])."""
+        groups = self._accepted_groups(user_input)
+        if groups is None:
+            return False, []
+        return True, [float(value) for value in groups]
+
+    def validate_batch(self, user_inputs: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-item validity (bool array) and captured values (float array with
+        one column per group, NaN for invalid items and non-numeric values).
+        """
+        n = len(user_inputs)
+        valid = np.zeros(n, dtype=bool)
+        values = np.full((n, len(self.checks)), np.nan)
+        if self.pattern is None or not n:
+            return valid, values
+        matches = [self.pattern.match(s) for s in user_inputs]
+        valid[:] = [m is not None and len(m.groups()) == len(self.checks) for m in matches]
+        for column, check in enumerate(self.checks):
+            texts = [m.group(column + 1) if ok else None for m, ok in zip(matches, valid)]
+            valid &= check.batch(texts)
+        for row in np.flatnonzero(valid):
+            for column, text in enumerate(matches[row].groups()):
+                try:
+                    values[row, column] = float(text)
+                except ValueError:
+                    pass
+        return valid, values
+
+    def count(self) -> int:
+        """Number of value combinations the range checks accept."""
+        if self.pattern is None:
+            return 0
+        total = 1
+        for check in self.checks:
+            total *= check.count()
+        return total
+
+    def expand(self, part_number: str, limit: Optional[int] = None) -> Iterator[str]:
+        """
+        Concrete part numbers of a template part number, one per accepted value
+        combination. Combinations whose canonical spelling the regex rejects
+        are skipped, so this may yield fewer than count().
+        """
+        if self.pattern is None:
+            return iter(())
+        placeholders = PLACEHOLDER_PATTERN.findall(part_number)
+        if len(placeholders) != len(self.checks):
+            raise ValueError(f"{part_number} has {len(placeholders)} placeholders for {len(self.checks)} ranges")
+        pieces = PLACEHOLDER_PATTERN.split(part_number)
+
+        def candidates():
+            for combination in product(*(check.values() for check in self.checks)):
+                candidate = pieces[0] + "".join(value + piece for value, piece in zip(combination, pieces[1:]))
+                if self._accepted_groups(candidate) is not None:
+                    yield candidate
+
+        return islice(candidates(), limit)
+
+
+VALIDATOR_CACHE_SIZE = int(os.getenv("VALIDATOR_CACHE_SIZE", 4096))
+_validator_cache = OrderedDict()
+# Request threads and the catalog refresh share the cache
+_validator_cache_lock = threading.Lock()
+
+
+def get_validator(cache_key, regex: str, ranges_json: Optional[List[Dict[str, Any]]]) -> TemplateValidator:
+    """
+    Return the compiled validator for a template, from an LRU cache.
+    cache_key identifies the template; the regex and ranges are part of the
+    key too, so a template edited in place compiles a new validator.
+    """
+    cache_key = (cache_key, regex, repr(ranges_json))
+    with _validator_cache_lock:
+        validator = _validator_cache.get(cache_key)
+        if validator is not None:
+            _validator_cache.move_to_end(cache_key)
+            return validator
+    validator = TemplateValidator(regex, ranges_json)
+    with _validator_cache_lock:
+        _validator_cache[cache_key] = validator
+        if len(_validator_cache) > VALIDATOR_CACHE_SIZE:
+            _validator_cache.popitem(last=False)
+    return validator
+
+
+def clear_validator_cache() -> None:
+    with _validator_cache_lock:
+        _validator_cache.clear()
+
+
 def validate_user_input(user_input: str, regex: str, ranges_json: list):
     """
     Validates whether the user_input matches the regex AND the captured groups
@@ -36,24 +258,8 @@ def validate_user_input(user_input: str, regex: str, ranges_json: list):
 
     Returns (True, validated_values) if valid, otherwise (False, []).
     """
-    pattern = re.compile(regex)
-    match = pattern.match(user_input)
-    if not match:
-        return False, []
-
-    groups = match.groups()
-    if len(groups) != len(ranges_json):
-        return False, []
-
-    validators = [build_validator_fn(r) for r in ranges_json]
-    validated_values = []
-
-    for fn, val in zip(validators, groups):
-        if not fn(val):
-            return False, []
-        validated_values.append(float(val))  # or Decimal(val) if you need more precision
-    
-    return True, validated_values
+    # Keyed by content alone, as callers here do not identify the template
+    return get_validator(None, regex, ranges_json).validate(user_input)
 
 
 # result = validate_user_input(
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+from typing import Optional, List, Dict, Any, Tuple, Iterable
+
+# In-process similarity search over the template spec embeddings, as an
+# alternative to the get_parts_by_specs_vector_poc RPC (VECTOR_BACKEND=local)
+#
+#   python -m notebooks.vector_index build snapshots/vectors --ivf-lists 256
+#   python -m notebooks.vector_index info snapshots/vectors
+#
+# A snapshot directory holds vectors.npy (float32, normalised), an optional
+# IVF layout and meta.json. Loading memory-maps vectors.npy read-only, so
+# worker processes on one host share a single copy in the page cache.
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index on a contiguous float32 matrix of unit vectors.
+
+    Search is exact (one matrix-vector product) unless an IVF layout has been
+    trained, in which case only the nprobe lists nearest to the query are
+    scanned. Rows are upserted and deleted in place; deleted rows are zeroed
+    and masked until compact() or the next snapshot. A memory-mapped matrix
+    is copied into private memory on the first update.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024):
+        self.dim = dim
+        self.keys: List[Any] = []
+        self.versions: Dict[Any, Optional[str]] = {}
+        self._positions: Dict[Any, int] = {}
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32) if dim else None
+        self._live = np.zeros(capacity, dtype=bool)
+        self._size = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        # Inverted lists (row order sorted by list, list offsets), rebuilt lazily
+        self._inverted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    @property
+    def is_ivf(self) -> bool:
+        return self.centroids is not None
+
+    @staticmethod
+    def _normalise(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Grow (and detach from any mmap) so rows more vectors fit."""
+        needed = self._size + rows
+        writable = self._matrix is not None and self._matrix.flags.writeable
+        if writable and needed <= len(self._matrix):
+            return
+        capacity = max(needed, 2 * (len(self._matrix) if self._matrix is not None else 0), 1024)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        live = np.zeros(capacity, dtype=bool)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+            live[:self._size] = self._live[:self._size]
+        self._matrix, self._live = matrix, live
+        if self._assignments is not None:
+            assignments = np.full(capacity, -1, dtype=np.int32)
+            assignments[:self._size] = self._assignments[:self._size]
+            self._assignments = assignments
+
+    def upsert(self, key, embedding, version: Optional[str] = None) -> bool:
+        """Insert or replace one vector. Returns False if key is already at this version."""
+        vector = self._normalise(embedding)[0]
+        with self._lock:
+            if version is not None and self.versions.get(key) == version and key in self._positions:
+                return False
+            if self.dim is None:
+                self.dim = len(vector)
+            elif len(vector) != self.dim:
+                raise ValueError(f"Embedding for {key!r} has {len(vector)} dims, index has {self.dim}")
+            position = self._positions.get(key)
+            if position is None:
+                self._ensure_capacity(1)
+                position = self._size
+                self._size += 1
+                self.keys.append(key)
+                self._positions[key] = position
+            elif not self._matrix.flags.writeable:
+                self._ensure_capacity(0)
+            self._matrix[position] = vector
+            self._live[position] = True
+            if self._assignments is not None:
+                self._assignments[position] = int(np.argmax(self.centroids @ vector))
+                self._inverted = None
+            self.versions[key] = version
+        return True
+
+    def delete(self, key) -> bool:
+        with self._lock:
+            position = self._positions.pop(key, None)
+            if position is None:
+                return False
+            if not self._matrix.flags.writeable:
+                self._ensure_capacity(0)
+            self._matrix[position] = 0.0
+            self._live[position] = False
+            self.versions.pop(key, None)
+            return True
+
+    def sync(self, rows: Dict[Any, Dict[str, Any]], changed: Iterable[Dict[str, Any]], key_fn) -> int:
+        """
+        Bring the index in line with a template catalog: upsert the changed
+        rows and delete keys no longer present. Returns rows touched.
+        """
+        touched = 0
+        for row in changed:
+            embedding = row.get("specs_embedding")
+            key = key_fn(row)
+            if embedding is None:
+                touched += self.delete(key)
+                continue
+            updated_at = row.get("updated_at")
+            touched += self.upsert(key, embedding, version=str(updated_at) if updated_at is not None else None)
+        for key in [k for k in self._positions if k not in rows]:
+            touched += self.delete(key)
+        return touched
+
+    def compact(self) -> None:
+        """Drop deleted rows so the matrix is dense again."""
+        with self._lock:
+            positions = np.flatnonzero(self._live[:self._size])
+            keys = [self.keys[i] for i in positions]
+            self._matrix = np.ascontiguousarray(self._matrix[positions]) if self._size else self._matrix
+            self._live = np.ones(len(positions), dtype=bool)
+            if self._assignments is not None:
+                self._assignments = self._assignments[positions]
+            self.keys = keys
+            self._positions = {key: i for i, key in enumerate(keys)}
+            self._size = len(keys)
+            self._inverted = None
+
+    def train_ivf(self, n_lists: int, iterations: int = 10, seed: int = 7) -> None:
+        """
+        Spherical k-means over the current vectors. Later upserts are assigned
+        to the nearest existing centroid; retrain after large catalog changes.
+        """
+        with self._lock:
+            self.compact()
+            data = self._matrix[:self._size]
+            n_lists = min(n_lists, len(data))
+            if n_lists < 2:
+                self.centroids = self._assignments = None
+                return
+            rng = np.random.default_rng(seed)
+            centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignments = np.argmax(data @ centroids.T, axis=1)
+                for c in range(n_lists):
+                    members = data[assignments == c]
+                    centroids[c] = members.sum(axis=0) if len(members) else data[rng.integers(len(data))]
+                centroids = self._normalise(centroids)
+            self.centroids = centroids
+            self._assignments = np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+            self._inverted = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._inverted is None:
+            assignments = self._assignments[:self._size]
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+            self._inverted = (order, offsets)
+        return self._inverted
+
+    def search(self, embedding, top_k: int, min_similarity: float = -1.0, nprobe: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """
+        (key, similarity) of the top_k most similar vectors at or above
+        min_similarity, most similar first. nprobe limits an IVF search to
+        that many lists; None or no IVF layout searches every vector.
+        """
+        query = self._normalise(embedding)[0]
+        with self._lock:
+            if not self._size:
+                return []
+            matrix, live, size = self._matrix, self._live, self._size
+            if self.is_ivf and nprobe and nprobe < len(self.centroids):
+                lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+                order, offsets = self._inverted_lists()
+                rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+                rows = rows[live[rows]]
+                similarity = matrix[rows] @ query
+            else:
+                rows = None
+                similarity = matrix[:size] @ query
+                similarity[~live[:size]] = -np.inf
+            keys = self.keys
+        candidates = np.flatnonzero(similarity >= min_similarity)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-similarity[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-similarity[candidates], kind="stable")]
+        positions = candidates if rows is None else rows[candidates]
+        return [(keys[p], float(similarity[c])) for p, c in zip(positions, candidates)]
+
+    def save(self, path: str) -> None:
+        """
+        Write a compacted snapshot to the directory path. meta.json is written
+        last, so readers watching it only see complete snapshots.
+        """
+        with self._lock:
+            self.compact()
+            os.makedirs(path, exist_ok=True)
+            _save_array(os.path.join(path, "vectors.npy"), self._matrix[:self._size])
+            if self.is_ivf:
+                _save_array(os.path.join(path, "ivf_centroids.npy"), self.centroids)
+                _save_array(os.path.join(path, "ivf_assignments.npy"), self._assignments[:self._size])
+            meta = {
+                "dim": self.dim,
+                "count": self._size,
+                "ivf_lists": len(self.centroids) if self.is_ivf else 0,
+                "keys": [list(k) if isinstance(k, tuple) else k for k in self.keys],
+                "versions": [self.versions.get(k) for k in self.keys],
+                "saved_at": time.time(),
+            }
+            tmp = os.path.join(path, "meta.json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorIndex":
+        """Open a snapshot; with mmap the vectors stay in the shared page cache until updated."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        index = cls(dim=meta["dim"], capacity=0)
+        index._matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        index._size = meta["count"]
+        index._live = np.ones(index._size, dtype=bool)
+        index.keys = [tuple(k) if isinstance(k, list) else k for k in meta["keys"]]
+        index._positions = {key: i for i, key in enumerate(index.keys)}
+        index.versions = dict(zip(index.keys, meta["versions"]))
+        if meta.get("ivf_lists"):
+            index.centroids = np.load(os.path.join(path, "ivf_centroids.npy"))
+            index._assignments = np.array(np.load(os.path.join(path, "ivf_assignments.npy")), dtype=np.int32)
+        return index
+
+
+def _save_array(path: str, array: np.ndarray) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+class LocalVectorBackend:
+    """
+    Serves get_parts_by_specs_vector_poc-shaped rows from a VectorIndex and
+    the template catalog, without a database round-trip.
+    """
+
+    def __init__(self, index: VectorIndex, catalog, nprobe: Optional[int] = None):
+        self.index = index
+        self.catalog = catalog
+        self.nprobe = nprobe
+
+    @property
+    def ready(self) -> bool:
+        return self.catalog.loaded and len(self.index) > 0
+
+    def sync(self, changed: List[Dict[str, Any]]) -> None:
+        """Template catalog listener."""
+        from .template_catalog import template_key
+        self.index.sync(self.catalog.rows, changed, template_key)
+
+    def search(self, embedding, top_k: int, min_similarity: float, probes: Optional[int] = None,
+               exact: bool = False) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        hits = self.index.search(embedding, top_k, min_similarity, nprobe=None if exact else (probes or self.nprobe))
+        duration_ms = (time.perf_counter() - start) * 1000
+        rows = self.catalog.rows
+        return [
+            dict(rows[key], similarity=similarity, duration_ms=duration_ms)
+            for key, similarity in hits if key in rows
+        ]
+
+
+def build_index(rows: Iterable[Dict[str, Any]], ivf_lists: int = 0) -> VectorIndex:
+    from .template_catalog import template_key
+    index = VectorIndex()
+    for row in rows:
+        if row.get("specs_embedding") is not None:
+            updated_at = row.get("updated_at")
+            index.upsert(template_key(row), row["specs_embedding"], version=str(updated_at) if updated_at is not None else None)
+    if ivf_lists:
+        index.train_ivf(ivf_lists)
+    return index
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or inspect local vector index snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="snapshot the parts table embeddings")
+    build_parser.add_argument("path")
+    build_parser.add_argument("--ivf-lists", type=int, default=0, help="IVF lists (0 = exact search only)")
+    info_parser = subparsers.add_parser("info", help="describe a snapshot")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        index = VectorIndex.load(args.path)
+        print(json.dumps({"path": args.path, "vectors": len(index), "dim": index.dim,
+                          "ivf_lists": len(index.centroids) if index.is_ivf else 0}, indent=2))
+        return 0
+
+    from .refracting import db_pool
+    from .template_catalog import PostgresTemplateSource
+    db_pool.open()
+    try:
+        rows = PostgresTemplateSource(db_pool).fetch_since(None)
+    finally:
+        db_pool.close()
+    start = time.perf_counter()
+    index = build_index(rows, args.ivf_lists)
+    index.save(args.path)
+    print(f"✅ Snapshot {args.path}: {len(index)} vectors in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
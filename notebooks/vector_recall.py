@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import numpy as np
+from typing import Optional, List, Dict, Any, Callable, Iterable, Tuple
+from .instrumentation import LatencyHistogram
+
+# Exact re-ranking of approximate (HNSW/IVFFlat) similarity results, and an
+# offline recall@k vs latency evaluator for the index settings
+#
+#   python -m notebooks.vector_recall --k 10 --ef-search 20,40,80,160
+#   python -m notebooks.vector_recall --k 10 --probes 1,5,10 --verify rerank
+
+# Verification modes of find_similar_parts_local:
+#   rerank - fetch oversampled ANN candidates, recompute exact cosine in NumPy;
+#            this fixes the ranking of what the index returned, it does not
+#            find neighbours the index missed
+#   exact  - bypass the vector index so Postgres scans every embedding
+VERIFY_MODES = ("rerank", "exact")
+
+# Extra candidates fetched per requested row, and how far below min_similarity
+# the ANN fetch reaches. They widen the candidate set the exact recheck sees;
+# recall is still bounded by the index, so use verify="exact" when it must be complete
+RERANK_OVERSAMPLE = int(os.getenv("RERANK_OVERSAMPLE", 4))
+RERANK_SIMILARITY_MARGIN = float(os.getenv("RERANK_SIMILARITY_MARGIN", 0.01))
+
+
+def oversampled_search(top_k: int, min_similarity: float,
+                       oversample: int = RERANK_OVERSAMPLE, margin: float = RERANK_SIMILARITY_MARGIN) -> Tuple[int, float]:
+    """(top_k, min_similarity) for the ANN fetch that feeds exact_rerank."""
+    return top_k * max(oversample, 1), min_similarity - margin
+
+
+def _as_matrix(embeddings: Iterable[Any]) -> np.ndarray:
+    return np.asarray([np.asarray(e, dtype=np.float64) for e in embeddings])
+
+
+def cosine_similarities(query: Any, matrix: np.ndarray) -> np.ndarray:
+    """Exact cosine similarity of query against every row of matrix."""
+    query = np.asarray(query, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = (matrix @ query) / norms
+    return np.nan_to_num(similarity, nan=-1.0)
+
+
+def exact_rerank(embedding: Any, rows: List[Dict[str, Any]], top_k: int, min_similarity: float) -> List[Dict[str, Any]]:
+    """
+    Recompute the similarity of ANN candidates exactly, drop those below
+    min_similarity and return the best top_k, most similar first.
+    Rows without an embedding keep the similarity reported by the database.
+    """
+    if not rows:
+        return []
+    with_embedding = [i for i, row in enumerate(rows) if row.get("specs_embedding") is not None]
+    similarity = [row.get("similarity") for row in rows]
+    if with_embedding:
+        exact = cosine_similarities(embedding, _as_matrix(rows[i]["specs_embedding"] for i in with_embedding))
+        for i, value in zip(with_embedding, exact):
+            similarity[i] = float(value)
+    order = sorted(
+        (i for i, value in enumerate(similarity) if value is not None and value >= min_similarity),
+        key=lambda i: -similarity[i]
+    )
+    return [dict(rows[i], similarity=similarity[i]) for i in order[:top_k]]
+
+
+def exact_neighbours(query: Any, matrix: np.ndarray, top_k: int, min_similarity: float) -> List[int]:
+    """Row indices of the true top_k neighbours at or above min_similarity."""
+    similarity = cosine_similarities(query, matrix)
+    candidates = np.nonzero(similarity >= min_similarity)[0]
+    return candidates[np.argsort(-similarity[candidates], kind="stable")][:top_k].tolist()
+
+
+def evaluate_recall(
+    catalog_rows: List[Dict[str, Any]],
+    search_fn: Callable[..., List[Dict[str, Any]]],
+    settings_grid: List[Dict[str, Any]],
+    k: int = 10,
+    min_similarity: float = 0.99,
+    queries: int = 100,
+    seed: int = 7,
+) -> List[Dict[str, Any]]:
+    """
+    Recall@k and latency of search_fn for each entry of settings_grid.
+
+    Queries are the embeddings of sampled catalog templates; ground truth is
+    an exact NumPy search over the whole catalog. search_fn is called as
+    search_fn(embedding, k, min_similarity, **settings) and must return rows
+    carrying the template id.
+    """
+    rows = [row for row in catalog_rows if row.get("specs_embedding") is not None]
+    if not rows:
+        return []
+    matrix = _as_matrix(row["specs_embedding"] for row in rows)
+    ids = [row["id"] for row in rows]
+    sample = random.Random(seed).sample(range(len(rows)), min(queries, len(rows)))
+    truth = {q: {ids[i] for i in exact_neighbours(matrix[q], matrix, k, min_similarity)} for q in sample}
+
+    report = []
+    for settings in settings_grid:
+        latency = LatencyHistogram()
+        recalls = []
+        missed = 0
+        for q in sample:
+            start = time.perf_counter()
+            found = search_fn(rows[q]["specs_embedding"], k, min_similarity, **settings)
+            latency.observe((time.perf_counter() - start) * 1000)
+            expected = truth[q]
+            hits = len(expected & {row["id"] for row in found})
+            recalls.append(hits / len(expected) if expected else 1.0)
+            missed += len(expected) - hits
+        report.append({
+            "settings": settings,
+            "queries": len(sample),
+            f"recall_at_{k}": round(sum(recalls) / len(recalls), 4),
+            "min_recall": round(min(recalls), 4),
+            "missed_neighbours": missed,
+            "latency": latency.summary(),
+        })
+    return report
+
+
+def _int_list(value: Optional[str]) -> List[Optional[int]]:
+    return [int(v) for v in value.split(",")] if value else [None]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of the pgvector similarity search.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-similarity", type=float, default=0.99)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--ef-search", help="comma-separated hnsw.ef_search values")
+    parser.add_argument("--probes", help="comma-separated ivfflat.probes values")
+    parser.add_argument("--verify", choices=VERIFY_MODES, help="also evaluate with this verification mode")
+    args = parser.parse_args(argv)
+
+    from .refracting import db_pool, find_similar_parts_local
+    from .template_catalog import PostgresTemplateSource
+
+    grid = [
+        {"ef_search": ef_search, "probes": probes}
+        for ef_search in _int_list(args.ef_search) for probes in _int_list(args.probes)
+    ]
+    if args.verify:
+        grid += [dict(settings, verify=args.verify) for settings in grid]
+
+    def search(embedding, top_k, min_similarity, **settings):
+        return db_pool.call(find_similar_parts_local, embedding, top_k, min_similarity, **settings)
+
+    db_pool.open()
+    try:
+        catalog_rows = PostgresTemplateSource(db_pool).fetch_since(None)
+        print(f"📦 {len(catalog_rows)} templates, {args.queries} queries, k={args.k}, min_similarity={args.min_similarity}")
+        report = evaluate_recall(catalog_rows, search, grid, args.k, args.min_similarity, args.queries, args.seed)
+    finally:
+        db_pool.close()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+-- Full pgvector schema for the match API, applied in migration order.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f sql/init_pgvector_schema.sql
+--
+-- The embedding column defaults to 768 dimensions; for another model prefix
+-- the command with PGOPTIONS='-c parts.embedding_dim=<dims>'.
+--
+-- Existing databases are upgraded with `python -m notebooks.migrate`, which
+-- applies only the files not yet recorded in schema_migrations. New changes
+-- go in a new sql/migrations/NNNN_*.sql file and an \ir line below.
+
+\ir migrations/0001_parts_table.sql
+\ir migrations/0002_search_functions.sql
+\ir migrations/0003_search_indexes.sql
+\ir migrations/0004_updated_at_clock.sql
@@ -0,0 +1,57 @@
+-- 0001: parts table holding the part-number templates and their spec embeddings
+
+CREATE EXTENSION IF NOT EXISTS vector;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version     text PRIMARY KEY,
+    applied_at  timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS parts (
+    id                        bigserial PRIMARY KEY,
+    part_number               text NOT NULL,        -- template, e.g. HGR15R[100-4000/1]
+    brand                     text NOT NULL,
+    category                  text,
+    regex                     text NOT NULL,
+    ranges_json               jsonb NOT NULL DEFAULT '[]'::jsonb,
+    notes                     text,
+    specs                     jsonb NOT NULL DEFAULT '{}'::jsonb,
+    specs_part_number_mapper  jsonb NOT NULL DEFAULT '{}'::jsonb,
+    environment_value         text,
+    -- Dimension set below from the embedding model
+    specs_embedding           vector,
+    -- Text before the first "[", same as template_registry.get_static_part
+    static_part               text GENERATED ALWAYS AS (split_part(part_number, '[', 1)) STORED,
+    updated_at                timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (part_number, brand)
+);
+
+-- Embedding dimension from the parts.embedding_dim setting (migrate.py sets it
+-- from EMBEDDING_DIM; with psql use PGOPTIONS='-c parts.embedding_dim=384').
+-- Defaults to 768, the dimension of sentence-transformers all-mpnet-base-v2
+-- (docker/docker-compose.yml). Only a column without a dimension is changed.
+DO $$
+BEGIN
+    IF (SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'parts'::regclass AND attname = 'specs_embedding') = -1 THEN
+        EXECUTE format('ALTER TABLE parts ALTER COLUMN specs_embedding TYPE vector(%s)',
+                       coalesce(nullif(current_setting('parts.embedding_dim', true), ''), '768')::integer);
+    END IF;
+END;
+$$;
+
+-- TemplateCatalog refreshes by updated_at watermark, so every change must bump it
+CREATE OR REPLACE FUNCTION parts_touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS parts_touch_updated_at ON parts;
+CREATE TRIGGER parts_touch_updated_at
+    BEFORE UPDATE ON parts
+    FOR EACH ROW EXECUTE FUNCTION parts_touch_updated_at();
+
+INSERT INTO schema_migrations (version) VALUES ('0001') ON CONFLICT DO NOTHING;
@@ -0,0 +1,82 @@
+-- 0002: the two RPCs used by notebooks/refracting.py and notebooks/manual_match.py
+
+-- Templates whose static prefix is a prefix of the given part number, longest
+-- prefix first. The candidate prefixes of the input are enumerated so the
+-- lookup is an index probe on static_part instead of a LIKE over every row.
+-- Dropped first: CREATE OR REPLACE cannot change the result columns of an
+-- existing version of the RPC.
+DROP FUNCTION IF EXISTS get_parts_by_first_static_part_vector_poc(text);
+CREATE OR REPLACE FUNCTION get_parts_by_first_static_part_vector_poc(p_part_number text)
+RETURNS TABLE (
+    id                        bigint,
+    part_number               text,
+    brand                     text,
+    category                  text,
+    regex                     text,
+    ranges_json               jsonb,
+    notes                     text,
+    specs                     jsonb,
+    specs_part_number_mapper  jsonb,
+    environment_value         text,
+    specs_embedding           vector,
+    updated_at                timestamptz,
+    duration_ms               double precision
+) AS $$
+DECLARE
+    started timestamptz := clock_timestamp();
+BEGIN
+    RETURN QUERY
+    SELECT p.id, p.part_number, p.brand, p.category, p.regex, p.ranges_json, p.notes,
+           p.specs, p.specs_part_number_mapper, p.environment_value, p.specs_embedding, p.updated_at,
+           extract(epoch FROM clock_timestamp() - started) * 1000
+    FROM parts p
+    WHERE p.static_part = ANY (
+        SELECT left(p_part_number, n) FROM generate_series(1, length(p_part_number)) AS n
+    )
+    ORDER BY length(p.static_part) DESC, p.id;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Nearest templates by cosine similarity. The inner ORDER BY ... LIMIT is the
+-- shape the HNSW/IVFFlat index serves; the similarity threshold is applied to
+-- its output. Search depth follows hnsw.ef_search / ivfflat.probes of the
+-- calling transaction, which the API sets per request.
+DROP FUNCTION IF EXISTS get_parts_by_specs_vector_poc(vector, integer, double precision);
+CREATE OR REPLACE FUNCTION get_parts_by_specs_vector_poc(p_embedding vector, p_top_k integer, p_min_similarity double precision)
+RETURNS TABLE (
+    id                        bigint,
+    part_number               text,
+    brand                     text,
+    category                  text,
+    regex                     text,
+    ranges_json               jsonb,
+    notes                     text,
+    specs                     jsonb,
+    specs_part_number_mapper  jsonb,
+    environment_value         text,
+    specs_embedding           vector,
+    updated_at                timestamptz,
+    similarity                double precision,
+    duration_ms               double precision
+) AS $$
+DECLARE
+    started timestamptz := clock_timestamp();
+BEGIN
+    RETURN QUERY
+    SELECT n.id, n.part_number, n.brand, n.category, n.regex, n.ranges_json, n.notes,
+           n.specs, n.specs_part_number_mapper, n.environment_value, n.specs_embedding, n.updated_at,
+           n.similarity,
+           extract(epoch FROM clock_timestamp() - started) * 1000
+    FROM (
+        SELECT p.*, 1 - (p.specs_embedding <=> p_embedding) AS similarity
+        FROM parts p
+        WHERE p.specs_embedding IS NOT NULL
+        ORDER BY p.specs_embedding <=> p_embedding
+        LIMIT p_top_k
+    ) n
+    WHERE n.similarity >= p_min_similarity
+    ORDER BY n.similarity DESC;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+INSERT INTO schema_migrations (version) VALUES ('0002') ON CONFLICT DO NOTHING;
@@ -0,0 +1,35 @@
+-- 0003: indexes so neither RPC sequential-scans the catalog
+
+-- Approximate nearest neighbours on the spec embedding (pgvector >= 0.5).
+-- Recall/latency is tuned at query time with hnsw.ef_search (VECTOR_EF_SEARCH
+-- or MatchRequest.ef_search). ef_search must be at least the rows requested,
+-- which the API ensures up to pgvector's maximum of 1000; deeper fetches use
+-- hnsw.iterative_scan (pgvector >= 0.8, see HNSW_ITERATIVE_SCAN), whose scan
+-- is bounded by hnsw.max_scan_tuples.
+CREATE INDEX IF NOT EXISTS parts_specs_embedding_hnsw
+    ON parts USING hnsw (specs_embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- IVFFlat alternative: cheaper to build, but lists must be chosen for the
+-- catalog size (about rows / 1000) and the index rebuilt as it grows.
+-- Query depth is ivfflat.probes (VECTOR_PROBES or MatchRequest.probes).
+--
+-- DROP INDEX IF EXISTS parts_specs_embedding_hnsw;
+-- CREATE INDEX parts_specs_embedding_ivfflat
+--     ON parts USING ivfflat (specs_embedding vector_cosine_ops)
+--     WITH (lists = 100);
+
+-- Static-prefix lookup: equality probes from get_parts_by_first_static_part_vector_poc,
+-- and prefix LIKE 'HGR15%' queries via text_pattern_ops
+CREATE INDEX IF NOT EXISTS parts_static_part_idx
+    ON parts (static_part text_pattern_ops);
+
+-- Substring / fuzzy search over template part numbers
+CREATE INDEX IF NOT EXISTS parts_part_number_trgm
+    ON parts USING gin (part_number gin_trgm_ops);
+
+-- Incremental catalog refresh (updated_at > watermark)
+CREATE INDEX IF NOT EXISTS parts_updated_at_idx
+    ON parts (updated_at);
+
+INSERT INTO schema_migrations (version) VALUES ('0003') ON CONFLICT DO NOTHING;
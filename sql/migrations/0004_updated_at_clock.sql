@@ -0,0 +1,16 @@
+-- 0004: stamp updated_at with the statement's wall-clock time
+
+-- now() is the start time of the transaction, so a long transaction can
+-- commit rows stamped before a watermark TemplateCatalog has already moved
+-- past. clock_timestamp() narrows that gap to the rest of the transaction;
+-- the catalog's refresh overlap (CATALOG_REFRESH_OVERLAP_SECONDS) covers it.
+CREATE OR REPLACE FUNCTION parts_touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE parts ALTER COLUMN updated_at SET DEFAULT clock_timestamp();
+
+INSERT INTO schema_migrations (version) VALUES ('0004') ON CONFLICT DO NOTHING;
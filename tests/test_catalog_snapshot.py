@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import numpy as np
+
+from notebooks.catalog_snapshot import CatalogSnapshot, write_catalog_snapshot
+from notebooks.mm_mapper import full_part_number_pipeline
+
+# Mapper keys are deliberately not in sorted order: input_map order gives the
+# data_list index and output_map order fills the part-number placeholders
+ROWS = [
+    {
+        "id": 1,
+        "part_number": "X[1-100/1]-[1-100/1]",
+        "brand": "ACME",
+        "category": "rail",
+        "regex": r"^X(\d+)-(\d+)$",
+        "ranges_json": [{"type": "range", "start": 1, "end": 100, "step": 1}] * 2,
+        "notes": None,
+        "specs": {"width": "[1-100/1]mm", "length": "[1-100/1]mm", "grade": "normal"},
+        "specs_part_number_mapper": {"width": 1, "length": 1},
+        "environment_value": None,
+        "specs_embedding": np.arange(4, dtype=np.float32),
+        "updated_at": datetime(2025, 1, 1, 12, 0),
+    },
+    {
+        "id": 2,
+        "part_number": "Y[1-100/1]/[1-100/1]",
+        "brand": "BOLT",
+        "category": "rail",
+        "regex": r"^Y(\d+)/(\d+)$",
+        "ranges_json": [{"type": "range", "start": 1, "end": 100, "step": 1}] * 2,
+        "notes": None,
+        "specs": {"width": "[1-100/1]mm", "length": "[1-100/1]mm", "grade": "normal"},
+        "specs_part_number_mapper": {"width": 1, "length": 1},
+        "environment_value": None,
+        "specs_embedding": np.ones(4, dtype=np.float32),
+        "updated_at": datetime(2025, 1, 2, 12, 0),
+    },
+]
+
+
+def _pipeline(input_row, output_row, data_list):
+    return full_part_number_pipeline(
+        output_range_partnumber=output_row["part_number"],
+        output_specs=output_row["specs"],
+        input_specs=input_row["specs"],
+        data_list=data_list,
+        input_map=input_row["specs_part_number_mapper"],
+        output_map=output_row["specs_part_number_mapper"],
+    )
+
+
+def test_round_trip_preserves_columns(tmp_path):
+    path = str(tmp_path / "catalog.pcat")
+    assert write_catalog_snapshot(ROWS, path) == len(ROWS)
+    snapshot = CatalogSnapshot(path)
+    try:
+        for original, row in zip(ROWS, snapshot):
+            for column in ("id", "part_number", "brand", "regex", "ranges_json", "specs", "updated_at"):
+                assert row[column] == original[column]
+            assert list(row["specs"]) == list(original["specs"])
+            assert list(row["specs_part_number_mapper"]) == list(original["specs_part_number_mapper"])
+            np.testing.assert_array_equal(row["specs_embedding"], original["specs_embedding"])
+        assert snapshot.watermark() == datetime(2025, 1, 2, 12, 0)
+    finally:
+        snapshot.close()
+
+
+def test_round_trip_keeps_part_number_mapping(tmp_path):
+    path = str(tmp_path / "catalog.pcat")
+    write_catalog_snapshot(ROWS, path)
+    snapshot = CatalogSnapshot(path)
+    try:
+        # Embeddings are views of the mapping, which close() releases
+        loaded = [{k: v for k, v in row.items() if k != "specs_embedding"} for row in snapshot]
+    finally:
+        snapshot.close()
+    expected = _pipeline(ROWS[0], ROWS[1], [3, 42])
+    assert expected[2] == "Y3/42"
+    assert _pipeline(loaded[0], loaded[1], [3, 42]) == expected
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from notebooks.equivalence_job import EquivalenceTable, build_equivalence_table
+from notebooks.template_catalog import template_key
+
+BRANDS = ["ACME", "BOLT", "CORE"]
+
+
+def _rows(groups=20, dim=8, seed=3):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for group in range(groups):
+        base = rng.normal(size=dim)
+        for brand in BRANDS:
+            rows.append({
+                "id": len(rows) + 1,
+                "part_number": f"{brand[:2]}{group:03d}",
+                "brand": brand,
+                "specs": {"group": group},
+                "specs_embedding": (base + rng.normal(scale=0.01, size=dim)).astype(np.float32),
+            })
+    return rows
+
+
+def _lists(table):
+    return {key: table.equivalents(key, min(table.thresholds)) for key in table.keys}
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return _rows()
+
+
+@pytest.fixture(scope="module")
+def table(rows):
+    table, _ = build_equivalence_table(rows, depth=4, workers=1)
+    return table
+
+
+def test_equivalents_are_other_brands_most_similar_first(rows, table):
+    brands = {template_key(r): r["brand"] for r in rows}
+    for key, found in _lists(table).items():
+        assert found
+        assert all(brands[k] != brands[key] for k, _ in found)
+        similarities = [s for _, s in found]
+        assert similarities == sorted(similarities, reverse=True)
+        assert len(found) <= table.depth
+
+
+def test_incremental_build_matches_full_build(rows, table):
+    changed = [dict(r) for r in rows]
+    rng = np.random.default_rng(9)
+    changed[4]["specs_embedding"] = rng.normal(size=8).astype(np.float32)
+    changed[10]["specs_embedding"] = changed[20]["specs_embedding"] + 0.001
+    del changed[7]
+    incremental, summary = build_equivalence_table(changed, previous=table, depth=4, workers=1)
+    full, _ = build_equivalence_table(changed, depth=4, workers=1)
+    assert summary["reused"] > 0
+    assert incremental.keys == full.keys
+    np.testing.assert_array_equal(incremental.neighbours, full.neighbours)
+    np.testing.assert_allclose(incremental.similarities, full.similarities, rtol=1e-6)
+
+
+def test_check_marks_changed_rows_and_their_listers(rows, table):
+    table = EquivalenceTable(table.keys, [table.fingerprints[k] for k in table.keys], table.neighbours,
+                             table.similarities, table.thresholds, table.depth)
+    assert table.check(rows) == 0
+    changed = dict(rows[0], specs_embedding=np.zeros(8, dtype=np.float32))
+    table.check([changed])
+    key = template_key(changed)
+    listers = {table.keys[i] for i in np.flatnonzero((table.neighbours == table.keys.index(key)).any(axis=1))}
+    assert listers
+    assert table.stale == {key} | listers
+    assert table.equivalents(key, 0.99) is None
+
+
+def test_save_and_load(tmp_path, table):
+    table.save(str(tmp_path))
+    loaded = EquivalenceTable.load(str(tmp_path))
+    assert loaded.keys == table.keys
+    assert loaded.depth == table.depth
+    assert _lists(loaded) == _lists(table)
@@ -0,0 +1,47 @@
+import types
+import uuid
+
+import numpy as np
+import pytest
+
+pytest.importorskip("weaviate")
+
+from weviate.export import export_collection, iter_objects, load_vectors
+
+
+def _collection(vectors):
+    # Served in list order, which stands in for uuid order
+    objects = [
+        types.SimpleNamespace(uuid=uuid.uuid4(), properties={"i": i}, vector={"default": v} if v is not None else {})
+        for i, v in enumerate(vectors)
+    ]
+
+    class Query:
+        def fetch_objects(self, limit, after, include_vector, return_properties):
+            start = 0 if after is None else next(i for i, o in enumerate(objects) if str(o.uuid) == after) + 1
+            return types.SimpleNamespace(objects=objects[start:start + limit])
+
+    return types.SimpleNamespace(query=Query(), name="Student"), objects
+
+
+def test_objects_without_a_vector_are_reported_not_fatal():
+    collection, objects = _collection([[1.0, 2.0], None, [3.0, 4.0], None])
+    found = {uuid: vector for uuid, _, vector in iter_objects(collection, page_size=2, include_vector=True)}
+    assert len(found) == 4
+    for obj in objects:
+        expected = obj.vector.get("default")
+        if expected is None:
+            assert found[str(obj.uuid)] is None
+        else:
+            assert found[str(obj.uuid)].tolist() == expected
+
+
+def test_export_keeps_rows_aligned_when_vectors_are_missing(tmp_path):
+    # The first page has no vector at all, so its dimension is only known later
+    collection, _ = _collection([None, None, [1.0, 2.0], [3.0, 4.0]])
+    meta = export_collection(collection, str(tmp_path), page_size=2, include_vector=True)
+    assert meta["count"] == 4 and meta["dim"] == 2 and meta["missing_vectors"] == 2
+    vectors = load_vectors(str(tmp_path))
+    assert np.isnan(vectors[:2]).all()
+    assert vectors[2:].tolist() == [[1.0, 2.0], [3.0, 4.0]]
+
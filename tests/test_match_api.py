@@ -0,0 +1,39 @@
+import asyncio
+import re
+
+import httpx
+
+from notebooks import refracting
+from notebooks.loadbench import build_synthetic_catalog, generate_requests, install_fake_backend
+
+
+def _responses(rows, requests, use_catalog, log_path):
+    async def run():
+        app = install_fake_backend(rows, use_catalog=use_catalog, benchmark_log_path=log_path)
+        async with refracting.lifespan(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return [(await client.post("/match-parts", json=body)).json() for body in requests]
+
+    return asyncio.run(run())
+
+
+def test_catalog_path_answers_like_the_rpc_path(tmp_path):
+    rows = build_synthetic_catalog(120, dim=16)
+    requests = generate_requests(rows, 80)
+    log_path = str(tmp_path / "benchmark_log.jsonl")
+    from_catalog = _responses(rows, requests, True, log_path)
+    from_rpc = _responses(rows, requests, False, log_path)
+    assert any("error" not in response for response in from_rpc)
+    for body, expected, actual in zip(requests, from_rpc, from_catalog):
+        assert actual == expected, body
+
+
+def test_request_without_brand_finds_its_row(tmp_path):
+    rows = build_synthetic_catalog(60, dim=16)
+    ranged = next(r for r in rows if r["ranges_json"])
+    part_number = re.sub(r"\[[^\]]+\]", str(ranged["ranges_json"][0]["start"]), ranged["part_number"])
+    static = next(r for r in rows if not r["ranges_json"])
+    requests = [{"part_number": part_number}, {"part_number": part_number, "brand": None},
+                {"part_number": static["part_number"], "brand": None}]
+    for response in _responses(rows, requests, True, str(tmp_path / "benchmark_log.jsonl")):
+        assert "error" not in response, response
@@ -0,0 +1,80 @@
+import sys
+import threading
+
+from notebooks import mm_mapper
+from notebooks.mm_mapper import clear_plan_cache, full_part_number_pipeline, get_part_number_plan, mapping_fingerprint
+
+INPUT = {
+    "part_number": "X[1-100/1]-[1-100/1]",
+    "specs": {"width": "[1-100/1]mm", "length": "[1-100/1]mm"},
+    "specs_part_number_mapper": {"width": 1, "length": 1},
+}
+OUTPUT = {
+    "part_number": "Y[1-100/1]/[1-100/1]",
+    "specs": {"width": "[1-100/1]mm", "length": "[1-100/1]mm"},
+    "specs_part_number_mapper": {"width": 1, "length": 1},
+}
+
+
+def _plan(key, input_row=INPUT, output_row=OUTPUT):
+    return get_part_number_plan(
+        key, output_row["part_number"], output_row["specs"], input_row["specs"],
+        input_row["specs_part_number_mapper"], output_row["specs_part_number_mapper"],
+    )
+
+
+def test_plan_matches_pipeline():
+    clear_plan_cache()
+    expected = full_part_number_pipeline(
+        OUTPUT["part_number"], OUTPUT["specs"], INPUT["specs"], [3, 42],
+        INPUT["specs_part_number_mapper"], OUTPUT["specs_part_number_mapper"],
+    )
+    assert _plan("pair").apply([3, 42]) == expected
+    assert _plan("pair") is _plan("pair")
+
+
+def test_fingerprint_follows_content_and_key_order():
+    swapped = dict(OUTPUT, specs_part_number_mapper={"length": 1, "width": 1})
+    assert mapping_fingerprint(OUTPUT) == mapping_fingerprint(dict(OUTPUT))
+    assert mapping_fingerprint(OUTPUT) != mapping_fingerprint(swapped)
+    assert mapping_fingerprint(OUTPUT) != mapping_fingerprint(dict(OUTPUT, specs={"width": "[1-50/1]mm"}))
+
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(mm_mapper, "PLAN_CACHE_SIZE", 2)
+    clear_plan_cache()
+    first = _plan("a")
+    _plan("b")
+    assert _plan("a") is first  # refreshed, so "b" is evicted next
+    _plan("c")
+    assert _plan("a") is first
+    assert len(mm_mapper._plan_cache) == 2
+    assert "b" not in mm_mapper._plan_cache
+
+
+def test_concurrent_use_with_eviction_and_clear(monkeypatch):
+    monkeypatch.setattr(mm_mapper, "PLAN_CACHE_SIZE", 4)
+    # Switch threads as often as possible so unguarded updates interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    clear_plan_cache()
+    errors = []
+
+    def worker(seed):
+        try:
+            for i in range(3000):
+                _plan((seed + i) % 7)
+                if i % 500 == 0:
+                    clear_plan_cache()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
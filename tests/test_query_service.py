@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+pytest.importorskip("weaviate")
+
+from weviate.query_service import NearTextService
+
+
+class FakeConnection:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class ThreadRecordingCache:
+    """EmbeddingCache stand-in recording the thread of every call."""
+
+    def __init__(self):
+        self.threads = []
+        self.vectors = {}
+
+    def get_many(self, keys):
+        self.threads.append(threading.get_ident())
+        return {k: self.vectors[k] for k in keys if k in self.vectors}
+
+    def put_many(self, items):
+        self.threads.append(threading.get_ident())
+        self.vectors.update(items)
+
+
+def test_embedding_cache_runs_off_the_event_loop():
+    cache = ThreadRecordingCache()
+
+    async def run():
+        service = NearTextService("Student", connection=FakeConnection(), vectorizer_url="http://transformers",
+                                  embedding_cache=cache)
+        service._http = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"vector": [0.1, 0.2]})))
+        vector = await service._embed("robots")
+        await service.close()
+        return vector, threading.get_ident()
+
+    vector, loop_thread = asyncio.run(run())
+    assert vector == [0.1, 0.2]
+    assert len(cache.threads) == 2 and loop_thread not in cache.threads
+
+
+def test_close_leaves_a_passed_connection_open():
+    connection = FakeConnection()
+    asyncio.run(NearTextService("Student", connection=connection).close())
+    assert not connection.closed
@@ -0,0 +1,35 @@
+from notebooks.refracting import apply_search_settings
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        self.statements.append((sql, params))
+
+    def close(self):
+        pass
+
+
+def _settings(conn):
+    (sql, params), = conn.statements
+    return dict(zip(params[::2], params[1::2]))
+
+
+def test_exact_forces_custom_plans():
+    conn = RecordingConnection()
+    apply_search_settings(conn, 10, exact=True)
+    settings = _settings(conn)
+    # A generic plan cached inside the RPC would keep using the vector index
+    assert settings["enable_indexscan"] == "off"
+    assert settings["plan_cache_mode"] == "force_custom_plan"
+
+
+def test_default_search_sends_nothing():
+    conn = RecordingConnection()
+    apply_search_settings(conn, 10)
+    assert conn.statements == []
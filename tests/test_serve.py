@@ -0,0 +1,16 @@
+import pytest
+
+from notebooks.serve import Supervisor, worker_pool_size
+
+
+@pytest.mark.parametrize("db_connections, workers", [(20, 1), (20, 4), (40, 4), (41, 7), (100, 16)])
+def test_pools_fit_the_budget_during_a_reload(db_connections, workers):
+    pool_size = worker_pool_size(db_connections, workers)
+    # The rolling reload runs the new worker before the old one exits
+    assert pool_size * (workers + 1) <= db_connections
+
+
+def test_worker_env_caps_min_at_max(monkeypatch):
+    monkeypatch.setenv("DB_POOL_MIN", "50")
+    env = Supervisor(workers=4, db_connections=20).worker_env()
+    assert env == {"DB_POOL_MAX": "4", "DB_POOL_MIN": "4"}
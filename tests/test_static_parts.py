@@ -0,0 +1,99 @@
+import numpy as np
+
+from notebooks.static_parts import StaticPartIndex
+from notebooks.template_catalog import template_key
+from notebooks.vector_recall import cosine_similarities
+
+MIN_SIMILARITY = 0.5
+DEPTH = 4
+
+
+def _row(id, embedding, part_number=None):
+    part_number = part_number or f"AB{id:03d}"
+    return {"id": id, "part_number": part_number, "brand": "ACME", "regex": f"^{part_number}$",
+            "specs_embedding": np.asarray(embedding, dtype=np.float64)}
+
+
+class ExactSearch:
+    """search_batch over the current catalog, counting the searches run."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.searches = 0
+
+    def __call__(self, searches):
+        rows = list(self.catalog.values())
+        matrix = np.asarray([r["specs_embedding"] for r in rows])
+        results = []
+        for embedding, top_k, min_similarity in searches:
+            self.searches += 1
+            similarity = cosine_similarities(embedding, matrix)
+            order = [i for i in np.argsort(-similarity, kind="stable") if similarity[i] >= min_similarity][:top_k]
+            results.append([dict(rows[i], similarity=float(similarity[i])) for i in order])
+        return results
+
+
+def _neighbour_ids(index, catalog):
+    return {
+        key: [(n["id"], round(n["similarity"], 9)) for n, _ in index.neighbours(row, MIN_SIMILARITY, DEPTH)]
+        for key, row in catalog.items() if index.neighbours(row, MIN_SIMILARITY, DEPTH) is not None
+    }
+
+
+def _full(catalog):
+    index = StaticPartIndex()
+    index.build(catalog.values())
+    index.precompute(ExactSearch(catalog), MIN_SIMILARITY, DEPTH)
+    return _neighbour_ids(index, catalog)
+
+
+def test_update_matches_full_rebuild():
+    rng = np.random.default_rng(5)
+    catalog = {}
+    for id in range(1, 41):
+        row = _row(id, rng.normal(size=6))
+        catalog[template_key(row)] = row
+    index = StaticPartIndex()
+    index.build(catalog.values())
+    index.precompute(ExactSearch(catalog), MIN_SIMILARITY, DEPTH)
+
+    next_id = 100
+    for step in range(30):
+        keys = list(catalog)
+        changed = []
+        if step % 3 == 0:
+            del catalog[keys[rng.integers(len(keys))]]
+        elif step % 3 == 1:
+            key = keys[rng.integers(len(keys))]
+            row = _row(catalog[key]["id"], rng.normal(size=6))
+            catalog[key] = row
+            changed.append(row)
+        else:
+            row = _row(next_id, rng.normal(size=6))
+            next_id += 1
+            catalog[template_key(row)] = row
+            changed.append(row)
+        search = ExactSearch(catalog)
+        stale = index.update(catalog.values(), changed, MIN_SIMILARITY)
+        index.precompute(search, MIN_SIMILARITY, DEPTH, rows=stale)
+        assert search.searches < len(catalog)
+        assert _neighbour_ids(index, catalog) == _full(catalog)
+
+
+def test_update_discards_neighbours_searched_before_it():
+    catalog = {template_key(r): r for r in (_row(1, [1, 0]), _row(2, [0, 1]))}
+    index = StaticPartIndex()
+    index.build(catalog.values())
+    search = ExactSearch(catalog)
+    moved = _row(2, [1, 0.1])
+
+    def search_then_change(searches):
+        results = search(searches)
+        if moved is not catalog[template_key(moved)]:
+            catalog[template_key(moved)] = moved
+            index.update(catalog.values(), [moved], MIN_SIMILARITY)
+        return results
+
+    # The first round searched the old catalog; both templates are searched again
+    assert index.precompute(search_then_change, MIN_SIMILARITY, DEPTH) == 2
+    assert [n["id"] for n, _ in index.neighbours(catalog[1], MIN_SIMILARITY, DEPTH)] == [1, 2]
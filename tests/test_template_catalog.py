@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from notebooks.template_catalog import InMemoryTemplateSource, TemplateCatalog
+
+T0 = datetime(2025, 1, 1, 12, 0)
+
+
+def _row(id, part_number, updated_at, brand="ACME"):
+    return {"id": id, "part_number": part_number, "brand": brand, "regex": f"^{part_number}$", "updated_at": updated_at}
+
+
+def _catalog(rows, **kwargs):
+    source = InMemoryTemplateSource(rows)
+    catalog = TemplateCatalog(source, **kwargs)
+    notified = []
+    catalog.add_listener(lambda changed: notified.append([r["id"] for r in changed]))
+    catalog.load()
+    notified.clear()
+    return source, catalog, notified
+
+
+def test_refresh_applies_changes_since_watermark():
+    source, catalog, notified = _catalog([_row(1, "AB1", T0), _row(2, "AB2", T0 + timedelta(seconds=1))])
+    source.upsert(_row(2, "AB2X", T0 + timedelta(seconds=5)))
+    assert catalog.refresh() == 1
+    assert catalog.rows[2]["part_number"] == "AB2X"
+    assert catalog.watermark == T0 + timedelta(seconds=5)
+    assert notified == [[2]]
+    # Rows re-read from the overlap window are not changes
+    assert catalog.refresh() == 0
+    assert notified == [[2]]
+
+
+def test_refresh_sees_late_commit_inside_overlap():
+    source, catalog, _ = _catalog([_row(1, "AB1", T0 + timedelta(seconds=10))], overlap=timedelta(seconds=30))
+    # Committed after the refresh that moved the watermark, stamped before it
+    source.upsert(_row(2, "AB2", T0 + timedelta(seconds=2)))
+    assert catalog.refresh() == 1
+    assert 2 in catalog.rows
+
+
+def test_refresh_misses_late_commit_outside_overlap():
+    source, catalog, _ = _catalog([_row(1, "AB1", T0 + timedelta(seconds=10))], overlap=timedelta(0))
+    source.upsert(_row(2, "AB2", T0 + timedelta(seconds=2)))
+    assert catalog.refresh() == 0
+    # reconcile catches what the watermark cannot
+    assert catalog.reconcile() == 1
+    assert 2 in catalog.rows
+
+
+def test_reconcile_applies_deletes():
+    source, catalog, notified = _catalog([_row(1, "AB1", T0), _row(2, "AB2", T0)])
+    assert catalog.reconcile() == 0
+    assert notified == []
+    source.delete(_row(2, "AB2", T0))
+    assert catalog.refresh() == 0
+    assert catalog.reconcile() == 1
+    assert list(catalog.rows) == [1]
+    assert catalog.lookup("AB2") == []
+    assert notified == [[]]
+
+
+def test_lookup_after_refresh():
+    source, catalog, _ = _catalog([_row(1, "AB1", T0)])
+    source.upsert(_row(3, "AB3", T0 + timedelta(seconds=1)))
+    catalog.refresh()
+    assert [r["id"] for r in catalog.lookup("AB3")] == [3]
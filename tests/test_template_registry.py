@@ -0,0 +1,22 @@
+from notebooks.template_registry import TemplateRegistry
+
+
+def _template(id, part_number, brand="ACME"):
+    return {"id": id, "part_number": part_number, "brand": brand, "regex": r"^AB1\d*$"}
+
+
+def test_candidates_follow_the_rpc_order():
+    # Added out of id order, as catalog rows arrive after refreshes
+    registry = TemplateRegistry([
+        _template(7, "AB1[1-9/1]"), _template(3, "AB[1-9/1]"), _template(5, "AB1[1-9/1]"), _template(1, "AB1[1-9/1]"),
+    ])
+    # ORDER BY length(static_part) DESC, id
+    assert [t["id"] for t in registry.candidates("AB12")] == [1, 5, 7, 3]
+    assert registry.resolve("AB12")["id"] == 1
+
+
+def test_refresh_keeps_id_order():
+    registry = TemplateRegistry([_template(2, "AB1[1-9/1]"), _template(9, "AB1[1-9/1]")])
+    registry.remove(lambda t: t["id"] == 2)
+    registry.add(_template(2, "AB1[1-9/1]"))
+    assert [t["id"] for t in registry.candidates("AB12")] == [2, 9]
@@ -0,0 +1,63 @@
+import sys
+import threading
+
+from notebooks import validator as validator_module
+from notebooks.validator import clear_validator_cache, get_validator, validate_user_input
+
+REGEX = r"^A(\d+)-(\d+)$"
+RANGES = [{"type": "range", "start": 1, "end": 50, "step": 1}, {"type": "list", "values": [10, 20]}]
+
+
+def test_validate_user_input():
+    assert validate_user_input("A12-20", REGEX, RANGES) == (True, [12.0, 20.0])
+    assert validate_user_input("A51-20", REGEX, RANGES) == (False, [])
+    assert validate_user_input("A12-30", REGEX, RANGES) == (False, [])
+    assert validate_user_input("B12-20", REGEX, RANGES) == (False, [])
+
+
+def test_key_includes_template_content():
+    clear_validator_cache()
+    narrow = get_validator(1, REGEX, RANGES)
+    assert get_validator(1, REGEX, RANGES) is narrow
+    wide = get_validator(1, REGEX, [dict(RANGES[0], end=100), RANGES[1]])
+    assert wide is not narrow
+    assert narrow.validate("A80-10") == (False, [])
+    assert wide.validate("A80-10") == (True, [80.0, 10.0])
+
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(validator_module, "VALIDATOR_CACHE_SIZE", 2)
+    clear_validator_cache()
+    first = get_validator("a", REGEX, RANGES)
+    get_validator("b", REGEX, RANGES)
+    assert get_validator("a", REGEX, RANGES) is first
+    get_validator("c", REGEX, RANGES)
+    assert get_validator("a", REGEX, RANGES) is first
+    assert len(validator_module._validator_cache) == 2
+
+
+def test_concurrent_use_with_eviction_and_clear(monkeypatch):
+    monkeypatch.setattr(validator_module, "VALIDATOR_CACHE_SIZE", 4)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    clear_validator_cache()
+    errors = []
+
+    def worker(seed):
+        try:
+            for i in range(3000):
+                get_validator((seed + i) % 7, REGEX, RANGES).validate("A12-20")
+                if i % 500 == 0:
+                    clear_validator_cache()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
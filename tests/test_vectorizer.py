@@ -0,0 +1,38 @@
+import hashlib
+import json
+
+import httpx
+
+from weviate.vectorizer import EmbeddingCache, TransformersVectorizer, object_text
+
+
+def test_object_text_follows_text2vec():
+    student = {"name": "Ann", "age": 21, "motivation": "I like Robots.", "tags": ["AI", "Ethics"]}
+    # Class name first, text properties in name order, lowercased; numbers are not text
+    assert object_text("Student", student) == "student i like robots. ann ai ethics"
+    assert object_text("StudentRecord", student, fields=["motivation"]) == "student record i like robots."
+    assert object_text("Student", student, fields=["motivation"], vectorize_class_name=False,
+                       named_fields=["motivation"]) == "motivation i like robots."
+
+
+def _vectorizer(cache, model, calls):
+    def handler(request):
+        text = json.loads(request.content)["text"]
+        calls.append(text)
+        return httpx.Response(200, json={"vector": list(hashlib.md5(f"{model}{text}".encode()).digest())})
+
+    vectorizer = TransformersVectorizer("http://transformers", cache=cache, model=model)
+    vectorizer._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return vectorizer
+
+
+def test_cache_is_keyed_on_the_configured_model(tmp_path):
+    calls = []
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    first = _vectorizer(cache, "model-a", calls).vectorize(["robots"])
+    assert _vectorizer(cache, "model-a", calls).vectorize(["robots"]) == first
+    assert len(calls) == 1
+    # Another model's vectors are never served from the cache
+    assert _vectorizer(cache, "model-b", calls).vectorize(["robots"]) != first
+    assert len(calls) == 2
+    cache.close()
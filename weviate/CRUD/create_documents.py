@@ -1,15 +1,14 @@
 # === insert_students.py ===
-import weaviate
+# python -m weviate.CRUD.create_documents
+# VECTORIZER_URL=http://localhost:8081 python -m weviate.CRUD.create_documents  (client-side vectors,
+#   cached in EMBEDDING_CACHE, default .cache/embeddings.sqlite)
+import os
 import random
-from weaviate.classes.init import AdditionalConfig, Timeout
+from ..client import get_client
+from ..ingest import ingest
+from ..vectorizer import TransformersVectorizer, EmbeddingCache
 
-client = weaviate.connect_to_local(
-    port=8082,
-    grpc_port=50051,
-    additional_config=AdditionalConfig(timeout=Timeout(init=30))
-)
-
-student_collection = client.collections.get("Student")
+student_collection = get_client().collections.get("Student")
 
 names = [f"Student {i}" for i in range(1, 101)]
 majors = ["Computer Science", "Math", "Physics", "Biology", "Engineering"]
@@ -26,15 +25,27 @@ motivations = [
     "I love experimenting with generative AI models."
 ]
 
-# Generate and insert 100 student records
-for i in range(100):
-    student = {
+# Generate 100 student records and insert them in batches
+students = (
+    {
         "name": names[i],
         "age": random.randint(18, 30),
         "major": random.choice(majors),
         "motivation": random.choice(motivations)
     }
-    student_collection.data.insert(student)
+    for i in range(100)
+)
+# Texts follow the schema (only motivation is vectorized); each distinct text is embedded once
+vectorizer = None
+if os.getenv("VECTORIZER_URL"):
+    vectorizer = TransformersVectorizer(
+        os.getenv("VECTORIZER_URL"),
+        cache=EmbeddingCache(os.getenv("EMBEDDING_CACHE", ".cache/embeddings.sqlite"))
+    )
+stats = ingest(student_collection, students, batch="fixed", batch_size=100, id_fields=["name"],
+               vectorizer=vectorizer)
+if vectorizer is not None:
+    print(f"Embedded {stats['vectorizer']['embedded']} texts, {stats['vectorizer']['cache_hits']} from cache.")
+    vectorizer.close()
 
-print("Inserted 100 student objects successfully.")
-client.close()
+print(f"Inserted {stats['objects'] - stats['failed']} student objects successfully ({stats['objects_per_second']} obj/s).")
@@ -1,33 +1,31 @@
 # === query_students.py ===
-import weaviate
-from weaviate.classes.query import Filter, MetadataQuery
-from weaviate.classes.init import AdditionalConfig, Timeout
+# python -m weviate.CRUD.read_documents
+import asyncio
+from ..query_service import NearTextService
 
-client = weaviate.connect_to_local(
-    port=8082,
-    grpc_port=50051,
-    additional_config=AdditionalConfig(timeout=Timeout(init=30))
-)
+# Input query texts, searched concurrently
+query_motivations = [
+    "I'm interested in AI for solving environmental issues.",
+    "I want to build robots.",
+    "Machine learning for medicine.",
+]
 
-student_collection = client.collections.get("Student")
 
-# Input query text
-query_motivation = "I'm interested in AI for solving environmental issues."
+async def search_students():
+    service = NearTextService("Student")
+    try:
+        # Semantic similarity search on the vectorized 'motivation' field
+        return await service.search_many(query_motivations, limit=5)
+    finally:
+        await service.close()
 
-# Perform semantic similarity search on the vectorized 'motivation' field
-results = student_collection.query.near_text(
-    query=query_motivation,
-    limit=5,
-    return_metadata=MetadataQuery(distance=True)
-)
 
-print("Top 5 matching students:")
-for i, obj in enumerate(results.objects, 1):
-    print(f"{i}. Name: {obj.properties['name']}")
-    print(f"   Age: {obj.properties['age']}")
-    print(f"   Major: {obj.properties['major']}")
-    print(f"   Motivation: {obj.properties['motivation']}")
-    print(f"   Cosine Distance: {obj.metadata.distance:.4f}")
-    print("-" * 50)
-
-client.close()
+for result in asyncio.run(search_students()):
+    print(f"Top 5 matching students for: {result['query']} ({result['latency_ms']:.1f} ms)")
+    for i, obj in enumerate(result.get("objects", []), 1):
+        print(f"{i}. Name: {obj['properties']['name']}")
+        print(f"   Age: {obj['properties']['age']}")
+        print(f"   Major: {obj['properties']['major']}")
+        print(f"   Motivation: {obj['properties']['motivation']}")
+        print(f"   Cosine Distance: {obj['distance']:.4f}")
+        print("-" * 50)
@@ -1,30 +1,24 @@
 # === schema_creation.py ===
-import weaviate
+# python -m weviate.CRUD.schema_creation
 from weaviate.classes.config import Configure, Property, DataType
-from weaviate.classes.init import AdditionalConfig, Timeout
+from ..client import weaviate_client
 
-client = weaviate.connect_to_local(
-    port=8082,
-    grpc_port=50051,
-    additional_config=AdditionalConfig(timeout=Timeout(init=30))
-)
+with weaviate_client() as client:
+    # Delete existing schema if it exists
+    if client.collections.exists("Student"):
+        client.collections.delete("Student")
+        print("Deleted existing Student collection")
 
-# Delete existing schema if it exists
-if client.collections.exists("Student"):
-    client.collections.delete("Student")
-    print("Deleted existing Student collection")
-
-# Create new schema
-client.collections.create(
-    name="Student",
-    properties=[
-        Property(name="name", data_type=DataType.TEXT, skip_vectorization=True),
-        Property(name="age", data_type=DataType.INT),
-        Property(name="major", data_type=DataType.TEXT, skip_vectorization=True),
-        Property(name="motivation", data_type=DataType.TEXT)
-    ],
-    vectorizer_config=Configure.Vectorizer.text2vec_transformers()
-)
+    # Create new schema
+    client.collections.create(
+        name="Student",
+        properties=[
+            Property(name="name", data_type=DataType.TEXT, skip_vectorization=True),
+            Property(name="age", data_type=DataType.INT),
+            Property(name="major", data_type=DataType.TEXT, skip_vectorization=True),
+            Property(name="motivation", data_type=DataType.TEXT)
+        ],
+        vectorizer_config=Configure.Vectorizer.text2vec_transformers()
+    )
 
 print("Schema created successfully!")
-client.close()
@@ -0,0 +1,208 @@
+# === client.py ===
+import os
+import time
+import atexit
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+import weaviate
+from weaviate.classes.init import AdditionalConfig, Timeout
+
+# Shared Weaviate client for the scripts and services under weviate/
+#
+#   from weviate.client import weaviate_client
+#   with weaviate_client() as client:
+#       client.collections.get("Student").query.near_text(...)
+#
+# The client connects on first use, waits for Weaviate's readiness endpoint
+# instead of relying on a fixed init timeout, and then stays open: every
+# operation reuses its HTTP connections and gRPC channel. It is closed at
+# interpreter exit (or explicitly with close()). AsyncWeaviateConnection does
+# the same for the async client, for services running on an event loop.
+
+# Connection settings (docker/docker-compose.yml maps HTTP to 8082)
+WEAVIATE_CONFIG = {
+    "host": os.getenv("WEAVIATE_HOST", "localhost"),
+    "port": int(os.getenv("WEAVIATE_HTTP_PORT", 8082)),
+    "grpc_port": int(os.getenv("WEAVIATE_GRPC_PORT", 50051)),
+}
+
+
+def _additional_config(query_timeout: float, insert_timeout: float) -> AdditionalConfig:
+    return AdditionalConfig(timeout=Timeout(init=query_timeout, query=query_timeout, insert=insert_timeout))
+
+
+class WeaviateConnection:
+    """
+    Lazily connected, long-lived Weaviate client.
+
+    get() connects on first call and blocks until Weaviate reports ready (or
+    ready_timeout passes); later calls return the same client. Thread-safe.
+    """
+
+    def __init__(self, config: Dict[str, Any], ready_timeout: float = 60.0, query_timeout: float = 30.0,
+                 insert_timeout: float = 90.0):
+        self.config = config
+        self.ready_timeout = ready_timeout
+        self.query_timeout = query_timeout
+        self.insert_timeout = insert_timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None
+
+    def _connect(self):
+        """Connect, retrying until the readiness check passes."""
+        deadline = time.monotonic() + self.ready_timeout
+        delay = 0.25
+        client = None
+        last_error = None
+        while True:
+            try:
+                if client is None:
+                    # Readiness is checked below, so the startup checks are skipped
+                    client = weaviate.connect_to_local(
+                        **self.config,
+                        additional_config=_additional_config(self.query_timeout, self.insert_timeout),
+                        skip_init_checks=True,
+                    )
+                if client.is_ready():
+                    print(f"✅ Connected to Weaviate at {self.config['host']}:{self.config['port']}")
+                    return client
+                last_error = "not ready"
+            except Exception as e:
+                last_error = e
+            if time.monotonic() >= deadline:
+                if client is not None:
+                    client.close()
+                raise RuntimeError(f"Weaviate at {self.config['host']}:{self.config['port']} "
+                                   f"not ready after {self.ready_timeout}s: {last_error}")
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def get(self):
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                self._client = self._connect()
+            return self._client
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def __enter__(self):
+        return self.get()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class AsyncWeaviateConnection:
+    """
+    WeaviateConnection for the async client: await get() connects on first
+    call and waits for readiness without blocking the event loop.
+    """
+
+    def __init__(self, config: Dict[str, Any], ready_timeout: float = 60.0, query_timeout: float = 30.0,
+                 insert_timeout: float = 90.0):
+        self.config = config
+        self.ready_timeout = ready_timeout
+        self.query_timeout = query_timeout
+        self.insert_timeout = insert_timeout
+        self._client = None
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None
+
+    async def _connect_async(self):
+        deadline = time.monotonic() + self.ready_timeout
+        delay = 0.25
+        client = weaviate.use_async_with_local(
+            **self.config,
+            additional_config=_additional_config(self.query_timeout, self.insert_timeout),
+            skip_init_checks=True,
+        )
+        last_error = None
+        while True:
+            try:
+                if not client.is_connected():
+                    await client.connect()
+                if await client.is_ready():
+                    print(f"✅ Connected to Weaviate (async) at {self.config['host']}:{self.config['port']}")
+                    return client
+                last_error = "not ready"
+            except Exception as e:
+                last_error = e
+            if time.monotonic() >= deadline:
+                await client.close()
+                raise RuntimeError(f"Weaviate at {self.config['host']}:{self.config['port']} "
+                                   f"not ready after {self.ready_timeout}s: {last_error}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    async def get(self):
+        client = self._client
+        if client is not None:
+            return client
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self._client is None:
+                self._client = await self._connect_async()
+            return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.close()
+
+    async def __aenter__(self):
+        return await self.get()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+def _timeouts_from_env() -> Dict[str, float]:
+    return {
+        "ready_timeout": float(os.getenv("WEAVIATE_READY_TIMEOUT", 60)),
+        "query_timeout": float(os.getenv("WEAVIATE_QUERY_TIMEOUT", 30)),
+        "insert_timeout": float(os.getenv("WEAVIATE_INSERT_TIMEOUT", 90)),
+    }
+
+
+def connection_from_env(config: Optional[Dict[str, Any]] = None) -> WeaviateConnection:
+    return WeaviateConnection(config or WEAVIATE_CONFIG, **_timeouts_from_env())
+
+
+def async_connection_from_env(config: Optional[Dict[str, Any]] = None) -> AsyncWeaviateConnection:
+    return AsyncWeaviateConnection(config or WEAVIATE_CONFIG, **_timeouts_from_env())
+
+
+# Process-wide connection, opened on first use
+shared_connection = connection_from_env()
+atexit.register(shared_connection.close)
+
+
+def get_client():
+    """The shared client, connecting on first use."""
+    return shared_connection.get()
+
+
+@contextmanager
+def weaviate_client():
+    """
+    Yield the shared client. It is not closed on exit, so later operations
+    (in this script or a long-running service) reuse the warm connection.
+    """
+    yield shared_connection.get()
@@ -0,0 +1,183 @@
+# === export.py ===
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from .client import get_client
+
+# Cursor-based reads of a whole collection in bounded memory
+#
+#   for uuids, properties, vectors in iter_pages(collection, page_size=1000, include_vector=True):
+#       ...  # vectors: float32 array of shape (len(uuids), dim)
+#
+#   python -m weviate.export Student exports/students --vectors
+#
+# Pages follow the after=<last uuid> cursor, so each request is a cheap
+# continuation rather than an offset scan, and only one page is held at a
+# time. Weaviate does not combine the cursor with filters or sorting.
+# The export writes objects.jsonl, vectors.f32 (raw float32 rows in the same
+# order, NaN for objects without a vector) and meta.json; load_vectors() maps
+# the vectors back as an array.
+
+
+def _page_vectors(objects, vector_name: str, dim: Optional[int] = None) -> np.ndarray:
+    """
+    float32 (len(objects), dim) matrix of the page's vectors. Objects without
+    the vector get a NaN row; dim comes from the page, else the given dim, else 0.
+    """
+    vectors = []
+    for obj in objects:
+        vector = obj.vector
+        if isinstance(vector, dict):
+            vector = vector.get(vector_name)
+        vectors.append(vector)
+    present = [v for v in vectors if v is not None]
+    if present:
+        dim = len(present[0])
+    matrix = np.full((len(objects), dim or 0), np.nan, dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[i] = vector
+    return matrix
+
+
+def missing_vectors(vectors: np.ndarray) -> np.ndarray:
+    """Rows of a page's vectors that belong to objects without a vector."""
+    return np.isnan(vectors).all(axis=1)
+
+
+def iter_pages(
+    collection,
+    page_size: int = 1000,
+    include_vector: bool = False,
+    return_properties: Optional[List[str]] = None,
+    vector_name: str = "default",
+    after: Optional[str] = None,
+) -> Iterator[Tuple[List[str], List[Dict[str, Any]], Optional[np.ndarray]]]:
+    """
+    Yield (uuids, properties, vectors) per page; vectors is a float32 matrix
+    when include_vector is set, else None. Objects without the vector have a
+    NaN row (see missing_vectors). after resumes behind that uuid.
+    """
+    dim = None
+    while True:
+        result = collection.query.fetch_objects(
+            limit=page_size,
+            after=after,
+            include_vector=include_vector,
+            return_properties=return_properties,
+        )
+        objects = result.objects
+        if not objects:
+            return
+        uuids = [str(obj.uuid) for obj in objects]
+        vectors = _page_vectors(objects, vector_name, dim) if include_vector else None
+        if vectors is not None and vectors.shape[1]:
+            dim = vectors.shape[1]
+        yield uuids, [obj.properties for obj in objects], vectors
+        if len(objects) < page_size:
+            return
+        after = uuids[-1]
+
+
+def iter_objects(collection, **kwargs) -> Iterator[Tuple[str, Dict[str, Any], Optional[np.ndarray]]]:
+    """
+    Yield (uuid, properties, vector) per object; see iter_pages for the options.
+    vector is None when not requested or the object has none.
+    """
+    for uuids, properties, vectors in iter_pages(collection, **kwargs):
+        missing = missing_vectors(vectors) if vectors is not None else None
+        for i, (uuid, props) in enumerate(zip(uuids, properties)):
+            yield uuid, props, vectors[i] if missing is not None and not missing[i] else None
+
+
+def export_collection(collection, path: str, page_size: int = 1000, include_vector: bool = False,
+                      vector_name: str = "default", report_every: int = 100000) -> Dict[str, Any]:
+    """
+    Stream a collection to path (objects.jsonl, vectors.f32, meta.json).
+    Objects without a vector are exported with a NaN vector row and counted
+    in meta's missing_vectors.
+    """
+    os.makedirs(path, exist_ok=True)
+    start = time.perf_counter()
+    count = 0
+    dim = None
+    missing = 0
+    # Objects without a vector seen before the dimension is known
+    pending = 0
+    next_report = report_every
+    vectors_file = open(os.path.join(path, "vectors.f32"), "wb") if include_vector else None
+    try:
+        with open(os.path.join(path, "objects.jsonl"), "w") as objects_file:
+            for uuids, properties, vectors in iter_pages(collection, page_size, include_vector, vector_name=vector_name):
+                for uuid, props in zip(uuids, properties):
+                    objects_file.write(json.dumps({"uuid": uuid, "properties": props}, default=str) + "\n")
+                if vectors is not None:
+                    missing += int(missing_vectors(vectors).sum())
+                    if not vectors.shape[1]:
+                        # No vector seen yet; their NaN rows are written once the dimension is known
+                        pending += len(uuids)
+                    else:
+                        if dim is None:
+                            dim = vectors.shape[1]
+                            vectors_file.write(np.full((pending, dim), np.nan, dtype=np.float32).tobytes())
+                        elif vectors.shape[1] != dim:
+                            raise ValueError(f"Vector dimension changed from {dim} to {vectors.shape[1]}")
+                        vectors_file.write(vectors.tobytes())
+                count += len(uuids)
+                if report_every and count >= next_report:
+                    next_report += report_every
+                    print(f"📦 {count} objects, {count / (time.perf_counter() - start):.0f} obj/s")
+    finally:
+        if vectors_file is not None:
+            vectors_file.close()
+    meta = {
+        "collection": collection.name,
+        "count": count,
+        "dim": dim,
+        "missing_vectors": missing if include_vector else None,
+        "dtype": "float32" if include_vector else None,
+        "vector_name": vector_name if include_vector else None,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    # Written last: a directory with meta.json is a complete export
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_vectors(path: str) -> np.ndarray:
+    """Memory-mapped (count, dim) float32 vectors of an export; NaN rows for objects without one."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if not meta["count"] or meta["dim"] is None:
+        return np.zeros((meta["count"], 0), dtype=np.float32)
+    return np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(meta["count"], meta["dim"]))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export a Weaviate collection page by page.")
+    parser.add_argument("collection")
+    parser.add_argument("path", help="output directory")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--vectors", action="store_true", help="also export vectors")
+    parser.add_argument("--vector-name", default="default")
+    args = parser.parse_args(argv)
+    client = get_client()
+    if not client.collections.exists(args.collection):
+        print(f"❌ Collection {args.collection} does not exist")
+        return 1
+    meta = export_collection(client.collections.get(args.collection), args.path, args.page_size,
+                             args.vectors, args.vector_name)
+    print(json.dumps(meta, indent=2))
+    if meta["missing_vectors"]:
+        print(f"⚠️ {meta['missing_vectors']} objects had no '{args.vector_name}' vector (NaN rows)")
+    print(f"✅ Exported {meta['count']} objects to {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
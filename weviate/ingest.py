@@ -0,0 +1,225 @@
+# === ingest.py ===
+import sys
+import csv
+import json
+import time
+import argparse
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+from weaviate.util import generate_uuid5
+from weaviate.classes.config import DataType
+from .client import WEAVIATE_CONFIG, connection_from_env
+from .vectorizer import TransformersVectorizer, EmbeddingCache, EMBEDDING_MODEL, object_text
+
+# Batched ingestion into a Weaviate collection
+#
+#   python -m weviate.ingest parts.jsonl --collection Part --id-fields part_number,brand
+#   python -m weviate.ingest students.csv --collection Student --batch fixed --batch-size 200 --concurrency 4
+#   python -m weviate.ingest parts.jsonl --collection Part --vectorizer-url http://localhost:8081 \
+#       --embedding-cache .cache/embeddings.sqlite
+#
+# Records stream from a .jsonl/.json/.csv file (or any iterable via ingest())
+# into dynamic or fixed-size gRPC batches. Object UUIDs derive from the id
+# fields, so a rerun overwrites the same objects instead of duplicating them.
+# Failed objects are retried with backoff. With --vectorizer-url, vectors are
+# computed client-side against the transformers container so vectorizer time
+# is reported apart from insert time; duplicate texts are embedded once and,
+# with --embedding-cache, texts seen by earlier imports are not embedded at
+# all. The text of each object is built from the collection's vectorizer
+# settings, as Weaviate builds it. Otherwise Weaviate vectorizes on insert.
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of a JSON Lines, JSON array or CSV file, read lazily where the format allows."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+    elif path.endswith(".json"):
+        with open(path) as f:
+            yield from json.load(f)
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def object_uuid(record: Dict[str, Any], id_fields: Optional[List[str]] = None) -> str:
+    """Deterministic UUID from the id fields (or the whole record)."""
+    identity = {f: record.get(f) for f in id_fields} if id_fields else record
+    return generate_uuid5(json.dumps(identity, sort_keys=True, default=str))
+
+
+def text2vec_settings(collection) -> Dict[str, Any]:
+    """
+    object_text() options matching the collection's text2vec settings: its
+    non-skipped text properties, which of them are vectorized with their
+    name, and whether the collection name is vectorized.
+    """
+    config = collection.config.get()
+    fields, named_fields = [], []
+    for prop in config.properties:
+        if prop.data_type not in (DataType.TEXT, DataType.TEXT_ARRAY):
+            continue
+        settings = prop.vectorizer_config
+        if settings is not None and settings.skip:
+            continue
+        fields.append(prop.name)
+        if settings is not None and settings.vectorize_property_name:
+            named_fields.append(prop.name)
+    vectorizer = config.vectorizer_config
+    return {
+        "fields": fields,
+        "named_fields": named_fields,
+        "vectorize_class_name": vectorizer.vectorize_collection_name if vectorizer is not None else True,
+    }
+
+
+def _batch_context(collection, batch: str, batch_size: int, concurrency: int):
+    if batch == "fixed":
+        return collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrency)
+    return collection.batch.dynamic()
+
+
+def _chunks(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _send(collection, objects: Iterable[Tuple[str, Dict[str, Any], Optional[List[float]]]], batch: str,
+          batch_size: int, concurrency: int) -> List[Tuple[str, Dict[str, Any], Optional[List[float]]]]:
+    """Send (uuid, properties, vector) objects in one batch session; returns the failed ones."""
+    with _batch_context(collection, batch, batch_size, concurrency) as session:
+        for uuid, properties, vector in objects:
+            session.add_object(properties=properties, uuid=uuid, vector=vector)
+    failed = collection.batch.failed_objects
+    if failed:
+        print(f"⚠️ {len(failed)} objects failed, e.g. {failed[0].message}")
+    return [(str(f.object_.uuid), f.object_.properties, f.object_.vector) for f in failed]
+
+
+def ingest(
+    collection,
+    records: Iterable[Dict[str, Any]],
+    batch: str = "dynamic",
+    batch_size: int = 100,
+    concurrency: int = 2,
+    id_fields: Optional[List[str]] = None,
+    vector_field: Optional[str] = None,
+    vectorizer: Optional[TransformersVectorizer] = None,
+    vectorize_fields: Optional[List[str]] = None,
+    max_retries: int = 3,
+    chunk_size: int = 1000,
+    report_every: int = 10000,
+) -> Dict[str, Any]:
+    """
+    Stream records into collection and return throughput stats.
+    vector_field takes a precomputed vector from each record (removed from
+    the properties); vectorizer computes one from vectorize_fields instead,
+    by default the fields Weaviate itself would vectorize.
+    """
+    start = time.perf_counter()
+    text_settings = text2vec_settings(collection) if vectorizer is not None and not vector_field else {}
+    if vectorize_fields:
+        text_settings["fields"] = vectorize_fields
+    sent = 0
+    next_report = report_every
+
+    def objects():
+        nonlocal sent, next_report
+        for chunk in _chunks(records, chunk_size):
+            vectors: List[Optional[List[float]]] = [None] * len(chunk)
+            if vector_field:
+                vectors = [r.get(vector_field) for r in chunk]
+                chunk = [{k: v for k, v in r.items() if k != vector_field} for r in chunk]
+            elif vectorizer is not None:
+                vectors = vectorizer.vectorize([object_text(collection.name, r, **text_settings) for r in chunk])
+            for record, vector in zip(chunk, vectors):
+                yield object_uuid(record, id_fields), record, vector
+            sent += len(chunk)
+            if report_every and sent >= next_report:
+                next_report += report_every
+                print(f"📦 {sent} objects, {sent / (time.perf_counter() - start):.0f} obj/s")
+
+    failed = _send(collection, objects(), batch, batch_size, concurrency)
+    retried = 0
+    for attempt in range(1, max_retries + 1):
+        if not failed:
+            break
+        time.sleep(min(2 ** attempt, 30))
+        retried += len(failed)
+        print(f"🔄 Retry {attempt}/{max_retries}: {len(failed)} objects")
+        failed = _send(collection, failed, batch, batch_size, concurrency)
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "objects": sent,
+        "failed": len(failed),
+        "retried": retried,
+        "seconds": round(seconds, 2),
+        "objects_per_second": round(sent / seconds, 1) if seconds else None,
+        "vectorizer": vectorizer.stats() if vectorizer is not None else None,
+        "vectorizer_share": round(vectorizer.seconds / seconds, 3) if vectorizer is not None and seconds else None,
+        "failed_uuids": [uuid for uuid, _, _ in failed][:100],
+    }
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-ingest records into a Weaviate collection.")
+    parser.add_argument("path", help=".jsonl, .json or .csv file of records")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--host", default=WEAVIATE_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=WEAVIATE_CONFIG["port"])
+    parser.add_argument("--grpc-port", type=int, default=WEAVIATE_CONFIG["grpc_port"])
+    parser.add_argument("--batch", choices=("dynamic", "fixed"), default="dynamic")
+    parser.add_argument("--batch-size", type=int, default=100, help="objects per request with --batch fixed")
+    parser.add_argument("--concurrency", type=int, default=2, help="concurrent batch requests with --batch fixed")
+    parser.add_argument("--id-fields", help="comma-separated fields identifying a record (default: whole record)")
+    parser.add_argument("--vector-field", help="record field holding a precomputed vector")
+    parser.add_argument("--vectorizer-url", help="vectorize client-side against this transformers container")
+    parser.add_argument("--vectorize-fields",
+                        help="comma-separated fields to vectorize (default: the collection's text properties)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="model served by the transformers container")
+    parser.add_argument("--vectorizer-concurrency", type=int, default=8)
+    parser.add_argument("--embedding-cache", help="SQLite file caching client-side vectors by text hash")
+    parser.add_argument("--max-retries", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    connection = connection_from_env({"host": args.host, "port": args.port, "grpc_port": args.grpc_port})
+    vectorizer = None
+    try:
+        client = connection.get()
+        if not client.collections.exists(args.collection):
+            print(f"❌ Collection {args.collection} does not exist")
+            return 1
+        if args.vectorizer_url:
+            cache = EmbeddingCache(args.embedding_cache) if args.embedding_cache else None
+            vectorizer = TransformersVectorizer(args.vectorizer_url, args.vectorizer_concurrency, cache=cache, model=args.model)
+        stats = ingest(
+            client.collections.get(args.collection),
+            iter_records(args.path),
+            batch=args.batch,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            id_fields=args.id_fields.split(",") if args.id_fields else None,
+            vector_field=args.vector_field,
+            vectorizer=vectorizer,
+            vectorize_fields=args.vectorize_fields.split(",") if args.vectorize_fields else None,
+            max_retries=args.max_retries,
+        )
+    finally:
+        if vectorizer is not None:
+            vectorizer.close()
+        connection.close()
+    print(json.dumps(stats, indent=2))
+    if stats["failed"]:
+        print(f"❌ {stats['failed']} objects could not be inserted")
+        return 1
+    print(f"✅ Inserted {stats['objects']} objects at {stats['objects_per_second']} obj/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,11 @@
-import weaviate
+# python -m weviate.main
 from weaviate.classes.config import Configure, Property, DataType
-from weaviate.classes.init import AdditionalConfig, Timeout
-
-# Initialize the client with explicit gRPC port
-client = weaviate.connect_to_local(
-    port=8082,  # HTTP port
-    grpc_port=50051,  # gRPC port - default is 50051
-    additional_config=AdditionalConfig(
-        timeout=Timeout(init=30)  # Increase timeout to 30 seconds
-    )
-)
+from .client import get_client
+from .export import iter_objects
 
 # Create schema for "Student" collection
 def create_schema():
+    client = get_client()
     client.collections.create(
         name="Student",
         properties=[
@@ -50,27 +43,26 @@ def add_student_object():
     }
 
     # Get the Student collection and add the object
-    student_collection = client.collections.get("Student")
+    student_collection = get_client().collections.get("Student")
     student_collection.data.insert(student_data)
     print("Student object added successfully!")
 
 # Retrieve all student objects to check if the data is added
 def get_student_object():
-    # Get the Student collection and query objects
-    student_collection = client.collections.get("Student")
-    result = student_collection.query.fetch_objects(include_vector=True)
+    # Get the Student collection and page through its objects
+    student_collection = get_client().collections.get("Student")
     print("Student objects:")
-    for obj in result.objects:
-        print("Properties:", obj.properties)
-        print("Vector_length:", len(obj.vector['default']))  # This will show the vector embeddings
-
-if client.collections.exists("Student"):
-    client.collections.delete("Student")
-    print("Deleted existing Student collection")
-# Run the functions
-create_schema()
-add_student_object()
-get_student_object()
+    for uuid, properties, vector in iter_objects(student_collection, include_vector=True):
+        print("Properties:", properties)
+        print("Vector_length:", len(vector) if vector is not None else 0)  # This will show the vector embeddings
 
-# Close the client connection
-client.close()
+if __name__ == "__main__":
+    # One shared client for every step; it is closed at exit
+    client = get_client()
+    if client.collections.exists("Student"):
+        client.collections.delete("Student")
+        print("Deleted existing Student collection")
+    # Run the functions
+    create_schema()
+    add_student_object()
+    get_student_object()
@@ -0,0 +1,256 @@
+# === query_service.py ===
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+import httpx
+from weaviate.classes.query import MetadataQuery
+from .client import async_connection_from_env, AsyncWeaviateConnection
+from .vectorizer import EmbeddingCache, EMBEDDING_MODEL, content_key
+
+# Batched, concurrent near_text queries over one warm async client
+#
+#   python -m weviate.query_service --collection Student --limit 5 \
+#       "AI for environmental issues" "robots" "AI for environmental issues"
+#   python -m weviate.query_service --collection Student --vectorizer-url http://localhost:8081 --repeat 10 "robots"
+#
+# Queries run concurrently up to max_concurrency. Results are cached per
+# (query, limit, filters) with LRU eviction and a TTL, and identical queries
+# in flight share one request. With a vectorizer URL, query embeddings come
+# from the transformers container through an LRU cache (optionally backed by
+# the on-disk EmbeddingCache) and are searched with near_vector; otherwise
+# Weaviate embeds each uncached query itself.
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction, optional TTL and hit counters."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+class NearTextService:
+    """
+    Runs many near_text queries against one collection concurrently, with
+    query-embedding and result caches.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        connection: Optional[AsyncWeaviateConnection] = None,
+        max_concurrency: int = 8,
+        result_cache_size: int = 1024,
+        result_ttl: Optional[float] = 300.0,
+        embedding_cache_size: int = 4096,
+        vectorizer_url: Optional[str] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        model: str = EMBEDDING_MODEL,
+        return_properties: Optional[List[str]] = None,
+    ):
+        self.collection = collection
+        # A caller-provided connection stays open for the caller
+        self._owns_connection = connection is None
+        self.connection = connection or async_connection_from_env()
+        self.return_properties = return_properties
+        self.results = LRUCache(result_cache_size, result_ttl)
+        self.embeddings = LRUCache(embedding_cache_size)
+        self.embedding_cache = embedding_cache
+        self.model = model
+        self.vectorizer_url = vectorizer_url.rstrip("/") if vectorizer_url else None
+        self._http = httpx.AsyncClient(timeout=60.0) if vectorizer_url else None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        # Queries answered by an identical query already in flight
+        self.coalesced = 0
+
+    async def _embed(self, text: str) -> List[float]:
+        vector = self.embeddings.get(text)
+        if vector is not None:
+            return vector
+        key = content_key(self.model, text)
+        # SQLite calls block, so they run off the event loop
+        if self.embedding_cache is not None:
+            vector = (await asyncio.to_thread(self.embedding_cache.get_many, [key])).get(key)
+        if vector is None:
+            response = await self._http.post(f"{self.vectorizer_url}/vectors", json={"text": text})
+            response.raise_for_status()
+            vector = response.json()["vector"]
+            if self.embedding_cache is not None:
+                await asyncio.to_thread(self.embedding_cache.put_many, {key: vector})
+        self.embeddings.put(text, vector)
+        return vector
+
+    async def _query(self, query: str, limit: int, filters) -> List[Dict[str, Any]]:
+        async with self._semaphore:
+            client = await self.connection.get()
+            collection = client.collections.get(self.collection)
+            options = dict(limit=limit, filters=filters, return_metadata=MetadataQuery(distance=True),
+                           return_properties=self.return_properties)
+            if self.vectorizer_url:
+                result = await collection.query.near_vector(near_vector=await self._embed(query), **options)
+            else:
+                result = await collection.query.near_text(query=query, **options)
+        return [
+            {"uuid": str(obj.uuid), "properties": obj.properties, "distance": obj.metadata.distance}
+            for obj in result.objects
+        ]
+
+    async def search(self, query: str, limit: int = 5, filters=None) -> Dict[str, Any]:
+        """Results of one query, with its latency and whether the cache answered it."""
+        start = time.perf_counter()
+        # Filter objects have no value equality; their repr describes them fully
+        key = (query, limit, repr(filters))
+        objects = self.results.get(key)
+        cached = objects is not None
+        while not cached:
+            future = self._inflight.get(key)
+            if future is not None:
+                try:
+                    objects = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # The owner was cancelled, not this task: query again,
+                    # possibly as the new owner
+                    if future.cancelled() and not asyncio.current_task().cancelling():
+                        continue
+                    raise
+                self.coalesced += 1
+                cached = True
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                try:
+                    objects = await self._query(query, limit, filters)
+                    self.results.put(key, objects)
+                    future.set_result(objects)
+                except Exception as e:
+                    future.set_exception(e)
+                    # Waiters re-raise it; mark it retrieved for the case there are none
+                    future.exception()
+                    raise
+                finally:
+                    # Owner cancelled: release the waiters, which retry the query
+                    if not future.done():
+                        future.cancel()
+                    del self._inflight[key]
+                break
+        return {
+            "query": query,
+            "objects": objects,
+            "cached": cached,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    async def search_many(self, queries: List[str], limit: int = 5, filters=None) -> List[Dict[str, Any]]:
+        """Run queries concurrently; a failed query returns an error entry instead of its objects."""
+        async def run(query):
+            start = time.perf_counter()
+            try:
+                return await self.search(query, limit, filters)
+            except Exception as e:
+                print(f"❌ Query failed: {query!r} → {e}")
+                return {"query": query, "error": str(e), "cached": False,
+                        "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+        return await asyncio.gather(*(run(q) for q in queries))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"results": self.results.stats(), "coalesced": self.coalesced, "embeddings": self.embeddings.stats()}
+
+    async def close(self) -> None:
+        """Close what the service opened; a passed-in connection or embedding cache is left to the caller."""
+        if self._http is not None:
+            await self._http.aclose()
+        if self._owns_connection:
+            await self.connection.close()
+
+
+async def _run(args) -> int:
+    embedding_cache = EmbeddingCache(args.embedding_cache) if args.embedding_cache else None
+    service = NearTextService(
+        args.collection,
+        max_concurrency=args.concurrency,
+        vectorizer_url=args.vectorizer_url,
+        embedding_cache=embedding_cache,
+        model=args.model,
+    )
+    try:
+        queries = list(args.queries) * args.repeat
+        start = time.perf_counter()
+        results = await service.search_many(queries, args.limit)
+        seconds = time.perf_counter() - start
+    finally:
+        await service.close()
+        if embedding_cache is not None:
+            embedding_cache.close()
+    if args.verbose:
+        print(json.dumps(results, indent=2, default=str))
+    latencies = sorted(r["latency_ms"] for r in results)
+    print(json.dumps({
+        "queries": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "cached": sum(1 for r in results if r["cached"]),
+        "seconds": round(seconds, 3),
+        "queries_per_second": round(len(results) / seconds, 1) if seconds else None,
+        "latency_ms": {
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[max(int(len(latencies) * 0.95) - 1, 0)],
+            "max": latencies[-1],
+        },
+        "caches": service.stats(),
+    }, indent=2))
+    return 1 if any("error" in r for r in results) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run near_text queries concurrently with result caching.")
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8, help="queries in flight at once")
+    parser.add_argument("--repeat", type=int, default=1, help="send the query list this many times")
+    parser.add_argument("--vectorizer-url", help="embed queries client-side against this transformers container")
+    parser.add_argument("--embedding-cache", help="SQLite file caching query embeddings across runs")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="model served by the transformers container")
+    parser.add_argument("--verbose", action="store_true", help="print every result")
+    args = parser.parse_args(argv)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
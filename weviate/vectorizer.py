@@ -0,0 +1,158 @@
+# === vectorizer.py ===
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Iterable
+import httpx
+
+# Client-side vectorization against the transformers inference container
+# (docker/docker-compose.yml, port 8081), with an optional on-disk cache:
+#
+#   vectorizer = TransformersVectorizer("http://localhost:8081", cache=EmbeddingCache("embeddings.sqlite"))
+#   vectors = vectorizer.vectorize(texts)
+#
+# Each distinct text of a call is embedded once, and texts already in the
+# cache are not embedded at all, so re-imports only pay for new texts.
+# object_text() builds the same text text2vec-transformers embeds on insert,
+# so client-side vectors match the ones Weaviate would compute.
+
+# Model of the transformers image in docker/docker-compose.yml
+DEFAULT_MODEL = "sentence-transformers-all-mpnet-base-v2"
+# Model actually served; part of every cache key, so vectors of another model are never reused
+EMBEDDING_MODEL = os.getenv("TRANSFORMERS_MODEL", DEFAULT_MODEL)
+
+
+def content_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+def _camel_case_to_lower(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", " ", name).lower()
+
+
+def object_text(class_name: str, properties: Dict[str, Any], fields: Optional[Iterable[str]] = None,
+                vectorize_class_name: bool = True, named_fields: Iterable[str] = ()) -> str:
+    """
+    Text text2vec-transformers embeds for an object: the class name, then
+    the text values of fields (default: every text property) in property
+    name order, each prefixed by its name if in named_fields, lowercased.
+    """
+    corpus = [_camel_case_to_lower(class_name)] if vectorize_class_name else []
+    named_fields = set(named_fields)
+    for name in sorted(properties if fields is None else fields):
+        value = properties.get(name)
+        if isinstance(value, list) and all(isinstance(v, str) for v in value):
+            value = " ".join(value)
+        if not isinstance(value, str):
+            continue
+        corpus.append(f"{_camel_case_to_lower(name)} {value}" if name in named_fields else value)
+    return " ".join(corpus).lower()
+
+
+class EmbeddingCache:
+    """
+    Vectors keyed by a hash of (model, text), stored as float32 blobs in SQLite.
+    Safe to share between threads.
+    """
+
+    # Keys per SELECT ... IN (...), under SQLite's bound-parameter limit
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for start in range(0, len(keys), self.LOOKUP_CHUNK):
+            chunk = keys[start:start + self.LOOKUP_CHUNK]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class TransformersVectorizer:
+    """
+    Client for the transformers inference container (POST /vectors):
+    deduplicates texts, serves cached vectors, and embeds the rest with
+    concurrent requests.
+    """
+
+    def __init__(self, url: str = "http://localhost:8081", concurrency: int = 8, timeout: float = 60.0,
+                 cache: Optional[EmbeddingCache] = None, model: str = EMBEDDING_MODEL):
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.cache = cache
+        self.model = model
+        self._client = httpx.Client(timeout=timeout, limits=httpx.Limits(max_connections=concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="vectorizer")
+        # Time spent waiting on the container, and text counts
+        self.seconds = 0.0
+        self.texts = 0
+        self.cache_hits = 0
+        self.embedded = 0
+
+    def _vectorize_one(self, text: str) -> List[float]:
+        response = self._client.post(f"{self.url}/vectors", json={"text": text})
+        response.raise_for_status()
+        return response.json()["vector"]
+
+    def vectorize(self, texts: List[str]) -> List[List[float]]:
+        """Vectors of texts, in order."""
+        self.texts += len(texts)
+        keys = {text: content_key(self.model, text) for text in texts}
+        vectors = self.cache.get_many(list(set(keys.values()))) if self.cache is not None else {}
+        missing = [text for text in dict.fromkeys(texts) if keys[text] not in vectors]
+        missing_set = set(missing)
+        self.cache_hits += sum(1 for text in texts if text not in missing_set)
+        if missing:
+            start = time.perf_counter()
+            embedded = dict(zip((keys[t] for t in missing), self._executor.map(self._vectorize_one, missing)))
+            self.seconds += time.perf_counter() - start
+            self.embedded += len(missing)
+            if self.cache is not None:
+                self.cache.put_many(embedded)
+            vectors.update(embedded)
+        return [vectors[keys[text]] for text in texts]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "texts": self.texts,
+            "embedded": self.embedded,
+            "cache_hits": self.cache_hits,
+            "vectorizer_seconds": round(self.seconds, 2),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        self._client.close()
+        if self.cache is not None:
+            self.cache.close()